@@ -0,0 +1,286 @@
+"""Overhead of the instrumentation hot paths.
+
+Reports the time (ns/op), the memory allocated by every op (the peak of the bytes
+traced while it runs, so temporary allocations count too) and the blocks retained
+per op of every hot path, optionally running it from many threads at once. Results
+can be saved as JSON and compared against a baseline, failing when any benchmark
+is slower than the tolerance allows:
+
+    python benchmarks/overhead.py --save baseline.json
+    python benchmarks/overhead.py --compare baseline.json --tolerance 0.2
+"""
+import argparse
+import gc
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from chronologger import Timer, config
+from chronologger.model import Chronologger, EventRecorder, Tick, TimeUnit
+from chronologger.repository import TimeRepository, set_repo
+from chronologger.sinks import Sink, set_default_sink
+
+# Builds the operation to measure. It's called once per run, so every run starts from a fresh state
+Setup = Callable[[], Callable[[], object]]
+
+
+class Result(NamedTuple):
+    name: str
+    threads: int
+    ns_per_op: float
+    allocated_bytes_per_op: float  # Mean peak of the memory traced during an op, over the memory when it starts
+    retained_blocks_per_op: float  # Blocks still allocated after the ops (e.g. the events recorded)
+
+    def __str__(self) -> str:
+        return (f"{self.name:<40} {self.threads:>3} thr {self.ns_per_op:>12.1f} ns/op "
+                f"{self.allocated_bytes_per_op:>10.1f} B allocated/op {self.retained_blocks_per_op:>8.2f} blocks retained/op")
+
+
+class _SilentSink(Sink):
+
+    def emit(self, template, *args) -> None:
+        pass
+
+
+def _fresh_repo() -> TimeRepository:
+    return TimeRepository(Timer("benchmark root"))
+
+
+def _per_thread(new_chrono: Callable[[], Chronologger]) -> Callable[[], Chronologger]:
+    """Chronologgers are not thread-safe, so every thread gets its own one (a dict lookup per op)"""
+    local = threading.local()
+
+    def chrono():
+        try:
+            return local.chrono
+        except AttributeError:
+            local.chrono = new_chrono()
+            return local.chrono
+    return chrono
+
+
+def _start_stop() -> Callable[[], object]:
+    chrono = _per_thread(lambda: Chronologger("bench", None, TimeUnit.s, logger=None))
+
+    def op():
+        current = chrono()
+        current.start()
+        return current.stop(reset=True)
+    return op
+
+
+def _mark(columnar: bool) -> Setup:
+    def setup():
+        def new_chrono():
+            started = Chronologger("bench", None, TimeUnit.s, logger=None, columnar=columnar)
+            started.start()
+            return started
+        chrono = _per_thread(new_chrono)
+        return lambda: chrono().mark("lap")
+    return setup
+
+
+def _timer_context_manager(concurrent: bool = False) -> Setup:
+    def setup():
+        timer = Timer("bench", concurrent=concurrent)
+
+        def op():
+            with timer:
+                pass
+        return op
+    return setup
+
+
+def _timer_decorator() -> Callable[[], object]:
+    @Timer("bench")
+    def decorated():
+        pass
+    return decorated
+
+
+def _disabled_timer() -> Callable[[], object]:
+    op = _timer_context_manager()()
+    config.disable()
+
+    def disabled_op():
+        op()
+    disabled_op.teardown = config.enable
+    return disabled_op
+
+
+def _recorder_add() -> Callable[[], object]:
+    recorder = EventRecorder()
+    tick = Tick("tick", None)
+    recorder.add(tick)
+    return lambda: recorder.add(tick)
+
+
+def _period_elapsed() -> Callable[[], object]:
+    period = Tick("end", None) - Tick("start", None)
+    return period.elapsed
+
+
+def _repository_add() -> Callable[[], object]:
+    repo = _fresh_repo()
+    period = Tick("end", None) - Tick("start", None)
+    return lambda: repo.add(period)
+
+
+BENCHMARKS: Dict[str, Setup] = {
+    "Chronologger.start+stop": _start_stop,
+    "Chronologger.mark": _mark(columnar=False),
+    "Chronologger.mark (columnar)": _mark(columnar=True),
+    "Timer context manager": _timer_context_manager(),
+    "Timer context manager (concurrent)": _timer_context_manager(concurrent=True),
+    "Timer decorator": _timer_decorator,
+    "Timer context manager (disabled)": _disabled_timer,
+    "EventRecorder.add": _recorder_add,
+    "Period.elapsed": _period_elapsed,
+    "TimeRepository.add": _repository_add,
+}
+
+
+def _run_threads(op: Callable[[], object], number: int, threads: int) -> int:
+    """Runs op number times in every thread. Returns the wall time in ns"""
+    barrier = threading.Barrier(threads + 1)
+
+    def run():
+        barrier.wait()
+        for _ in range(number):
+            op()
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter_ns()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter_ns() - start
+
+
+def _time_ns(op: Callable[[], object], number: int, threads: int) -> int:
+    if threads > 1:
+        return _run_threads(op, number, threads)
+    start = time.perf_counter_ns()
+    for _ in range(number):
+        op()
+    return time.perf_counter_ns() - start
+
+
+def _memory_per_op(op: Callable[[], object], number: int):
+    """Mean bytes allocated by an op, measured on its own (the peak is reset before each one), and blocks retained.
+    Before Python 3.9 the peak can't be reset, so the one of the whole run is used"""
+    tracemalloc.start()
+    try:
+        blocks = sys.getallocatedblocks()
+        allocated_bytes = 0
+        can_reset_peak = hasattr(tracemalloc, "reset_peak")
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        for _ in range(number):
+            if can_reset_peak:
+                tracemalloc.reset_peak()
+                start_bytes = tracemalloc.get_traced_memory()[0]
+            op()
+            if can_reset_peak:
+                allocated_bytes += tracemalloc.get_traced_memory()[1] - start_bytes
+        if not can_reset_peak:
+            allocated_bytes = tracemalloc.get_traced_memory()[1] - start_bytes
+        blocks = sys.getallocatedblocks() - blocks
+    finally:
+        tracemalloc.stop()
+    return allocated_bytes / number, blocks / number
+
+
+def measure(name: str, setup: Setup, number: int = 100_000, repeat: int = 5, threads: int = 1) -> Result:
+    """Best ns/op of repeat runs of number ops per thread, minus the cost of the loop itself.
+    Memory is measured in a separate single-threaded run, as tracing allocations slows everything down"""
+    loop_ns = min(_time_ns(lambda: None, number, threads) for _ in range(repeat))
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        timings = []
+        for _ in range(repeat):
+            op = setup()
+            set_repo(_fresh_repo())
+            timings.append(_time_ns(op, number, threads))
+            getattr(op, "teardown", lambda: None)()
+
+        op = setup()
+        set_repo(_fresh_repo())
+        allocated_bytes, retained_blocks = _memory_per_op(op, number)
+        getattr(op, "teardown", lambda: None)()
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    ops = number * threads
+    return Result(name, threads, max(min(timings) - loop_ns, 0) / ops, allocated_bytes, retained_blocks)
+
+
+def run(number: int = 100_000, repeat: int = 5, threads: int = 1, only: Optional[str] = None) -> List[Result]:
+    previous_sink = set_default_sink(_SilentSink())
+    previous_repo = set_repo(_fresh_repo())
+    try:
+        return [measure(name, setup, number, repeat, threads) for name, setup in BENCHMARKS.items()
+                if only is None or only.lower() in name.lower()]
+    finally:
+        set_default_sink(previous_sink)
+        set_repo(previous_repo)
+
+
+def save(results: List[Result], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as results_file:
+        json.dump([result._asdict() for result in results], results_file, indent=2)
+
+
+def load(path: str) -> List[Result]:
+    with open(path, encoding="utf-8") as results_file:
+        return [Result(**result) for result in json.load(results_file)]
+
+
+def compare(results: List[Result], baseline: List[Result], tolerance: float = 0.2) -> List[str]:
+    """Returns the description of every benchmark slower than the baseline by more than tolerance"""
+    baseline_by_key = {(result.name, result.threads): result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_by_key.get((result.name, result.threads))
+        if previous is None or previous.ns_per_op == 0:
+            continue
+        change = result.ns_per_op / previous.ns_per_op - 1
+        if change > tolerance:
+            regressions.append(f"{result.name} ({result.threads} thr): {previous.ns_per_op:.1f} -> "
+                               f"{result.ns_per_op:.1f} ns/op (+{change:.0%})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--number", type=int, default=100_000, help="ops per run and thread")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="runs per benchmark (the best one is reported)")
+    parser.add_argument("-t", "--threads", type=int, nargs="+", default=[1, 4], help="thread counts to run with")
+    parser.add_argument("-k", "--only", help="run only the benchmarks whose name contains this")
+    parser.add_argument("--save", metavar="JSON", help="save the results to this file")
+    parser.add_argument("--compare", metavar="JSON", help="compare the results against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown allowed when comparing (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for threads in args.threads:
+        for result in run(args.number, args.repeat, threads, args.only):
+            print(result)
+            results.append(result)
+    if args.save:
+        save(results, args.save)
+    if args.compare:
+        regressions = compare(results, load(args.compare), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
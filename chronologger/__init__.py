@@ -1,4 +1,39 @@
-from .model import TimeUnit, Tick, Period, TimeContext, TimeEvent
-from .repository import init_repo
-from .timer import Timer, root_timer
+"""Time utilities for Python code.
 
+Importing the package has no side effects: submodules are only loaded when one
+of their names is first accessed, and the root timer and repository are only
+created when they are first used.
+"""
+import importlib
+
+# Public names and the submodules that define them
+_lazy_attributes = {
+    "TimeUnit": "model",
+    "Clock": "model",
+    "MemorySource": "memory",
+    "Tick": "model",
+    "Period": "model",
+    "TimeContext": "model",
+    "TimeEvent": "model",
+    "init_repo": "repository",
+    "Timer": "timer",
+    "root_timer": "timer",
+    "enable": "config",
+    "disable": "config",
+    "is_enabled": "config",
+}
+
+__all__ = list(_lazy_attributes)
+
+
+def __getattr__(name):
+    module_name = _lazy_attributes.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,111 @@
+"""Vectorized analysis of recorded time events with NumPy (an optional dependency).
+
+Recorders export their tick timestamps and repositories their periods as arrays
+of integer nanoseconds, so millions of events are processed without creating a
+Python object per event:
+
+    laps_ns = laps(timer.chrono.ticks.to_numpy())
+    print(summary(laps_ns, TimeUnit.ms))
+    timers, elapsed_ns, _, weights = get_repo().to_numpy()
+    print(group_by(timers, elapsed_ns, TimeUnit.ms, weights))
+"""
+from array import array
+from typing import Dict, Iterable, NamedTuple, Optional, Union
+
+from .model import ChronologgerError, Period, TimeEvent, TimeUnit
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+PERCENTILES = (50, 90, 99)
+
+
+def _require_numpy():
+    if np is None:
+        raise ChronologgerError("NumPy is required for the analysis of time events (pip install chronologger[analysis])")
+    return np
+
+
+class PeriodColumns(NamedTuple):
+    """Periods as parallel arrays, one position per period"""
+    timers: "np.ndarray"  # Name of the timer (time context) of every period, as an object array
+    elapsed_ns: "np.ndarray"  # int64, with the overhead correction applied (see Period.ns())
+    start_ns: "np.ndarray"  # int64
+    weights: "np.ndarray"  # float64
+
+
+def timestamps(time_events: Union[Iterable[TimeEvent], array]) -> "np.ndarray":
+    """The timestamps in nanoseconds of the events passed (or of a column of them), as an int64 array"""
+    numpy = _require_numpy()
+    if isinstance(time_events, array):  # Copied, as a view would prevent the column from growing
+        return numpy.array(time_events, dtype=numpy.int64)
+    return numpy.fromiter((time_event.ns() for time_event in time_events), dtype=numpy.int64)
+
+
+def periods(time_events: Iterable[TimeEvent]) -> PeriodColumns:
+    """The periods found in the events passed (other events are skipped), as columns"""
+    numpy = _require_numpy()
+    found = [time_event for time_event in time_events if isinstance(time_event, Period)]
+    return PeriodColumns(numpy.array([getattr(period.time_context, "name", None) for period in found], dtype=object),
+                         numpy.fromiter((period.ns() for period in found), dtype=numpy.int64, count=len(found)),
+                         numpy.fromiter((period.start.ns() for period in found), dtype=numpy.int64, count=len(found)),
+                         numpy.fromiter((period.weight for period in found), dtype=numpy.float64, count=len(found)))
+
+
+def laps(timestamps_ns: "np.ndarray") -> "np.ndarray":
+    """The time elapsed between every tick and the previous one"""
+    return _require_numpy().diff(timestamps_ns)
+
+
+def convert(values_ns: "np.ndarray", unit: TimeUnit) -> "np.ndarray":
+    """Nanoseconds to the unit passed, as float64"""
+    return _require_numpy().asarray(values_ns) / unit.ns_per_unit
+
+
+def summary(values_ns: "np.ndarray", unit: TimeUnit = TimeUnit.s,
+            weights: Optional["np.ndarray"] = None) -> Dict[str, float]:
+    """Count, total, mean, standard deviation, min, max and percentiles of the values, in the unit passed.
+
+    When weights are passed (e.g. sampled periods) every value counts as many times as its weight:
+    count, total, mean and std are weighted and the percentiles are the smallest values whose
+    cumulative weight reaches the percentile of the total weight"""
+    numpy = _require_numpy()
+    values = convert(values_ns, unit)
+    if len(values) == 0:
+        return {"count": 0}
+    if weights is None:
+        count, total, mean, std = float(len(values)), float(values.sum()), float(values.mean()), float(values.std())
+        percentiles = numpy.percentile(values, PERCENTILES)
+    else:
+        weights = numpy.asarray(weights, dtype=numpy.float64)
+        count = float(weights.sum())
+        total = float((values * weights).sum())
+        mean = total / count
+        std = float(numpy.sqrt((weights * (values - mean) ** 2).sum() / count))
+        order = numpy.argsort(values, kind="stable")
+        cumulative_weights = numpy.cumsum(weights[order])
+        positions = numpy.searchsorted(cumulative_weights, numpy.asarray(PERCENTILES) / 100 * count)
+        percentiles = values[order][numpy.minimum(positions, len(values) - 1)]
+    result = {"count": count, "total": total, "mean": mean, "std": std,
+              "min": float(values.min()), "max": float(values.max())}
+    for percentile, value in zip(PERCENTILES, percentiles):
+        result[f"p{percentile}"] = float(value)
+    return result
+
+
+def group_by(names: "np.ndarray", values_ns: "np.ndarray", unit: TimeUnit = TimeUnit.s,
+             weights: Optional["np.ndarray"] = None) -> Dict[str, Dict[str, float]]:
+    """The summary of the values of every name (e.g. the periods of every timer).
+
+    Values are sorted by name once and then split in contiguous groups, instead of filtering them once per name"""
+    numpy = _require_numpy()
+    names = numpy.asarray(names, dtype=object).astype(str)
+    values_ns = numpy.asarray(values_ns)
+    order = numpy.argsort(names, kind="stable")
+    sorted_names = names[order]
+    unique_names, starts = numpy.unique(sorted_names, return_index=True)
+    groups = numpy.split(order, starts[1:])
+    return {str(name): summary(values_ns[group], unit, None if weights is None else weights[group])
+            for name, group in zip(unique_names, groups)}
@@ -0,0 +1,102 @@
+"""Calibration of the clocks used by the timers.
+
+calibrate() measures the resolution of a clock and the time that an empty
+invocation of a timer reports, which is the overhead of the library itself
+(entering and exiting the timer, creating the ticks, storing them...). Timers created with subtract_overhead=True remove it
+from the periods they report, and flag the ones whose corrected time is below
+the clock resolution, as those can't be told apart from zero.
+"""
+import contextvars
+import statistics
+import time
+from typing import Dict, NamedTuple
+
+from .model import ChronologgerError, Clock, Period, clock_of
+from .repository import TimeRepository
+
+# Longest time spent looking for the smallest step of a clock, as CPU clocks may advance in coarse steps
+RESOLUTION_BUDGET_NS = 10 ** 8
+
+
+class Calibration(NamedTuple):
+    clock: str
+    resolution_ns: int  # Smallest difference between two readings of the clock
+    overhead_ns: int  # Median time reported by an empty invocation of a timer
+    samples: int
+
+    def __str__(self) -> str:
+        return (f"{self.clock}: resolution {self.resolution_ns} ns, timer overhead {self.overhead_ns} ns "
+                f"({self.samples} samples)")
+
+
+_calibrations: Dict[Clock, Calibration] = {}
+
+
+def _resolution_ns(clock: Clock, samples: int) -> int:
+    """The largest of the resolution declared by the clock and the smallest step observed"""
+    declared_ns = int(time.get_clock_info(clock.value).resolution * 1e9)
+    read = clock.read
+    deadline_ns = time.perf_counter_ns() + RESOLUTION_BUDGET_NS
+    smallest_step_ns = None
+    for _ in range(samples):
+        first = second = read()
+        while second == first:
+            second = read()
+        step_ns = second - first
+        if smallest_step_ns is None or step_ns < smallest_step_ns:
+            smallest_step_ns = step_ns
+        if time.perf_counter_ns() > deadline_ns:
+            break
+    return max(declared_ns, smallest_step_ns or 1, 1)
+
+
+def _discard(message: str) -> None:
+    pass
+
+
+def _empty_invocations(timer, samples: int) -> None:
+    for _ in range(samples):
+        with timer:
+            pass
+
+
+def _overhead_ns(clock: Clock, samples: int) -> int:
+    """Median time reported by an empty invocation of a timer, so the whole path of entering and exiting it is
+    measured. The timer records in a throwaway repository and runs in an empty context, so nothing is recorded in
+    the root repository, logged or nested in the running timers"""
+    from .timer import Timer  # Imported here as timer depends on this module
+
+    repo = TimeRepository(Timer("calibration", logger=_discard, clock=clock))
+    timer = Timer("calibration", logger=_discard, clock=clock, repo=repo)
+    contextvars.Context().run(_empty_invocations, timer, samples)
+    elapsed_ns = [event.ns() for event in repo.get_all() if isinstance(event, Period)]
+    if not elapsed_ns:
+        raise ChronologgerError("Calibration needs at least one sample, with recording enabled")
+    return int(statistics.median(elapsed_ns))
+
+
+def calibrate(samples: int = 1000, clock: Clock = Clock.PERF_COUNTER) -> Calibration:
+    """Measures the clock and the timer overhead, and makes the result the current calibration of the clock.
+
+    Timers created with subtract_overhead=True calibrate their clock when they are created if it's not calibrated yet.
+    """
+    clock = Clock(clock)
+    calibration = Calibration(clock.value, _resolution_ns(clock, samples), _overhead_ns(clock, samples), samples)
+    _calibrations[clock] = calibration
+    return calibration
+
+
+def get_calibration(clock: Clock = Clock.PERF_COUNTER) -> Calibration:
+    """Returns the current calibration of the clock, calibrating it the first time it's needed"""
+    calibration = _calibrations.get(Clock(clock))
+    if calibration is None:
+        calibration = calibrate(clock=clock)
+    return calibration
+
+
+def correct(period: Period, weight: float = 1.0, span=None) -> Period:
+    """Subtracts the timer overhead from the period, flagging it if what's left is below the clock resolution"""
+    calibration = get_calibration(clock_of(period))
+    measured_ns = period.end.ns() - period.start.ns()
+    overhead_ns = min(calibration.overhead_ns, measured_ns)
+    return period.annotate(weight, span, overhead_ns, measured_ns - overhead_ns < calibration.resolution_ns)
@@ -0,0 +1,113 @@
+"""Exporter of time events to the Chrome Trace Event Format.
+
+The files written can be opened in chrome://tracing or https://ui.perfetto.dev.
+Periods become complete ("X") events spanning from their start to their end
+tick, in the thread where they were measured. Ticks (marks) become thread-scoped
+instant events, except the start and end ticks of periods, which the complete
+events already show, and labels become global instant events. Timestamps are the
+raw clock values in microseconds.
+"""
+import json
+import os
+import threading
+from typing import IO, Iterable, Optional, Set, Tuple, Union
+
+from .model import BoundaryTick, Label, Period, TimeEvent, current_thread_id
+
+CATEGORY = "chronologger"
+
+
+class ChromeTraceWriter:
+    """Streams time events to a JSON trace file as they arrive. It can be subscribed to a repository:
+
+        repo.subscribe(ChromeTraceWriter("run.json"))
+
+    Events are written one per line, so memory use doesn't depend on the number of
+    events. The JSON array is closed when the writer is closed, although trace
+    viewers also load files that were not closed (e.g. after a crash).
+    """
+
+    def __init__(self, file: Union[str, IO[str]], pid: Optional[int] = None):
+        self._owns_file = isinstance(file, str)
+        self.file: IO[str] = open(file, "w", encoding="utf-8") if self._owns_file else file
+        self.pid = pid if pid is not None else os.getpid()
+        self._named_threads: Set[Tuple[int, int]] = set()
+        self._first_event = True
+        self._closed = False
+        self._lock = threading.Lock()
+        self.file.write("[")
+
+    def _write_event(self, event: dict) -> None:
+        self.file.write(("\n" if self._first_event else ",\n") + json.dumps(event))
+        self._first_event = False
+
+    def _name_thread(self, pid: int, tid: int) -> None:
+        """Names the current thread, which is tid"""
+        if (pid, tid) in self._named_threads:
+            return
+        self._named_threads.add((pid, tid))
+        self._write_event({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                           "args": {"name": threading.current_thread().name}})
+
+    def write(self, time_event: TimeEvent) -> None:
+        if isinstance(time_event, BoundaryTick):
+            return
+        time_context = time_event.time_context
+        # Events collected from other processes carry their own process and thread ids, and periods
+        # the thread where they were measured (so events recorded before can be exported from any thread)
+        pid = getattr(time_context, "pid", None) or self.pid
+        tid = getattr(time_context, "tid", None)
+        if tid is None and isinstance(time_event, Period) and time_event.span is not None:
+            tid = time_event.span.thread_id
+        current_tid = current_thread_id()
+        if tid is None:
+            tid = current_tid
+        if isinstance(time_event, Period):
+            event = {"name": getattr(time_context, "name", None) or time_event.name, "cat": CATEGORY, "ph": "X",
+                     "ts": time_event.start.ns() / 1000, "dur": time_event.ns() / 1000, "pid": pid, "tid": tid,
+                     "args": {"period": time_event.name, "elapsed": time_event.time(), "unit": time_event.unit.name}}
+            if time_event.weight != 1:
+                event["args"]["weight"] = time_event.weight
+        else:
+            scope = "g" if isinstance(time_event, Label) else "t"
+            event = {"name": time_event.name.strip(), "cat": CATEGORY, "ph": "i", "s": scope,
+                     "ts": time_event.ns() / 1000, "pid": pid, "tid": tid}
+        with self._lock:
+            if self._closed:
+                return
+            if pid == self.pid and tid == current_tid:
+                self._name_thread(pid, tid)
+            self._write_event(event)
+
+    __call__ = write
+
+    def write_all(self, time_events: Iterable[TimeEvent]) -> None:
+        """Writes events already recorded, e.g. the ones in a repository"""
+        for time_event in time_events:
+            self.write(time_event)
+
+    def flush(self) -> None:
+        with self._lock:
+            self.file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.file.write("\n]\n")
+            self.file.flush()
+            if self._owns_file:
+                self.file.close()
+
+    def __enter__(self) -> "ChromeTraceWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def export_chrome_trace(time_events: Iterable[TimeEvent], file: Union[str, IO[str]]) -> None:
+    """Writes all the events passed (e.g. get_repo().get_all()) to a Chrome trace file"""
+    with ChromeTraceWriter(file) as writer:
+        writer.write_all(time_events)
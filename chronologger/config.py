@@ -0,0 +1,31 @@
+import os
+
+DISABLED_ENV_VAR = "CHRONOLOGGER_DISABLED"
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+# Read once at import. When set, every Timer created is a no-op singleton and
+# decorating a function with it returns the function untouched
+disabled_at_import: bool = _env_flag(DISABLED_ENV_VAR)
+
+# Runtime switch for timers already created (context managers, decorators, start/stop...)
+enabled: bool = not disabled_at_import
+
+
+def is_enabled() -> bool:
+    return enabled
+
+
+def enable() -> None:
+    """Turns on time recording at runtime"""
+    global enabled
+    enabled = True
+
+
+def disable() -> None:
+    """Turns off time recording at runtime. Timers already in use become (almost) free no-ops"""
+    global enabled
+    enabled = False
@@ -0,0 +1,372 @@
+"""Automatic instrumentation of whole modules and packages, without decorating every function.
+
+Two ways of doing it:
+- instrument(module_or_package): wraps the functions and methods defined in the
+  modules with timers, as if they were decorated with @Timer. install_import_hook()
+  does the same with every matching module imported from then on. Uninstrumented
+  functions run at full speed.
+- ProfileCollector: times the functions called while it's running, without
+  touching any module. It uses sys.monitoring when available (Python 3.12+),
+  so functions filtered out stop costing anything after their first call.
+
+Both create one timer per function, named after its qualified name (e.g.
+"package.module.Class.method"), whose statistics are updated and whose periods
+are recorded in the repository, as with any other timer.
+"""
+import importlib
+import inspect
+import pkgutil
+import sys
+import threading
+import time
+from fnmatch import fnmatchcase
+from types import CodeType, FrameType, ModuleType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from . import config
+from .model import BoundaryTick, ChronologgerError, Period, Span, TimeUnit, current_thread_id
+from .repository import TimeRepository, get_repo
+from .timer import Timer, _span_ids
+
+# Special methods are rarely worth timing and some of them (e.g. __repr__) are called everywhere
+DEFAULT_EXCLUDE = ("*.__*__",)
+TIMER_ATTRIBUTE = "__chronologger_timer__"
+
+
+def _quiet(message: str) -> None:
+    pass
+
+
+def _matches(name: str, include: Optional[Iterable[str]], exclude: Iterable[str]) -> bool:
+    """True when name matches any include pattern (or there are none) and no exclude pattern"""
+    if include is not None and not any(fnmatchcase(name, pattern) for pattern in include):
+        return False
+    return not any(fnmatchcase(name, pattern) for pattern in exclude)
+
+
+def _new_timer(name: str, timer_options: Dict[str, Any]) -> Timer:
+    timer_options.setdefault("logger", _quiet)  # Otherwise every timer created would be announced
+    return Timer(name, **timer_options)
+
+
+def _wrap(function: Callable, name: str, timer_options: Dict[str, Any]) -> Optional[Callable]:
+    """The function wrapped by a new timer, or None when the timer leaves it untouched (chronologger disabled)"""
+    timer = _new_timer(name, dict(timer_options))
+    wrapper = timer(function)
+    if wrapper is function:
+        return None
+    setattr(wrapper, TIMER_ATTRIBUTE, timer)
+    return wrapper
+
+
+def _instrument_namespace(owner: Any, prefix: str, module_name: str, include, exclude, timer_options,
+                          timers: Dict[str, Timer], visited: Optional[Set[int]] = None) -> None:
+    """visited holds the ids of the classes already instrumented, as classes can reference each other.
+    Classes are named after their qualified name, not after the attribute they are reached through"""
+    visited = visited if visited is not None else set()
+    visited.add(id(owner))
+    for attribute, value in list(vars(owner).items()):
+        name = f"{prefix}.{attribute}"
+        wrapper_type = type(value) if isinstance(value, (staticmethod, classmethod)) else None
+        function = value.__func__ if wrapper_type is not None else value
+        if inspect.isclass(function) and function.__module__ == module_name:
+            if id(function) not in visited:
+                _instrument_namespace(function, f"{module_name}.{function.__qualname__}", module_name, include,
+                                      exclude, timer_options, timers, visited)
+            continue
+        if not inspect.isfunction(function) or function.__module__ != module_name:
+            continue  # Imported from elsewhere, so it's instrumented (or not) with its own module
+        if hasattr(function, TIMER_ATTRIBUTE) or not _matches(name, include, exclude):
+            continue
+        wrapper = _wrap(function, name, timer_options)
+        if wrapper is None:
+            continue
+        setattr(owner, attribute, wrapper_type(wrapper) if wrapper_type is not None else wrapper)
+        timers[name] = getattr(wrapper, TIMER_ATTRIBUTE)
+
+
+def instrument(target: Union[ModuleType, str], include: Optional[Iterable[str]] = None,
+               exclude: Iterable[str] = DEFAULT_EXCLUDE, recursive: bool = True, **timer_options) -> Dict[str, Timer]:
+    """Wraps with a timer every function and method defined in the module (and, for packages, in their
+    submodules when recursive) whose qualified name matches the include/exclude glob patterns.
+
+    The timer options (unit, sampling, concurrent...) are the ones of Timer. Returns the timers by name.
+    Only references looked up through the module see the timers: names already imported
+    elsewhere with "from module import function" keep pointing to the original functions.
+    """
+    module = importlib.import_module(target) if isinstance(target, str) else target
+    modules = [module]
+    if recursive and hasattr(module, "__path__"):
+        for module_info in pkgutil.walk_packages(module.__path__, module.__name__ + "."):
+            modules.append(importlib.import_module(module_info.name))
+    timers: Dict[str, Timer] = {}
+    for each_module in modules:
+        _instrument_namespace(each_module, each_module.__name__, each_module.__name__, include, exclude,
+                              timer_options, timers)
+    return timers
+
+
+def _uninstrument_namespace(owner: Any, module_name: str, visited: Optional[Set[int]] = None) -> None:
+    visited = visited if visited is not None else set()
+    visited.add(id(owner))
+    for attribute, value in list(vars(owner).items()):
+        wrapper_type = type(value) if isinstance(value, (staticmethod, classmethod)) else None
+        function = value.__func__ if wrapper_type is not None else value
+        if inspect.isclass(function) and function.__module__ == module_name:
+            if id(function) not in visited:
+                _uninstrument_namespace(function, module_name, visited)
+        elif hasattr(function, TIMER_ATTRIBUTE):
+            original = getattr(function, "__wrapped__", function)
+            setattr(owner, attribute, wrapper_type(original) if wrapper_type is not None else original)
+
+
+def uninstrument(module: ModuleType) -> None:
+    """Restores the original functions of a module instrumented with instrument() (not of its submodules)"""
+    _uninstrument_namespace(module, module.__name__)
+
+
+class _InstrumentingLoader:
+    """Runs the original loader and then instruments the module"""
+
+    def __init__(self, loader, hook: "ImportHook"):
+        self.loader = loader
+        self.hook = hook
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType) -> None:
+        self.loader.exec_module(module)
+        self.hook.timers.update(instrument(module, self.hook.include, self.hook.exclude, recursive=False,
+                                           **self.hook.timer_options))
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportHook:
+    """Finder that instruments the modules whose name matches any of the patterns as they are imported"""
+
+    def __init__(self, modules: Iterable[str], include: Optional[Iterable[str]] = None,
+                 exclude: Iterable[str] = DEFAULT_EXCLUDE, **timer_options):
+        self.modules = tuple(modules)
+        self.include = include
+        self.exclude = exclude
+        self.timer_options = timer_options
+        self.timers: Dict[str, Timer] = {}
+
+    def find_spec(self, fullname: str, path=None, target=None):
+        if not _matches(fullname, self.modules, ()):
+            return None
+        for finder in sys.meta_path:  # The module is found as usual and only its loader is replaced
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return None
+        spec.loader = _InstrumentingLoader(spec.loader, self)
+        return spec
+
+    def remove(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+
+def install_import_hook(modules: Iterable[str], include: Optional[Iterable[str]] = None,
+                        exclude: Iterable[str] = DEFAULT_EXCLUDE, **timer_options) -> ImportHook:
+    """Instruments every module imported from now on whose name matches any of the glob patterns
+    in modules (e.g. "myapp.*"). Modules already imported are not affected. Call remove() to stop"""
+    hook = ImportHook(modules, include, exclude, **timer_options)
+    sys.meta_path.insert(0, hook)
+    return hook
+
+
+class _Call:
+    """Function call being timed by the ProfileCollector"""
+    __slots__ = ("key", "timer", "start_ns", "children_ns", "span")
+
+    def __init__(self, key: Any, timer: Timer, start_ns: int, span: Span):
+        self.key = key  # The frame (setprofile) or the code object (sys.monitoring) of the call
+        self.timer = timer
+        self.start_ns = start_ns
+        self.children_ns = 0
+        self.span = span
+
+
+_monitoring = getattr(sys, "monitoring", None)  # Python 3.12+
+
+
+class ProfileCollector:
+    """Times the Python functions called while it runs, without modifying them:
+
+        with ProfileCollector(include=["myapp.*"], min_duration_ns=100_000) as collector:
+            run()
+        print(collector.hot_spots())
+
+    Functions are selected by their qualified name with glob patterns, once per code object.
+    On Python 3.12+ it uses sys.monitoring, which stops reporting the functions filtered out
+    after their first call, so they run at full speed. Otherwise it uses sys.setprofile
+    (threading.setprofile for the threads started later), which calls back on every call.
+
+    Every call updates the statistics of the timer of the function, but only the calls lasting
+    at least min_duration_ns are recorded as periods in the repository (the root one by default).
+    Generators and coroutines are timed every time they are resumed.
+    """
+
+    def __init__(self, include: Optional[Iterable[str]] = None, exclude: Iterable[str] = DEFAULT_EXCLUDE,
+                 min_duration_ns: int = 0, unit: TimeUnit = TimeUnit.s, repo: Optional[TimeRepository] = None,
+                 use_monitoring: Optional[bool] = None):
+        self.include = tuple(include) if include is not None else None
+        self.exclude = tuple(exclude)
+        self.min_duration_ns = min_duration_ns
+        self.unit = unit
+        self.repo = repo
+        self.use_monitoring = _monitoring is not None if use_monitoring is None else use_monitoring
+        if self.use_monitoring and _monitoring is None:
+            raise ChronologgerError("sys.monitoring is only available in Python 3.12+")
+        self.timers: Dict[str, Timer] = {}
+        self._timer_by_code: Dict[Any, Optional[Timer]] = {}
+        self._local = threading.local()
+        self._running = False
+        self._previous_profilers: Tuple[Any, Any] = (None, None)
+
+    def _repo(self) -> TimeRepository:
+        return self.repo if self.repo is not None else get_repo()
+
+    def _timer(self, code: CodeType, frame: FrameType) -> Optional[Timer]:
+        name = f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+        timer = None
+        if _matches(name, self.include, self.exclude):
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = _new_timer(name, {"unit": self.unit})
+                # Registered, so it's in the timers of the repository (reports, exporters...) like any other timer
+                self._repo().register(timer)
+        self._timer_by_code[code] = timer
+        return timer
+
+    def _enter(self, key: Any, timer: Timer) -> None:
+        try:
+            stack = self._local.stack
+        except AttributeError:
+            stack = self._local.stack = []
+        if stack:
+            parent_span = stack[-1].span
+            span = Span(next(_span_ids), parent_span.span_id, parent_span.path + (timer.name,), parent_span.thread_id)
+        else:
+            span = Span(next(_span_ids), None, (timer.name,), current_thread_id())
+        stack.append(_Call(key, timer, time.perf_counter_ns(), span))
+
+    def _exit(self, key: Any) -> None:
+        end_ns = time.perf_counter_ns()
+        stack = getattr(self._local, "stack", None)
+        if not stack or stack[-1].key is not key:
+            return  # Not timed (filtered out, or called before the collector started)
+        call = stack.pop()
+        elapsed_ns = end_ns - call.start_ns
+        if stack:
+            stack[-1].children_ns += elapsed_ns
+        timer = call.timer
+        outermost = not any(outer.timer is timer for outer in stack)
+        with timer._stats_lock:
+            timer.stats.add(elapsed_ns, elapsed_ns - call.children_ns, outermost)
+        if elapsed_ns >= self.min_duration_ns:
+            period = Period(timer.name, timer, self.unit,
+                            BoundaryTick(f"{timer.name}_start_tick", timer, self.unit, call.start_ns),
+                            BoundaryTick(f"{timer.name}_end_tick", timer, self.unit, end_ns), span=call.span)
+            self._repo().add(period)
+
+    def _profile(self, frame: FrameType, event: str, arg: Any) -> None:
+        """sys.setprofile callback"""
+        if event == "call":
+            code = frame.f_code
+            try:
+                timer = self._timer_by_code[code]
+            except KeyError:
+                timer = self._timer(code, frame)
+            if timer is not None and config.enabled:
+                self._enter(frame, timer)
+        elif event == "return":
+            self._exit(frame)
+
+    def _started(self, code: CodeType, offset: int):
+        """sys.monitoring PY_START and PY_RESUME callback"""
+        try:
+            timer = self._timer_by_code[code]
+        except KeyError:
+            timer = self._timer(code, sys._getframe(1))
+        if timer is None:
+            return _monitoring.DISABLE  # Never reported again for this function
+        if config.enabled:
+            self._enter(code, timer)
+        return None
+
+    def _returned(self, code: CodeType, offset: int, value: Any):
+        """sys.monitoring PY_RETURN and PY_YIELD callback"""
+        if self._timer_by_code.get(code) is None:
+            return _monitoring.DISABLE
+        self._exit(code)
+        return None
+
+    def _unwound(self, code: CodeType, offset: int, exception: BaseException) -> None:
+        """sys.monitoring PY_UNWIND callback (a function exiting with an exception). It can't be disabled"""
+        self._exit(code)
+
+    def _start_monitoring(self) -> None:
+        tool = _monitoring.PROFILER_ID
+        if _monitoring.get_tool(tool) is not None:
+            raise ChronologgerError(f"The profiler tool of sys.monitoring is in use by {_monitoring.get_tool(tool)}")
+        _monitoring.use_tool_id(tool, "chronologger")
+        events = _monitoring.events
+        for event, callback in ((events.PY_START, self._started), (events.PY_RESUME, self._started),
+                                (events.PY_RETURN, self._returned), (events.PY_YIELD, self._returned),
+                                (events.PY_UNWIND, self._unwound)):
+            _monitoring.register_callback(tool, event, callback)
+        _monitoring.restart_events()  # Functions disabled by a previous collector may be selected by this one
+        selected = events.PY_START | events.PY_RESUME | events.PY_RETURN | events.PY_YIELD | events.PY_UNWIND
+        _monitoring.set_events(tool, selected)
+
+    def _stop_monitoring(self) -> None:
+        tool = _monitoring.PROFILER_ID
+        _monitoring.set_events(tool, _monitoring.events.NO_EVENTS)
+        _monitoring.free_tool_id(tool)
+
+    def start(self) -> "ProfileCollector":
+        if self._running:
+            return self
+        if self.use_monitoring:
+            self._start_monitoring()
+        else:
+            self._previous_profilers = (sys.getprofile(), getattr(threading, "getprofile", lambda: None)())
+            threading.setprofile(self._profile)
+            sys.setprofile(self._profile)
+        self._running = True
+        return self
+
+    def stop(self) -> None:
+        if not self._running:
+            return
+        if self.use_monitoring:
+            self._stop_monitoring()
+        else:
+            previous_profiler, previous_thread_profiler = self._previous_profilers
+            sys.setprofile(previous_profiler)
+            threading.setprofile(previous_thread_profiler)
+        self._running = False
+        self._local = threading.local()
+
+    def hot_spots(self, limit: int = 20) -> List[Tuple[str, float]]:
+        """Names and exclusive time (in the unit of the collector) of the functions where more time was spent"""
+        ranking = sorted(self.timers.values(), key=lambda timer: timer.stats.exclusive_ns, reverse=True)
+        return [(timer.name, timer.stats.exclusive(self.unit)) for timer in ranking[:limit]
+                if timer.stats.calls > 0]
+
+    def __enter__(self) -> "ProfileCollector":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
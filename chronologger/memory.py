@@ -0,0 +1,145 @@
+"""Memory used during periods, measured along with their time.
+
+Timers created with memory=MemorySource.<source> store a MemoryDelta in their periods:
+- TRACEMALLOC: net bytes allocated by Python and the peak above the start. It's exact but
+  slows down every allocation while tracing (it's started when first needed). The peak
+  needs tracemalloc.reset_peak (Python 3.9+), it's None in older versions
+- RSS: net change of the resident set size of the process (from /proc on Linux) and the
+  growth of its maximum. Includes memory not allocated by Python (e.g. native extensions)
+- BLOCKS: net number of memory blocks allocated by Python (sys.getallocatedblocks). The
+  cheapest one, with no peak
+
+Memory is measured for the whole process, so the deltas include what other threads
+allocate meanwhile. Repositories aggregate the deltas of every timer in MemoryStats.
+"""
+import enum
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from typing import List, NamedTuple, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class MemorySource(enum.Enum):
+    TRACEMALLOC = "tracemalloc"
+    RSS = "rss"
+    BLOCKS = "blocks"
+
+
+class MemoryDelta(NamedTuple):
+    """Memory used during a period. Values are bytes, or memory blocks for MemorySource.BLOCKS"""
+    source: MemorySource
+    net: int  # Allocated minus freed
+    peak: Optional[int]  # Highest usage during the period over the usage at its start (None when unknown)
+
+    def __str__(self) -> str:
+        if self.source is MemorySource.BLOCKS:
+            return f"mem {self.net:+d} blocks"
+        peak = "" if self.peak is None else f", peak {_format_bytes(self.peak)}"
+        return f"mem {'+' if self.net >= 0 else '-'}{_format_bytes(abs(self.net))}{peak}"
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size:.0f} B"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+class _TracemallocPeak:
+    """tracemalloc keeps a single peak, so every measurement running resets it when starting and the
+    peaks seen are passed on to the measurements enclosing it (in any thread)"""
+    __slots__ = ("start", "peak")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.peak = start
+
+
+_running_peaks: List[_TracemallocPeak] = []
+_peaks_lock = threading.Lock()
+_page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_statm_available = os.path.exists("/proc/self/statm")
+
+
+def _rss() -> int:
+    if _statm_available:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * _page_size
+    return _max_rss()
+
+
+def _max_rss() -> int:
+    if resource is None:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024  # Bytes in macOS, KiB in Linux
+
+
+def start_tracking(source: MemorySource):
+    """Takes the state needed to calculate the delta when the period finishes"""
+    if source is MemorySource.BLOCKS:
+        return sys.getallocatedblocks()
+    if source is MemorySource.RSS:
+        return _rss(), _max_rss()
+    import tracemalloc  # Only imported when used, as it's not cheap to import
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if not hasattr(tracemalloc, "reset_peak"):  # The peak could come from before the period
+        return _TracemallocPeak(tracemalloc.get_traced_memory()[0])
+    with _peaks_lock:
+        current, peak = tracemalloc.get_traced_memory()
+        for running in _running_peaks:
+            running.peak = max(running.peak, peak)
+        tracemalloc.reset_peak()
+        measurement = _TracemallocPeak(current)
+        _running_peaks.append(measurement)
+    return measurement
+
+
+def stop_tracking(source: MemorySource, state) -> MemoryDelta:
+    if source is MemorySource.BLOCKS:
+        return MemoryDelta(source, sys.getallocatedblocks() - state, None)
+    if source is MemorySource.RSS:
+        start_rss, start_max_rss = state
+        return MemoryDelta(source, _rss() - start_rss, max(_max_rss() - start_max_rss, 0))
+    import tracemalloc
+    if not hasattr(tracemalloc, "reset_peak"):
+        return MemoryDelta(source, tracemalloc.get_traced_memory()[0] - state.start, None)
+    with _peaks_lock:
+        current, peak = tracemalloc.get_traced_memory()
+        for running in _running_peaks:
+            running.peak = max(running.peak, peak)
+        if state in _running_peaks:
+            _running_peaks.remove(state)
+    return MemoryDelta(source, current - state.start, state.peak - state.start)
+
+
+@dataclass
+class MemoryStats:
+    """Aggregated memory deltas of the periods of a timer"""
+    source: MemorySource
+    periods: float = 0
+    net: float = 0
+    max_peak: Optional[int] = None
+
+    def add(self, delta: MemoryDelta, weight: float = 1) -> None:
+        self.periods += weight
+        self.net += delta.net * weight
+        if delta.peak is not None and (self.max_peak is None or delta.peak > self.max_peak):
+            self.max_peak = delta.peak
+
+    @property
+    def mean_net(self) -> float:
+        return self.net / self.periods if self.periods else 0.0
+
+    def __str__(self) -> str:
+        mean = MemoryDelta(self.source, int(self.mean_net), self.max_peak)
+        return f"{self.periods:g} periods, mean {mean} (max)" if self.max_peak is not None \
+            else f"{self.periods:g} periods, mean {mean}"
@@ -0,0 +1,135 @@
+"""Rolling windows of the calls of a timer, e.g. requests per second and p99 over the last minute.
+
+Every window is a ring of time buckets, each one counting the calls finished
+during it and their latencies in a LatencySketch. Recording a call only touches the
+current bucket of each window (a bucket is reused, and cleared, when the ring
+wraps around), so it's O(1) and the memory doesn't depend on the number of calls:
+
+    timer = Timer("request", windows=(1, 10, 60))
+    ...
+    timer.meter.rate(60), timer.meter.percentile(99, 60)
+"""
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .model import ChronologgerError, TimeUnit
+from .stats import Count, LatencySketch
+
+# Buckets in which every window is split. Windows move in steps of length / buckets
+DEFAULT_BUCKETS = 10
+
+
+class _Bucket:
+    __slots__ = ("epoch", "sketch")
+
+    def __init__(self, epoch: int, significant_bits: int):
+        self.epoch = epoch  # Number of the bucket since the clock origin, to find out if it's outdated
+        self.sketch = LatencySketch(significant_bits)
+
+
+class RollingWindow:
+    """Calls finished in the last length_secs seconds (with the precision of a bucket)"""
+
+    def __init__(self, length_secs: float, buckets: int = DEFAULT_BUCKETS, significant_bits: int = 7,
+                 clock: Callable[[], int] = time.monotonic_ns):
+        if length_secs <= 0 or buckets <= 0:
+            raise ChronologgerError(f"Windows need a positive length and number of buckets "
+                                    f"(got {length_secs} s and {buckets} buckets)")
+        self.length_secs = length_secs
+        self.bucket_ns = max(int(length_secs * 10 ** 9) // buckets, 1)
+        self.significant_bits = significant_bits
+        self.clock = clock
+        self._buckets: List[Optional[_Bucket]] = [None] * buckets
+        self._created_ns = clock()
+
+    def record(self, elapsed_ns: int, count: Count = 1, now_ns: Optional[int] = None) -> None:
+        epoch = (self.clock() if now_ns is None else now_ns) // self.bucket_ns
+        position = epoch % len(self._buckets)
+        bucket = self._buckets[position]
+        if bucket is None or bucket.epoch != epoch:
+            bucket = self._buckets[position] = _Bucket(epoch, self.significant_bits)
+        bucket.sketch.record(elapsed_ns, count)
+
+    def _current(self, now_ns: int) -> List[_Bucket]:
+        oldest_epoch = now_ns // self.bucket_ns - len(self._buckets) + 1
+        return [bucket for bucket in self._buckets if bucket is not None and bucket.epoch >= oldest_epoch]
+
+    def sketch(self, now_ns: Optional[int] = None) -> LatencySketch:
+        """The latencies of the calls in the window, merged in a new sketch"""
+        merged = LatencySketch(self.significant_bits)
+        for bucket in self._current(self.clock() if now_ns is None else now_ns):
+            merged.merge(bucket.sketch)
+        return merged
+
+    def covered_ns(self, now_ns: Optional[int] = None) -> int:
+        """Time covered by the buckets in the window: the full buckets and the elapsed part of the current one.
+        Shorter while the window is younger than its length"""
+        now_ns = self.clock() if now_ns is None else now_ns
+        covered_ns = (len(self._buckets) - 1) * self.bucket_ns + now_ns % self.bucket_ns
+        return max(min(covered_ns, now_ns - self._created_ns), 1)
+
+    def rate(self, now_ns: Optional[int] = None) -> float:
+        """Calls per second"""
+        now_ns = self.clock() if now_ns is None else now_ns
+        count = sum(bucket.sketch.count for bucket in self._current(now_ns))
+        return count * 10 ** 9 / self.covered_ns(now_ns)
+
+
+class Meter:
+    """Rolling windows of several lengths over the calls of a timer. Safe to record and query from any thread"""
+
+    def __init__(self, windows_secs: Iterable[float] = (1, 10, 60), buckets: int = DEFAULT_BUCKETS,
+                 significant_bits: int = 7, clock: Callable[[], int] = time.monotonic_ns):
+        self.clock = clock
+        self.windows: Dict[float, RollingWindow] = {
+            length_secs: RollingWindow(length_secs, buckets, significant_bits, clock)
+            for length_secs in sorted(windows_secs)}
+        if not self.windows:
+            raise ChronologgerError("A meter needs at least one window")
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ns: int, count: Count = 1) -> None:
+        now_ns = self.clock()
+        with self._lock:
+            for window in self.windows.values():
+                window.record(elapsed_ns, count, now_ns)
+
+    def window(self, length_secs: Optional[float] = None) -> RollingWindow:
+        """The window of the length passed, or the longest one"""
+        if length_secs is None:
+            return next(reversed(self.windows.values()))
+        window = self.windows.get(length_secs)
+        if window is None:
+            raise ChronologgerError(f"No window of {length_secs} s (windows: {list(self.windows)})")
+        return window
+
+    def rate(self, length_secs: Optional[float] = None) -> float:
+        """Calls per second in the window"""
+        window = self.window(length_secs)
+        with self._lock:
+            return window.rate()
+
+    def sketch(self, length_secs: Optional[float] = None) -> LatencySketch:
+        window = self.window(length_secs)
+        with self._lock:
+            return window.sketch()
+
+    def percentile(self, percentile: float, length_secs: Optional[float] = None,
+                   unit: TimeUnit = TimeUnit.ms) -> float:
+        """The latency below which the percentile % of the calls in the window fall, in the unit passed"""
+        return unit.from_ns(self.sketch(length_secs).percentile(percentile))
+
+    def snapshot(self, unit: TimeUnit = TimeUnit.ms) -> Dict[float, Dict[str, float]]:
+        """Rate and latency summary of every window"""
+        snapshot = {}
+        for length_secs, window in self.windows.items():
+            with self._lock:
+                sketch, rate = window.sketch(), window.rate()
+            snapshot[length_secs] = dict(sketch.summary(unit), rate=rate)
+        return snapshot
+
+    def __str__(self) -> str:
+        return "\n".join(f"last {length_secs:g} s: {summary['rate']:.1f} calls/s, "
+                         f"mean: {summary['mean']:.3f} ms, p99: {summary['p99']:.3f} ms"
+                         for length_secs, summary in self.snapshot().items())
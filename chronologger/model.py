@@ -1,16 +1,30 @@
+import copy
 import enum
 import itertools
+import threading
 import time
 from abc import abstractmethod, ABC
+from array import array
 from contextlib import ContextDecorator
-from dataclasses import dataclass, field, replace
-from typing import List, Optional, ClassVar, Callable, Any
+from dataclasses import FrozenInstanceError, dataclass, field
+from typing import List, Optional, ClassVar, Any, NamedTuple, Tuple, Iterable, Iterator
 
 try:
     from typing import Protocol, runtime_checkable
 except ImportError:
     from typing_extensions import Protocol, runtime_checkable
 
+from .memory import MemoryDelta, MemorySource, start_tracking, stop_tracking
+from .sinks import Logger, get_default_sink, log
+
+
+_set = object.__setattr__
+
+try:
+    current_thread_id = threading.get_native_id
+except AttributeError:  # Python < 3.8
+    current_thread_id = threading.get_ident
+
 
 class ChronologgerError(Exception):
     """A general exception used to report errors in use of the Chronologger project"""
@@ -23,6 +37,7 @@ class TimeUnit(enum.Enum):
 
     def __init__(self, x) -> None:
         self.x = x
+        self.ns_per_unit = 10 ** (9 - x)
 
     def from_secs(self, secs: float) -> float:
         return secs * 10 ** self.x
@@ -30,6 +45,41 @@ class TimeUnit(enum.Enum):
     def to_secs(self, timelapse: float) -> float:
         return timelapse / 10 ** self.x
 
+    def from_ns(self, ns: int) -> float:
+        return ns / self.ns_per_unit
+
+
+class Clock(enum.Enum):
+    """Clock sources for the ticks. Wall clocks (perf_counter, monotonic) include the time spent
+    waiting (I/O, locks, sleeping), while CPU clocks (process_time, thread_time) don't"""
+    PERF_COUNTER = "perf_counter"
+    MONOTONIC = "monotonic"
+    PROCESS_TIME = "process_time"  # CPU time of all the threads of the process
+    THREAD_TIME = "thread_time"  # CPU time of the current thread
+
+    def __init__(self, source: str) -> None:
+        self.read = getattr(time, f"{source}_ns")  # Returns the current value of the clock in nanoseconds
+
+
+class EventKind(enum.IntEnum):
+    """The different kinds of time events"""
+    TICK = 0
+    LABEL = 1
+    PERIOD = 2
+
+
+def kind_of(time_event: 'TimeEvent') -> EventKind:
+    if isinstance(time_event, Period):
+        return EventKind.PERIOD
+    if isinstance(time_event, Label):
+        return EventKind.LABEL
+    return EventKind.TICK
+
+
+def clock_of(time_event: 'TimeEvent') -> Clock:
+    """The clock of the timer that created the event (perf_counter for events created without a timer)"""
+    return getattr(time_event.time_context, "clock", Clock.PERF_COUNTER)
+
 
 @runtime_checkable
 class TimeEvent(Protocol):
@@ -39,7 +89,11 @@ class TimeEvent(Protocol):
     unit: TimeUnit
 
     @abstractmethod
-    def time(self) -> float:
+    def time(self, unit: Optional[TimeUnit] = None) -> float:
+        raise NotImplementedError
+
+    @abstractmethod
+    def ns(self) -> int:
         raise NotImplementedError
 
     @abstractmethod
@@ -51,26 +105,72 @@ class TimeEvent(Protocol):
         raise NotImplementedError
 
 
-@dataclass(frozen=True)
-class Tick:
+class _FrozenEvent:
+    """Base of the immutable time events. They use __slots__ instead of being dataclasses,
+    so they don't carry a __dict__ and millions of them can be retained.
+
+    Subclasses list the attributes compared (and hashed) in _compared and the ones shown in repr in _shown."""
+    __slots__ = ()
+    _compared: ClassVar[Tuple[str, ...]] = ()
+    _shown: ClassVar[Tuple[str, ...]] = ()
+
+    def __setattr__(self, name, value):
+        raise FrozenInstanceError(f"cannot assign to field '{name}'")
+
+    def __delattr__(self, name):
+        raise FrozenInstanceError(f"cannot delete field '{name}'")
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self._compared)
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self) -> int:
+        return hash(self._values())
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._shown)
+        return f"{self.__class__.__qualname__}({fields})"
+
+    def __reduce__(self):
+        return self.__class__, self._arguments()
+
+    def _arguments(self) -> tuple:
+        raise NotImplementedError
+
+
+class Tick(_FrozenEvent):
     """A discrete time event implementation"""
-    name: str
-    time_context: 'TimeContext'
-    unit: TimeUnit = TimeUnit.s
-    # I decided to store the time in secs but this is just an implementation detail
-    _tick_in_secs: float = field(default_factory=lambda: time.perf_counter(), init=False, repr=False)
+    __slots__ = ("name", "time_context", "unit", "_tick_in_ns")
+    _compared = ("name", "time_context", "unit", "_tick_in_ns")
+    _shown = ("name", "time_context", "unit")
+
+    def __init__(self, name: str, time_context: 'TimeContext', unit: TimeUnit = TimeUnit.s,
+                 _tick_in_ns: Optional[int] = None):
+        _set(self, "name", name)
+        _set(self, "time_context", time_context)
+        _set(self, "unit", unit)
+        # Time is stored as integer nanoseconds so no precision is lost in long-running processes
+        _set(self, "_tick_in_ns", time.perf_counter_ns() if _tick_in_ns is None else _tick_in_ns)
+
+    def _arguments(self) -> tuple:
+        return self.name, self.time_context, self.unit, self._tick_in_ns
+
+    def time(self, unit: Optional[TimeUnit] = None) -> float:
+        """Returns the value of the time in the TimeUnits in which the object is specified (or in the one passed)"""
+        return (unit or self.unit).from_ns(self._tick_in_ns)
 
-    def time(self) -> float:
-        """Returns the value of the time in the TimeUnits in which the object is specified"""
-        return self.unit.from_secs(self._tick_in_secs)
+    def ns(self) -> int:
+        """Returns the raw value of the tick in nanoseconds"""
+        return self._tick_in_ns
 
     def to(self, unit: TimeUnit) -> 'Tick':
         if unit == self.unit:
             return self
-        else:  # Create new object with a new time unit. Immutability broken, but just in the creation of a new object
-            new_object = replace(self, unit=unit)
-            object.__setattr__(new_object, '_tick_in_secs', self._tick_in_secs)
-            return new_object
+        return self.__class__(self.name, self.time_context, unit, self._tick_in_ns)
 
     def __sub__(self, other: TimeEvent) -> 'Period':
         if other is None:
@@ -81,10 +181,18 @@ class Tick:
         return f"{self.name}: {self.time():.3f} {self.unit.name}"
 
 
-@dataclass(frozen=True)
+class BoundaryTick(Tick):
+    """The tick starting or ending a period, created when a Chronologger starts or stops.
+    Exporters showing the periods (e.g. as spans) can leave them out"""
+    __slots__ = ()
+
+
 class Label(Tick):
-    fillup_char: chr = "*"
-    repeat_no: int = 80
+    """A tick shown as a banner, e.g. to separate the phases of a program in the reports"""
+    __slots__ = ()
+    # Shared by all the labels, so they don't take space in every instance
+    fillup_char: ClassVar[str] = "*"
+    repeat_no: ClassVar[int] = 80
 
     def __str__(self) -> str:
         return (f"{self.fillup_char * self.repeat_no}\n"
@@ -92,44 +200,94 @@ class Label(Tick):
                 f"{self.fillup_char * self.repeat_no}\n")
 
 
-@dataclass(frozen=True)
-class Period:
+class Span(NamedTuple):
+    """Position of a period in the tree of nested timers that were running when it was measured"""
+    span_id: int
+    parent_id: Optional[int]
+    path: Tuple[str, ...]  # Names of the timers from the outermost one to the one of the period
+    thread_id: Optional[int] = None  # Native id of the thread where the period was measured
+
+
+class Period(_FrozenEvent):
     """Represents the elapsed time between two time events.
 
     We allow heterogeneous Periods when explicitly created, meaning
     that the ticks passed can have different TimeUnits. Calculations to
     reconcile the results are done when results are presented."
+
+    The elapsed nanoseconds are calculated once, when the period is created.
     """
-    name: str
-    time_context: 'TimeContext'
-    unit: TimeUnit
-    start: TimeEvent
-    end: TimeEvent
-
-    # If we don't want to allow heterogeneus Periods (see class description) uncomment
-    # this and change the semantics
-    # def __post_init__(self):
-    #     if self.start.unit != self.unit or self.end.unit != self.unit:
-    #         message = (
-    #             f"Ether start or end ticks have different units from Period units."
-    #             f"start tick {self.start.name} -> {self.start.unit.name}"
-    #             f"end tick {self.end.name} -> {self.end.unit.name}"
-    #             f"Please convert them first"
-    #         )
-    #         raise ChronologgerError(message)
-
-    def elapsed(self) -> float:
+    __slots__ = ("name", "time_context", "unit", "start", "end", "weight", "span", "overhead_ns", "below_resolution",
+                 "cpu_ns", "memory", "_ns")
+    _compared = ("name", "time_context", "unit", "start", "end")
+    _shown = ("name", "time_context", "unit", "start", "end")
+
+    def __init__(self, name: str, time_context: 'TimeContext', unit: TimeUnit, start: TimeEvent, end: TimeEvent,
+                 weight: float = 1.0, span: Optional[Span] = None, overhead_ns: int = 0,
+                 below_resolution: bool = False, cpu_ns: Optional[int] = None, memory: Optional[MemoryDelta] = None):
+        _set(self, "name", name)
+        _set(self, "time_context", time_context)
+        _set(self, "unit", unit)
+        _set(self, "start", start)
+        _set(self, "end", end)
+        # Number of occurrences represented by this period (e.g. when timers sample their invocations)
+        _set(self, "weight", weight)
+        _set(self, "span", span)
+        # Instrumentation overhead subtracted from the time measured, and whether what's left is below the clock resolution
+        _set(self, "overhead_ns", overhead_ns)
+        _set(self, "below_resolution", below_resolution)
+        # CPU time consumed during the period, when the timer captures it along with the time of its clock
+        _set(self, "cpu_ns", cpu_ns)
+        # Memory allocated during the period, when the timer tracks it
+        _set(self, "memory", memory)
+        _set(self, "_ns", end.ns() - start.ns() - overhead_ns)
+
+    def _arguments(self) -> tuple:
+        return (self.name, self.time_context, self.unit, self.start, self.end, self.weight, self.span,
+                self.overhead_ns, self.below_resolution, self.cpu_ns, self.memory)
+
+    def elapsed(self, unit: Optional[TimeUnit] = None) -> float:
+        """Returns the value of the elapsed time in the TimeUnits in which the object is specified (or in the one
+        passed). Nothing is allocated apart from the float returned"""
+        return (unit or self.unit).from_ns(self._ns)
+
+    def time(self, unit: Optional[TimeUnit] = None) -> float:
         """Returns the value of the elapsed time in the TimeUnits in which the object is specified"""
-        start_in_current_units = self.start.to(self.unit).time()
-        end_in_current_units = self.end.to(self.unit).time()
-        return end_in_current_units - start_in_current_units
+        return self.elapsed(unit)
 
-    def time(self) -> float:
-        """Returns the value of the elapsed time in the TimeUnits in which the object is specified"""
-        return self.elapsed()
+    def ns(self) -> int:
+        """Returns the elapsed time in nanoseconds. The subtraction is done on integers, so it is exact"""
+        return self._ns
 
     def to(self, unit: TimeUnit) -> 'Period':
-        return Period(self.name, self.time_context, unit, self.start, self.end)
+        if unit == self.unit:
+            return self
+        return Period(self.name, self.time_context, unit, self.start, self.end, self.weight, self.span,
+                      self.overhead_ns, self.below_resolution, self.cpu_ns, self.memory)
+
+    def annotate(self, weight: float = 1.0, span: Optional[Span] = None, overhead_ns: int = 0,
+                 below_resolution: bool = False) -> 'Period':
+        """Returns a copy of this period with the weight, the span and the overhead correction passed"""
+        return Period(self.name, self.time_context, self.unit, self.start, self.end, weight, span,
+                      overhead_ns, below_resolution, self.cpu_ns, self.memory)
+
+    def with_cpu(self, cpu_ns: int) -> 'Period':
+        """Returns a copy of this period with the CPU time passed"""
+        return Period(self.name, self.time_context, self.unit, self.start, self.end, self.weight, self.span,
+                      self.overhead_ns, self.below_resolution, cpu_ns, self.memory)
+
+    def with_memory(self, memory_delta: MemoryDelta) -> 'Period':
+        """Returns a copy of this period with the memory delta passed"""
+        return Period(self.name, self.time_context, self.unit, self.start, self.end, self.weight, self.span,
+                      self.overhead_ns, self.below_resolution, self.cpu_ns, memory_delta)
+
+    @property
+    def cpu_ratio(self) -> Optional[float]:
+        """CPU time over the time of the period. Close to 1 (or to the number of threads with process time)
+        means CPU bound, close to 0 means waiting (I/O, locks...). None when the CPU time wasn't captured"""
+        if self.cpu_ns is None:
+            return None
+        return self.cpu_ns / self._ns if self._ns > 0 else 0.0
 
     def __sub__(self, other: 'Period') -> 'Period':
         """Builds a new Period from the parts of the two periods involved.
@@ -144,7 +302,12 @@ class Period:
                       self.time_context, new_time_unit, new_start_tick, new_end_tick)
 
     def __str__(self) -> str:
-        return f"{self.time():.3f} {self.unit.name} ({self.name})   =    {self.end} - {self.start}"
+        below_resolution = " (below clock resolution)" if self.below_resolution else ""
+        cpu = "" if self.cpu_ns is None else (f" [cpu {self.unit.from_ns(self.cpu_ns):.3f} {self.unit.name}, "
+                                              f"cpu/wall {self.cpu_ratio:.2f}]")
+        memory_used = "" if self.memory is None else f" [{self.memory}]"
+        return (f"{self.time():.3f} {self.unit.name} ({self.name}){below_resolution}{cpu}{memory_used}   =    "
+                f"{self.end} - {self.start}")
 
 
 @dataclass(frozen=True)
@@ -178,6 +341,11 @@ class EventRecorder:
     def get_all(self) -> List[TimeEvent]:
         return self.events
 
+    def to_numpy(self):
+        """Timestamps of the events in nanoseconds, as a NumPy int64 array (see the analysis module)"""
+        from .analysis import timestamps
+        return timestamps(self.events)
+
     def to(self, unit: TimeUnit):
         converted_event_recorder = EventRecorder()
         for event in self.events:
@@ -188,19 +356,86 @@ class EventRecorder:
         return len(self.events)
 
     def __str__(self) -> str:
-        if len(self.events) == 0:
-            return ""
-        previous_marker = self.events[0]
-        time_unit = previous_marker.unit  # Reporting in the time unit of the first TimeEvent
-        markers_str = ""
-        i = 1
-        while i < len(self.events):
-            marker = self.events[i]
-            period = Period(marker.name, previous_marker.time_context, time_unit, previous_marker, marker)
-            markers_str += f"\t- {period}\n"
-            previous_marker = marker
-            i += 1
-        return markers_str
+        return _laps_str(self.events)
+
+
+@dataclass(frozen=True)
+class ColumnarEventRecorder:
+    """Stores time events as two parallel columns: names and integer nanosecond timestamps.
+
+    Tick and Period views are only created when they are requested (e.g. first(),
+    get_all() or str()), so recording a new time event costs just a couple of appends.
+    All the events share the time context and the time unit of the recorder.
+    """
+    time_context: Optional['TimeContext'] = None
+    unit: TimeUnit = TimeUnit.s
+    names: List[str] = field(default_factory=list)
+    timestamps: array = field(default_factory=lambda: array('q'))
+
+    def append(self, name: str, tick_in_ns: int) -> None:
+        """Hot path. Stores a new time event without creating any object for it"""
+        self.names.append(name)
+        self.timestamps.append(tick_in_ns)
+
+    def add(self, event: TimeEvent) -> Optional[Period]:
+        """Add a new time event to the recorded columns
+
+        Parameters
+        ----------
+        event : The time event to store
+
+        Returns
+        -------
+        the (optional) period (TimeEvent) from the initial time event recorded
+        """
+        self.append(event.name, event.ns())
+        return self.elapsed()
+
+    def view(self, index: int) -> Tick:
+        """Materializes the time event stored in the position passed"""
+        return Tick(self.names[index], self.time_context, self.unit, self.timestamps[index])
+
+    def first(self) -> Optional[TimeEvent]:
+        return None if len(self.names) == 0 else self.view(0)
+
+    def last(self) -> Optional[TimeEvent]:
+        return None if len(self.names) == 0 else self.view(-1)
+
+    def elapsed(self) -> Optional[Period]:
+        return None if len(self.names) == 0 else self.last() - self.first()
+
+    def get_all(self) -> List[TimeEvent]:
+        return [self.view(i) for i in range(len(self.names))]
+
+    def to_numpy(self):
+        """Timestamps of the events in nanoseconds, as a NumPy int64 array. No Tick is created"""
+        from .analysis import timestamps
+        return timestamps(self.timestamps)
+
+    def to(self, unit: TimeUnit) -> 'ColumnarEventRecorder':
+        return ColumnarEventRecorder(self.time_context, unit, list(self.names), array('q', self.timestamps))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __str__(self) -> str:
+        return _laps_str(self.view(i) for i in range(len(self.names)))
+
+
+def _lap_lines(events: Iterable[TimeEvent]) -> Iterator[str]:
+    """Yields a line per lap (period between consecutive ticks), in the unit of the first tick"""
+    events = iter(events)
+    previous_marker = next(events, None)
+    if previous_marker is None:
+        return
+    time_unit = previous_marker.unit  # Reporting in the time unit of the first TimeEvent
+    for marker in events:
+        yield f"\t- {Period(marker.name, previous_marker.time_context, time_unit, previous_marker, marker)}\n"
+        previous_marker = marker
+
+
+def _laps_str(events: Iterable[TimeEvent]) -> str:
+    return "".join(_lap_lines(events))
 
 
 def event_recorder():
@@ -217,54 +452,151 @@ class Chronologger:
     time_context: 'TimeContext'
     unit: TimeUnit = TimeUnit.s
     description: str = ""
-    logger: Callable[[str], None] = print
+    logger: Logger = field(default_factory=get_default_sink)
     simple_log_msgs: bool = True
     ticks: EventRecorder = field(default_factory=event_recorder)
 
     parent: Optional[str] = None
+    # When True, ticks are stored in a ColumnarEventRecorder and marks don't create any Tick object
+    columnar: bool = False
+    # Clock of the ticks and, optionally, a CPU clock read too when starting and stopping
+    clock: Clock = Clock.PERF_COUNTER
+    cpu_clock: Optional[Clock] = None
+    _cpu_start_ns: Optional[int] = field(default=None, repr=False)
+    # Source of the memory deltas stored in the periods, if any (see the memory module)
+    memory: Optional[MemorySource] = None
+    _memory_state: Any = field(default=None, repr=False)
+    # Columnar ticks already handed out by take_marks (or started and stopped the timer)
+    _taken: int = field(default=0, repr=False)
 
     def __post_init__(self) -> None:  # TODO This is not necessary anymore... but leave it for now...
         """Initialization: add unique name at least"""
         if not self.name:
             object.__setattr__(self, 'name', "timer_" + str(next(Chronologger.id_iter)))
+        if self.columnar:
+            self.ticks = self._new_recorder()
+        self.clock = Clock(self.clock)
+        if self.cpu_clock is not None:
+            self.cpu_clock = Clock(self.cpu_clock)
+        if self.memory is not None:
+            self.memory = MemorySource(self.memory)
+
+    def _new_recorder(self):
+        return ColumnarEventRecorder(self.time_context, self.unit) if self.columnar else EventRecorder()
 
     def start(self, start_tick_name: str = "start_tick") -> TimeEvent:
         """Start a new basic timer"""
-        time_event = Tick(start_tick_name, self.time_context, self.unit)
+        if self.memory is not None:  # Before the clock is read, so its cost isn't part of the period
+            self._memory_state = start_tracking(self.memory)
+        time_event = BoundaryTick(start_tick_name, self.time_context, self.unit, self.clock.read())
         self.ticks.add(time_event)
+        self._taken = len(self.ticks)
+        if self.cpu_clock is not None:
+            self._cpu_start_ns = self.cpu_clock.read()
         return time_event
 
     def _report_time(self, do_log, period):
         if self.logger and do_log:
-            self.logger(f"{period.time():3f} {period.unit.name} elapsed time") if self.simple_log_msgs else self.logger(
-                self)
+            if self.simple_log_msgs:
+                log(self.logger, "%3f %s elapsed time", period.time(), period.unit.name)
+            elif getattr(self.logger, "asynchronous", False):  # Formatted later, so keep the current ticks
+                log(self.logger, "%s", copy.copy(self))
+            else:
+                log(self.logger, "%s", self)
 
     def stop(self, final_tick_name: str = "end_tick", do_log: bool = False, reset: bool = False) -> Period:
         """Stop the basic timer reporting the elapsed time"""
         if len(self.ticks) == 0:
             raise ChronologgerError(f"Timer not started yet! Use .start() to start counting time...")
 
-        tick = Tick(final_tick_name, self.time_context, unit=self.unit)
+        tick = BoundaryTick(final_tick_name, self.time_context, self.unit, self.clock.read())
+        cpu_end_ns = self.cpu_clock.read() if self.cpu_clock is not None else None
 
         period: Period = self.ticks.add(tick)
+        self._taken = len(self.ticks)
+        if cpu_end_ns is not None and self._cpu_start_ns is not None:
+            period = period.with_cpu(cpu_end_ns - self._cpu_start_ns)
+        if self.memory is not None and self._memory_state is not None:
+            period = period.with_memory(stop_tracking(self.memory, self._memory_state))
+            self._memory_state = None
         self._report_time(do_log, period)
 
         self.reset() if reset else None
 
         return period.to(self.unit)
 
-    def mark(self, name: str) -> TimeEvent:
-        tick = Tick(name, self.time_context, unit=self.unit)
+    def mark(self, name: str) -> Optional[TimeEvent]:
+        """Records an intermediate tick. In columnar mode only the name and the timestamp
+        are stored, so no Tick is returned (it can be retrieved later with get_all())"""
+        if self.columnar:
+            self.ticks.append(name, self.clock.read())
+            return None
+        tick = Tick(name, self.time_context, self.unit, self.clock.read())
         self.ticks.add(tick)
         return tick
 
+    def take_marks(self) -> List[TimeEvent]:
+        """The columnar marks recorded since the last call (or since the timer started), created as ticks
+        only now, e.g. to record them in a repository when the timer stops. Empty for other recorders"""
+        if not self.columnar:
+            return []
+        marks = [self.ticks.view(index) for index in range(self._taken, len(self.ticks))]
+        self._taken = len(self.ticks)
+        return marks
+
     def reset(self) -> None:
-        self.ticks = EventRecorder()
+        self.ticks = self._new_recorder()
+        self._taken = 0
 
     def get_all(self) -> List[TimeEvent]:
         return self.ticks.get_all()
 
 
+@dataclass
+class TimerStats:
+    """Aggregated times of the invocations of a timer used as context manager or decorator.
+
+    Inclusive time covers whole invocations, but nested invocations of the same
+    timer (e.g. recursive functions) are only counted once, in the outermost one.
+    Exclusive time leaves out the time spent in nested invocations of any timer.
+    When the timer samples its invocations, the measured ones are scaled by their
+    weight, so calls and times are estimations of the totals.
+    """
+    calls: float = 0
+    inclusive_ns: float = 0
+    exclusive_ns: float = 0
+    sampled: int = 0  # Invocations actually measured
+    # CPU time of the outermost invocations and their time, for the ones where the timer captured it
+    cpu_ns: float = 0
+    cpu_measured_ns: float = 0
+
+    def add(self, inclusive_ns: int, exclusive_ns: int, outermost: bool = True, weight: float = 1,
+            cpu_ns: Optional[int] = None) -> None:
+        self.sampled += 1
+        self.calls += weight
+        if outermost:
+            self.inclusive_ns += inclusive_ns * weight
+            if cpu_ns is not None:
+                self.cpu_ns += cpu_ns * weight
+                self.cpu_measured_ns += inclusive_ns * weight
+        self.exclusive_ns += exclusive_ns * weight
+
+    @property
+    def cpu_ratio(self) -> Optional[float]:
+        """CPU time over the time measured, in the invocations where the CPU time was captured"""
+        return self.cpu_ns / self.cpu_measured_ns if self.cpu_measured_ns > 0 else None
+
+    def inclusive(self, unit: TimeUnit = TimeUnit.s) -> float:
+        return unit.from_ns(self.inclusive_ns)
+
+    def exclusive(self, unit: TimeUnit = TimeUnit.s) -> float:
+        return unit.from_ns(self.exclusive_ns)
+
+    def __str__(self) -> str:
+        cpu = "" if self.cpu_ratio is None else f", cpu/wall: {self.cpu_ratio:.2f}"
+        return f"calls: {self.calls}, inclusive: {self.inclusive():.3f} s, exclusive: {self.exclusive():.3f} s{cpu}"
+
+
 class TimeContext(ContextDecorator, ABC):
     name: str
     parent_ctx: "TimeContext"
@@ -0,0 +1,204 @@
+"""Exports the timers registered in a repository in the Prometheus text exposition format.
+
+For every timer it renders the calls and the inclusive, exclusive and CPU seconds as
+counters, the calls per second and latency quantiles of its rolling windows
+(Timer(..., windows=...)) as gauges and, when the repository keeps latency sketches
+(StatsTimeRepository), the histogram of its durations. Histograms need the cumulative
+sketches of a StatsTimeRepository: the sketches of the windows forget old calls, so
+with other repositories the durations are only exported as the quantiles of the windows.
+Metrics can be scraped from a localhost HTTP endpoint served by a background thread or
+written to a file for the textfile collector of the node exporter:
+
+    server = start_http_server(9464)
+    writer = TextfileWriter("/var/lib/node_exporter/textfile/app.prom", interval_secs=15).start()
+
+Rendering reads the aggregates kept by the timers without taking their locks (only the
+one of a meter, while its buckets are counted), so the instrumented threads are never
+blocked by a scrape. Values may be a call behind each other.
+"""
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from .model import TimeContext
+from .repository import TimeRepository, get_repo
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PREFIX = "chronologger_timer"
+# Quantiles of the durations in the rolling windows of the timers
+WINDOW_QUANTILES = (0.5, 0.9, 0.99)
+# Upper bounds in seconds of the histogram buckets (the default ones of the Prometheus clients)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+_COUNTERS = (
+    ("calls_total", "Invocations of the timer (estimated when sampling)", lambda stats: stats.calls),
+    ("seconds_total", "Time spent in the outermost invocations of the timer",
+     lambda stats: stats.inclusive_ns / 10 ** 9),
+    ("exclusive_seconds_total", "Time spent in the timer, leaving out nested timers",
+     lambda stats: stats.exclusive_ns / 10 ** 9),
+    ("cpu_seconds_total", "CPU time spent in the invocations where the timer captured it",
+     lambda stats: stats.cpu_ns / 10 ** 9),
+)
+
+
+def _escape(label_value: str) -> str:
+    return label_value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _counter_lines(timers: List[Tuple[str, TimeContext]]) -> Iterator[str]:
+    for suffix, help_text, value in _COUNTERS:
+        yield f"# HELP {PREFIX}_{suffix} {help_text}\n# TYPE {PREFIX}_{suffix} counter\n"
+        for label, timer in timers:
+            stats = getattr(timer, "stats", None)
+            if stats is not None:
+                yield f'{PREFIX}_{suffix}{{timer="{label}"}} {_number(value(stats))}\n'
+
+
+def _meter_lines(timers: List[Tuple[str, TimeContext]]) -> Iterator[str]:
+    metered = [(label, timer.meter) for label, timer in timers if getattr(timer, "meter", None) is not None]
+    if not metered:
+        return
+    yield (f"# HELP {PREFIX}_rate_per_second Invocations per second in the last window seconds\n"
+           f"# TYPE {PREFIX}_rate_per_second gauge\n")
+    for label, meter in metered:
+        for length_secs in meter.windows:
+            yield (f'{PREFIX}_rate_per_second{{timer="{label}",window="{length_secs:g}"}} '
+                   f'{_number(meter.rate(length_secs))}\n')
+    yield (f"# HELP {PREFIX}_window_duration_seconds Quantiles of the durations in the last window seconds\n"
+           f"# TYPE {PREFIX}_window_duration_seconds gauge\n")
+    for label, meter in metered:
+        for length_secs in meter.windows:
+            sketch = meter.sketch(length_secs)
+            for quantile in WINDOW_QUANTILES:
+                yield (f'{PREFIX}_window_duration_seconds{{timer="{label}",window="{length_secs:g}",'
+                       f'quantile="{quantile:g}"}} {_number(sketch.percentile(quantile * 100) / 10 ** 9)}\n')
+
+
+def _histogram_lines(repo: TimeRepository, buckets: Sequence[float]) -> Iterator[str]:
+    sketches = getattr(repo, "sketches", None)
+    if not sketches:
+        return
+    yield (f"# HELP {PREFIX}_duration_seconds Duration of the invocations of the timer\n"
+           f"# TYPE {PREFIX}_duration_seconds histogram\n")
+    bounds_ns = [int(bound * 10 ** 9) for bound in buckets]
+    for name, sketch in list(sketches.items()):
+        label = _escape(name)
+        cumulative_counts, total_count = sketch.histogram(bounds_ns)
+        for bound, count in zip(buckets, cumulative_counts):
+            yield f'{PREFIX}_duration_seconds_bucket{{timer="{label}",le="{_number(bound)}"}} {_number(count)}\n'
+        yield f'{PREFIX}_duration_seconds_bucket{{timer="{label}",le="+Inf"}} {_number(total_count)}\n'
+        yield f'{PREFIX}_duration_seconds_sum{{timer="{label}"}} {_number(sketch.total / 10 ** 9)}\n'
+        yield f'{PREFIX}_duration_seconds_count{{timer="{label}"}} {_number(total_count)}\n'
+
+
+def _metric_lines(repo: TimeRepository, buckets: Sequence[float]) -> Iterator[str]:
+    timers = [(_escape(name), timer) for name, timer in list(repo.time_contexts.items())]
+    yield from _counter_lines(timers)
+    yield from _meter_lines(timers)
+    yield from _histogram_lines(repo, buckets)
+
+
+def render(repo: Optional[TimeRepository] = None, buckets: Sequence[float] = DEFAULT_BUCKETS) -> str:
+    """The metrics of the timers registered in the repository (the root one by default)"""
+    return "".join(_metric_lines(repo or get_repo(), sorted(buckets)))
+
+
+def write_textfile(path: str, repo: Optional[TimeRepository] = None,
+                   buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+    """Writes the metrics to path atomically, so the collector never reads a half written file"""
+    text = render(repo, buckets)
+    directory = os.path.dirname(os.path.abspath(path))
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix=".chronologger", suffix=".prom.tmp")
+    try:
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(text)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+class TextfileWriter:
+    """Writes the metrics to a file every interval_secs seconds from a daemon thread"""
+
+    def __init__(self, path: str, interval_secs: float = 15.0, repo: Optional[TimeRepository] = None,
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.path = path
+        self.interval_secs = interval_secs
+        self.repo = repo
+        self.buckets = buckets
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "TextfileWriter":
+        self._thread = threading.Thread(target=self._run, name="chronologger-textfile", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while True:
+            write_textfile(self.path, self.repo, self.buckets)
+            if self._stopped.wait(self.interval_secs):
+                return
+
+    def stop(self) -> None:
+        """Stops the thread after a last write"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        write_textfile(self.path, self.repo, self.buckets)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """HTTP server answering every GET with the metrics. Every request is rendered in its own thread"""
+    daemon_threads = True
+
+    def __init__(self, address, repo: Optional[TimeRepository] = None, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.repo = repo
+        self.buckets = buckets
+        super().__init__(address, _MetricsHandler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "MetricsServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="chronologger-metrics", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    server: MetricsServer
+
+    def do_GET(self) -> None:
+        body = render(self.server.repo, self.server.buckets).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:  # Scrapes are not logged
+        pass
+
+
+def start_http_server(port: int = 9464, host: str = "127.0.0.1", repo: Optional[TimeRepository] = None,
+                      buckets: Sequence[float] = DEFAULT_BUCKETS) -> MetricsServer:
+    """Serves the metrics on http://host:port/ (any path) from a daemon thread. Port 0 picks a free one"""
+    return MetricsServer((host, port), repo, buckets).start()
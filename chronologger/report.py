@@ -0,0 +1,129 @@
+"""Streaming rendering of time events.
+
+Reports are written line by line to any writable file object, so rendering is
+linear in the number of events and the memory used doesn't depend on it:
+
+    render(get_repo().get_all(), sys.stdout, layout=Layout.TABLE, unit=TimeUnit.ms, timer="db")
+    with open("times.csv", "w", newline="") as report_file:
+        render(get_repo().get_all(), report_file, layout=Layout.CSV, kinds=None)
+"""
+import csv
+import enum
+import sys
+from itertools import islice
+from typing import Callable, Collection, Dict, IO, Iterable, Iterator, Optional
+
+from .model import EventKind, Period, TimeEvent, TimeUnit, kind_of
+
+# Events rendered by default, as single ticks are just the boundaries of periods
+DEFAULT_KINDS = (EventKind.LABEL, EventKind.PERIOD)
+# Lines written to the file at once
+BATCH_LINES = 1024
+
+
+class Layout(enum.Enum):
+    TEXT = "text"  # The str() of every event, as shown by print(repo)
+    TABLE = "table"  # Fixed-width columns
+    CSV = "csv"  # Comma separated values with a header, all the times as integer nanoseconds too
+
+
+TABLE_HEADER = f"{'kind':<6} {'timer':<24} {'name':<32} {'time':>14} {'unit':<4} {'weight':>8} {'cpu/wall':>8}"
+CSV_HEADER = ("kind", "timer", "name", "start_ns", "end_ns", "elapsed_ns", "time", "unit", "weight", "cpu_ns",
+              "cpu_ratio", "memory_net", "memory_peak", "memory_source")
+
+
+def _timer_name(time_event: TimeEvent) -> str:
+    return getattr(time_event.time_context, "name", None) or ""
+
+
+def select(time_events: Iterable[TimeEvent], kinds: Optional[Collection[EventKind]] = DEFAULT_KINDS,
+           timer: Optional[str] = None,
+           predicate: Optional[Callable[[TimeEvent], bool]] = None) -> Iterator[TimeEvent]:
+    """Filters the events lazily by kind (None means all of them), timer name and any other condition"""
+    if kinds is not None:
+        kinds = frozenset(kinds)
+        selected_by_class: Dict[type, bool] = {}  # The kind is checked once per class instead of once per event
+
+        def selected(time_event: TimeEvent) -> bool:
+            is_selected = selected_by_class.get(time_event.__class__)
+            if is_selected is None:
+                is_selected = selected_by_class[time_event.__class__] = kind_of(time_event) in kinds
+            return is_selected
+        time_events = filter(selected, time_events)
+    if timer is not None:
+        time_events = (time_event for time_event in time_events if _timer_name(time_event) == timer)
+    if predicate is not None:
+        time_events = filter(predicate, time_events)
+    return iter(time_events)
+
+
+class _Row:
+    """Single line CSV writer. csv.writer needs a file, so lines are collected in this object"""
+
+    def __init__(self):
+        self.line = ""
+
+    def write(self, line: str) -> None:
+        self.line = line
+
+
+def lines(time_events: Iterable[TimeEvent], layout: Layout = Layout.TEXT,
+          unit: Optional[TimeUnit] = None) -> Iterator[str]:
+    """Yields the lines (ending in a new line) of the report of the events passed, in the unit
+    passed or in the one of every event"""
+    if layout is Layout.TEXT:
+        if unit is not None:
+            time_events = (time_event.to(unit) for time_event in time_events)
+        for time_event in time_events:
+            yield str(time_event) + "\n"
+        return
+    if layout is Layout.TABLE:
+        yield TABLE_HEADER + "\n"
+    row = _Row()
+    writer = csv.writer(row, lineterminator="\n")
+    if layout is Layout.CSV:
+        writer.writerow(CSV_HEADER)
+        yield row.line
+    for time_event in time_events:
+        event_unit = unit or time_event.unit
+        weight = getattr(time_event, "weight", 1.0)
+        if isinstance(time_event, Period):
+            start_ns, end_ns = time_event.start.ns(), time_event.end.ns()
+        else:
+            start_ns = end_ns = time_event.ns()
+        kind = kind_of(time_event).name.lower()
+        cpu_ratio = getattr(time_event, "cpu_ratio", None)
+        if layout is Layout.TABLE:
+            cpu = "" if cpu_ratio is None else f"{cpu_ratio:.2f}"
+            yield (f"{kind:<6} {_timer_name(time_event):<24.24} {time_event.name.strip():<32.32} "
+                   f"{time_event.time(event_unit):>14.6f} {event_unit.name:<4} {weight:>8g} {cpu:>8}\n")
+        else:
+            memory = getattr(time_event, "memory", None)
+            writer.writerow((kind, _timer_name(time_event), time_event.name, start_ns, end_ns,
+                             time_event.ns() if isinstance(time_event, Period) else "",
+                             repr(time_event.time(event_unit)), event_unit.name, weight,
+                             "" if cpu_ratio is None else time_event.cpu_ns,
+                             "" if cpu_ratio is None else repr(cpu_ratio),
+                             *(("", "", "") if memory is None else
+                               (memory.net, "" if memory.peak is None else memory.peak, memory.source.value))))
+            yield row.line
+
+
+def write_lines(report_lines: Iterable[str], file: Optional[IO[str]] = None) -> int:
+    """Writes the lines in batches, so huge reports don't cost one call per line. Returns the lines written"""
+    file = file or sys.stdout
+    report_lines = iter(report_lines)
+    written = 0
+    while True:
+        batch = list(islice(report_lines, BATCH_LINES))
+        if not batch:
+            return written
+        file.write("".join(batch))
+        written += len(batch)
+
+
+def render(time_events: Iterable[TimeEvent], file: Optional[IO[str]] = None, layout: Layout = Layout.TEXT,
+           unit: Optional[TimeUnit] = None, kinds: Optional[Collection[EventKind]] = DEFAULT_KINDS,
+           timer: Optional[str] = None, predicate: Optional[Callable[[TimeEvent], bool]] = None) -> int:
+    """Writes the report of the events passed to file (stdout by default). Returns the lines written"""
+    return write_lines(lines(select(time_events, kinds, timer, predicate), layout, unit), file)
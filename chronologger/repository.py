@@ -1,7 +1,19 @@
 import abc
-from typing import Optional, List, Dict
+import bisect
+import enum
+import heapq
+import io
+import itertools
+import threading
+from array import array
+from collections import deque
+from typing import Optional, List, Dict, Tuple, Callable, Iterator, Union, IO, Collection
 
-from .model import TimeEvent, TimeContext, Period, Label
+from .memory import MemoryStats
+from .model import TimeEvent, TimeContext, Period, ChronologgerError, Clock, EventKind, clock_of, kind_of
+from .report import DEFAULT_KINDS, render, write_lines
+from .sinks import log
+from .stats import LatencySketch
 
 
 class AbstractTimeRepository(abc.ABC):
@@ -20,22 +32,109 @@ class AbstractTimeRepository(abc.ABC):
         return f"Repo name: {self.name}"
 
 
+class CallTreeNode:
+    """Aggregated time of the periods measured under the same path of nested timers.
+
+    The same timer nested under different parents ends up in different nodes.
+    Exclusive time is the time not spent in the timers nested in this one.
+    """
+    __slots__ = ("name", "children", "calls", "total_ns")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.children: Dict[str, "CallTreeNode"] = {}
+        self.calls: float = 0
+        self.total_ns: float = 0
+
+    def child(self, name: str) -> "CallTreeNode":
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = CallTreeNode(name)
+        return node
+
+    def add(self, path: Tuple[str, ...], elapsed_ns: int, weight: float = 1) -> None:
+        node = self
+        for name in path:
+            node = node.child(name)
+        node.calls += weight
+        node.total_ns += elapsed_ns * weight
+
+    def find(self, path: Tuple[str, ...]) -> Optional["CallTreeNode"]:
+        node = self
+        for name in path:
+            node = node.children.get(name)
+            if node is None:
+                return None
+        return node
+
+    @property
+    def exclusive_ns(self) -> float:
+        """Never negative: children running at the same time (e.g. asyncio tasks gathered) add up to more
+        than the time of their parent"""
+        return max(self.total_ns - sum(child.total_ns for child in self.children.values()), 0)
+
+    def walk(self, path: Tuple[str, ...] = ()) -> Iterator[Tuple[Tuple[str, ...], "CallTreeNode"]]:
+        """Iterates depth-first over the nodes below this one, with their paths"""
+        for name, child in self.children.items():
+            child_path = path + (name,)
+            yield child_path, child
+            yield from child.walk(child_path)
+
+    def __str__(self) -> str:
+        return "".join(f"{'    ' * (len(path) - 1)}{node.name}: {node.calls:g} calls, "
+                       f"{node.total_ns / 10 ** 9:.3f} s total, {node.exclusive_ns / 10 ** 9:.3f} s exclusive\n"
+                       for path, node in self.walk())
+
+
 class TimeRepository(AbstractTimeRepository):
     def __init__(self, root_time_context: TimeContext):
         self.name = root_time_context.name
         self.root_time_context = root_time_context
         self.time_events: List[TimeEvent] = []
         self.time_contexts: Dict[str, TimeContext] = {}
+        # Functions called with every time event added (e.g. to persist or export them as they arrive)
+        self.listeners: List[Callable[[TimeEvent], None]] = []
+        # Time aggregated by path of nested timers, from the spans of the periods added
+        self.call_tree = CallTreeNode(self.name)
+        # Memory deltas aggregated by timer name, from the periods of timers tracking memory
+        self.memory_stats: Dict[str, MemoryStats] = {}
         self.register(self.root_time_context)
-        self.root_time_context.chrono.logger(f"Repository {self.name} created")
+        log(self.root_time_context.chrono.logger, "Repository %s created", self.name)
 
     def register(self, time_context: TimeContext):
         if not self.time_contexts.get(time_context.name, None):
             self.time_contexts[time_context.name] = time_context
-            self.root_time_context.chrono.logger(f"Timer {time_context.name} registered in repo {self.name}")
+            log(self.root_time_context.chrono.logger, "Timer %s registered in repo %s",
+                time_context.name, self.name)
 
     def add(self, time_event: TimeEvent):
         self.time_events.append(time_event)
+        if isinstance(time_event, Period):
+            self._aggregate(time_event)
+        if self.listeners:
+            self._notify(time_event)
+
+    def _aggregate(self, period: Period) -> None:
+        """Adds the period to the call tree and to the memory stats of its timer"""
+        if period.span is not None:
+            self.call_tree.add(period.span.path, period.ns(), period.weight)
+        if period.memory is not None:
+            timer_name = period.time_context.name if period.time_context is not None else self.name
+            stats = self.memory_stats.get(timer_name)
+            if stats is None:
+                stats = self.memory_stats[timer_name] = MemoryStats(period.memory.source)
+            stats.add(period.memory, period.weight)
+
+    def subscribe(self, listener: Callable[[TimeEvent], None]) -> None:
+        """Calls listener with every time event added from now on, in the thread adding it"""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[TimeEvent], None]) -> None:
+        self.listeners.remove(listener)
+
+    def _notify(self, time_event: TimeEvent) -> None:
+        for listener in self.listeners:
+            listener(time_event)
 
     def get(self, time_context: TimeContext) -> List[TimeEvent]:
         return self.time_contexts.get(time_context.name).get_all()
@@ -43,12 +142,281 @@ class TimeRepository(AbstractTimeRepository):
     def get_all(self) -> List[TimeEvent]:
         return self.time_events
 
+    def to_numpy(self):
+        """The periods in the repository as NumPy columns: timer names, elapsed and start ns and weights"""
+        from .analysis import periods
+        return periods(self.get_all())
+
+    def flush(self) -> None:
+        """Makes visible all the time events pending to be added. Nothing to do here as they are added right away"""
+        pass
+
+    def report(self, file: Optional[IO[str]] = None, **options) -> int:
+        """Streams the report of the time events to file (stdout by default). The options are the ones of
+        report.render (layout, unit, kinds, timer, predicate). Returns the lines written"""
+        return render(self.get_all(), file, **options)
+
     def __str__(self):
-        representation = ""
-        for time_event in self.time_events:  # TODO Skip printing single tick events (e.g. create an enum to differentiate TimeEvent types)
-            if isinstance(time_event, Label) or isinstance(time_event, Period):
-                representation += str(time_event) + "\n"
-        return representation
+        representation = io.StringIO()
+        self.report(representation)
+        return representation.getvalue()
+
+
+class ConcurrentTimeRepository(TimeRepository):
+    """A repository that can be fed from many threads at the same time.
+
+    Each thread appends its time events to its own buffer, so no locks are taken
+    when recording. The buffers are merged into the repository events when they
+    are read (get_all(), str()) or explicitly flushed.
+    """
+
+    def __init__(self, root_time_context: TimeContext):
+        self._local = threading.local()
+        self._buffers: List[Tuple[threading.Thread, List[TimeEvent]]] = []
+        self._buffers_lock = threading.Lock()
+        TimeRepository.__init__(self, root_time_context)
+
+    def _new_buffer(self) -> List[TimeEvent]:
+        buffer = self._local.buffer = []
+        with self._buffers_lock:
+            self._buffers.append((threading.current_thread(), buffer))
+        return buffer
+
+    def add(self, time_event: TimeEvent):
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._new_buffer()
+        buffer.append(time_event)
+        if self.listeners:
+            self._notify(time_event)
+
+    def get_all(self) -> List[TimeEvent]:
+        self.flush()
+        return self.time_events
+
+    def flush(self) -> None:
+        """Moves the time events in the per-thread buffers to the repository.
+
+        Only the events seen when copying are removed from each buffer, so the
+        owner thread can keep appending while the flush is happening."""
+        with self._buffers_lock:
+            alive_buffers = []
+            for thread, buffer in self._buffers:
+                pending = len(buffer)
+                time_events = buffer[:pending]
+                del buffer[:pending]
+                self.time_events.extend(time_events)
+                for time_event in time_events:  # Aggregates are only updated here, so no locks are needed
+                    if isinstance(time_event, Period):
+                        self._aggregate(time_event)
+                if thread.is_alive() or len(buffer) > 0:
+                    alive_buffers.append((thread, buffer))
+            self._buffers = alive_buffers
+
+
+class StatsTimeRepository(TimeRepository):
+    """A repository that keeps statistics instead of time events, so its memory doesn't grow over time.
+
+    Every period added is counted in a constant-memory latency sketch of the timer
+    that created it. Single ticks and labels are not kept.
+    """
+
+    def __init__(self, root_time_context: TimeContext, significant_bits: int = 7):
+        self.significant_bits = significant_bits
+        self.sketches: Dict[str, LatencySketch] = {}
+        TimeRepository.__init__(self, root_time_context)
+
+    def sketch(self, timer_name: str) -> LatencySketch:
+        """Returns the latency sketch of the timer named timer_name (it's created if it doesn't exist yet)"""
+        sketch = self.sketches.get(timer_name)
+        if sketch is None:
+            sketch = self.sketches[timer_name] = LatencySketch(self.significant_bits)
+        return sketch
+
+    def add(self, time_event: TimeEvent):
+        if isinstance(time_event, Period):
+            time_context = time_event.time_context
+            timer_name = time_context.name if time_context is not None else self.name
+            self.sketch(timer_name).record(time_event.ns(), time_event.weight)
+            self._aggregate(time_event)
+        if self.listeners:
+            self._notify(time_event)
+
+    def merge(self, sketches: Dict[str, LatencySketch]) -> None:
+        """Merges the sketches passed (e.g. from another repository or process) with the ones in this repository"""
+        for timer_name, sketch in sketches.items():
+            self.sketch(timer_name).merge(sketch)
+
+    def report(self, file: Optional[IO[str]] = None, **options) -> int:
+        """Streams the summary of the latency sketch (and of the memory, if tracked) of every timer, as no events
+        are kept to report"""
+        return write_lines(itertools.chain(
+            (f"{timer_name}: {sketch}\n" for timer_name, sketch in self.sketches.items()),
+            (f"{timer_name} memory: {stats}\n" for timer_name, stats in self.memory_stats.items())), file)
+
+
+class Eviction(enum.Enum):
+    """Policies to decide which time events are retained in a BoundedTimeRepository"""
+    OLDEST = "oldest"  # Drop the oldest events first
+    SLOWEST = "slowest"  # Keep the slowest periods of each timer
+    WINDOW = "window"  # Keep only the events in a recent time window
+
+
+def _timestamp_ns(time_event: TimeEvent) -> int:
+    """Periods are placed in time when they finish"""
+    return time_event.end.ns() if isinstance(time_event, Period) else time_event.ns()
+
+
+class BoundedTimeRepository(TimeRepository):
+    """A repository with bounded memory, so it can be left on in production.
+
+    The events are kept in a fixed-size ring buffer and the eviction policy decides
+    which ones are retained:
+    - Eviction.OLDEST: the oldest events are dropped first
+    - Eviction.SLOWEST: the capacity slowest periods of each timer are retained. The
+      rest of the events (ticks, labels) are dropped oldest first. The capacity applies
+      per timer, so up to capacity * (timers + 1) events are retained
+    - Eviction.WINDOW: only the events of the last window_secs seconds are retained
+    """
+
+    def __init__(self, root_time_context: TimeContext, capacity: int = 10000,
+                 eviction: Eviction = Eviction.OLDEST, window_secs: float = 60.0):
+        if capacity <= 0:
+            raise ChronologgerError(f"The capacity of a bounded repository must be positive (got {capacity})")
+        self.capacity = capacity
+        self.eviction = eviction
+        self.window_ns = int(window_secs * 10 ** 9)
+        # Min-heaps of (elapsed ns, insertion order, period) per timer name, for the SLOWEST policy
+        self.slowest_periods: Dict[str, List[Tuple[int, int, Period]]] = {}
+        self._insertion_order = itertools.count()
+        TimeRepository.__init__(self, root_time_context)
+        self.time_events = deque(maxlen=capacity)
+
+    def add(self, time_event: TimeEvent):
+        if self.listeners:
+            self._notify(time_event)
+        if isinstance(time_event, Period):
+            self._aggregate(time_event)
+        if self.eviction is Eviction.SLOWEST and isinstance(time_event, Period):
+            self._keep_if_slowest(time_event)
+            return
+        self.time_events.append(time_event)
+        if self.eviction is Eviction.WINDOW:
+            self._evict_expired()
+
+    def _keep_if_slowest(self, period: Period) -> None:
+        timer_name = period.time_context.name if period.time_context is not None else self.name
+        periods = self.slowest_periods.setdefault(timer_name, [])
+        entry = (period.ns(), next(self._insertion_order), period)
+        if len(periods) < self.capacity:
+            heapq.heappush(periods, entry)
+        else:
+            heapq.heappushpop(periods, entry)
+
+    def _evict_expired(self) -> None:
+        """Events are compared with the current time of the clock of their timer, as clocks have different origins"""
+        now_ns: Dict[Clock, int] = {}
+        while self.time_events:
+            oldest = self.time_events[0]
+            clock = clock_of(oldest)
+            if clock not in now_ns:
+                now_ns[clock] = clock.read()
+            if _timestamp_ns(oldest) >= now_ns[clock] - self.window_ns:
+                return
+            self.time_events.popleft()
+
+    def get_all(self) -> List[TimeEvent]:
+        """Returns the time events retained, in time order"""
+        if self.eviction is Eviction.WINDOW:
+            self._evict_expired()
+        time_events = list(self.time_events)
+        if self.eviction is Eviction.SLOWEST:
+            time_events.extend(period for periods in self.slowest_periods.values() for _, _, period in periods)
+            time_events.sort(key=_timestamp_ns)
+        return time_events
+
+
+class _TimeIndex:
+    """Time events sorted by timestamp. Events arrive (almost) in time order, so adding is usually an append"""
+    __slots__ = ("timestamps", "events")
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.events: List[TimeEvent] = []
+
+    def add(self, timestamp_ns: int, time_event: TimeEvent) -> None:
+        if not self.timestamps or timestamp_ns >= self.timestamps[-1]:
+            self.timestamps.append(timestamp_ns)
+            self.events.append(time_event)
+        else:  # e.g. a period added after a tick that happened later
+            position = bisect.bisect_right(self.timestamps, timestamp_ns)
+            self.timestamps.insert(position, timestamp_ns)
+            self.events.insert(position, time_event)
+
+    def between(self, start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> List[TimeEvent]:
+        """Events with start_ns <= timestamp < end_ns, in time order"""
+        low = 0 if start_ns is None else bisect.bisect_left(self.timestamps, start_ns)
+        high = len(self.events) if end_ns is None else bisect.bisect_left(self.timestamps, end_ns)
+        return self.events[low:high]
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+
+class IndexedTimeRepository(TimeRepository):
+    """A repository that indexes the time events as they are added, so they can be queried
+    by timer, by kind and by time range without scanning all of them.
+
+    Every combination of timer and kind has its own time-sorted index, so queries take
+    logarithmic time plus the number of events returned. Periods are placed in time when
+    they finish. Events are indexed by the name of their timer (time context).
+    """
+
+    def __init__(self, root_time_context: TimeContext):
+        self.indexes: Dict[Tuple[Optional[str], Optional[EventKind]], _TimeIndex] = {}
+        TimeRepository.__init__(self, root_time_context)
+
+    def _index(self, key: Tuple[Optional[str], Optional[EventKind]]) -> _TimeIndex:
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.indexes[key] = _TimeIndex()
+        return index
+
+    def add(self, time_event: TimeEvent):
+        timestamp_ns = _timestamp_ns(time_event)
+        timer_name = getattr(time_event.time_context, "name", None)
+        kind = kind_of(time_event)
+        for key in ((None, None), (timer_name, None), (None, kind), (timer_name, kind)):
+            self._index(key).add(timestamp_ns, time_event)
+        TimeRepository.add(self, time_event)
+
+    def query(self, timer: Optional[Union[str, TimeContext]] = None, kind: Optional[EventKind] = None,
+              start_ns: Optional[int] = None, end_ns: Optional[int] = None) -> List[TimeEvent]:
+        """Returns the events of the timer (or timer name) and kind passed, whose timestamp (in
+        perf_counter nanoseconds) is in [start_ns, end_ns). Filters not passed match everything"""
+        timer_name = timer if timer is None or isinstance(timer, str) else timer.name
+        index = self.indexes.get((timer_name, kind))
+        return [] if index is None else index.between(start_ns, end_ns)
+
+    def periods(self, timer: Optional[Union[str, TimeContext]] = None, start_ns: Optional[int] = None,
+                end_ns: Optional[int] = None) -> List[Period]:
+        return self.query(timer, EventKind.PERIOD, start_ns, end_ns)
+
+    def timers(self) -> List[str]:
+        """Names of the timers with events in the repository"""
+        return [timer_name for timer_name, kind in self.indexes if timer_name is not None and kind is None]
+
+    def report(self, file: Optional[IO[str]] = None, kinds: Optional[Collection[EventKind]] = DEFAULT_KINDS,
+               timer: Optional[str] = None, **options) -> int:
+        """Streams the report of the events selected through the indexes, so the events of other kinds
+        or timers are not even visited"""
+        keys = [(timer, None)] if kinds is None else [(timer, kind) for kind in kinds]
+        indexes = [self.indexes[key] for key in keys if key in self.indexes]
+        # Every index is already sorted, so they're just merged
+        time_events = (time_event for _, time_event in heapq.merge(
+            *(zip(index.timestamps, index.events) for index in indexes), key=lambda entry: entry[0]))
+        return render(time_events, file, kinds=None, **options)
 
 
 class RootTimeRepository(TimeRepository):
@@ -67,13 +435,26 @@ def init_repo(time_context: TimeContext = None):
 
     global time_repo
     if not time_repo:
-        time_context.chrono.logger(f"Creating root repo {time_context.name}")
+        log(time_context.chrono.logger, "Creating root repo %s", time_context.name)
         time_repo = RootTimeRepository(time_context)
     return time_repo
 
 
-def get_repo() -> Optional[TimeRepository]:
+def set_repo(repo: TimeRepository) -> Optional[TimeRepository]:
+    """
+    Replaces the root time_repo (e.g. with a ConcurrentTimeRepository) and returns the previous one.
+    """
+    global time_repo
+    previous_repo = time_repo
+    time_repo = repo
+    return previous_repo
+
+
+def get_repo() -> TimeRepository:
     """
-    Returns the root time_repo.
+    Returns the root time_repo. If it doesn't exist yet, it is created with the root timer.
     """
+    if time_repo is None:
+        from .timer import get_root_timer  # Imported here as timer depends on this module
+        get_root_timer()
     return time_repo
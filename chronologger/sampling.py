@@ -0,0 +1,93 @@
+import math
+import random
+from abc import ABC, abstractmethod
+
+from .model import ChronologgerError
+
+
+class SamplingPolicy(ABC):
+    """Decides which invocations of a timer are measured.
+
+    The weight is the number of invocations represented by the last sampled one,
+    and it's used to scale the statistics reported. Counters are not synchronized,
+    so under heavy concurrency the sampling rate is approximate.
+    """
+    weight: float = 1.0
+
+    @abstractmethod
+    def sample(self) -> bool:
+        """Hot path. Returns True when the current invocation has to be measured"""
+        raise NotImplementedError
+
+    def measured(self, elapsed_ns: int) -> None:
+        """Called with the time elapsed in every sampled invocation"""
+        pass
+
+
+class EveryN(SamplingPolicy):
+    """Measures one in every n invocations"""
+
+    def __init__(self, n: int):
+        if n < 1:
+            raise ChronologgerError(f"The sampling period must be 1 or greater (got {n})")
+        self.n = n
+        self.weight = n
+        self._skipped = n - 1  # So the first invocation is sampled
+
+    def sample(self) -> bool:
+        self._skipped += 1
+        if self._skipped < self.n:
+            return False
+        self._skipped = 0
+        return True
+
+
+class Probabilistic(SamplingPolicy):
+    """Measures every invocation with probability p"""
+
+    def __init__(self, p: float):
+        if not 0 < p <= 1:
+            raise ChronologgerError(f"The sampling probability must be in the range (0, 1] (got {p})")
+        self.p = p
+        self.weight = 1 / p
+        self._random = random.random
+
+    def sample(self) -> bool:
+        return self._random() < self.p
+
+
+class Adaptive(SamplingPolicy):
+    """Adapts the sampling period so the cost of measuring stays below a fraction of the time measured.
+
+    The period is recalculated after every sampled invocation from an exponential
+    moving average of the elapsed times and the estimated overhead per measurement
+    (e.g. the one reported by a calibration).
+    """
+
+    def __init__(self, budget: float = 0.01, overhead_ns: int = 2000, smoothing: float = 0.1,
+                 max_period: int = 1_000_000):
+        if not 0 < budget <= 1:
+            raise ChronologgerError(f"The overhead budget must be in the range (0, 1] (got {budget})")
+        self.budget = budget
+        self.overhead_ns = overhead_ns
+        self.smoothing = smoothing
+        self.max_period = max_period
+        self.period = 1
+        self.mean_elapsed_ns = None
+        self._skipped = 0
+
+    def sample(self) -> bool:
+        self._skipped += 1
+        if self._skipped < self.period:
+            return False
+        self.weight = self._skipped
+        self._skipped = 0
+        return True
+
+    def measured(self, elapsed_ns: int) -> None:
+        if self.mean_elapsed_ns is None:
+            self.mean_elapsed_ns = elapsed_ns
+        else:
+            self.mean_elapsed_ns += self.smoothing * (elapsed_ns - self.mean_elapsed_ns)
+        period = math.ceil(self.overhead_ns / (self.budget * max(self.mean_elapsed_ns, 1)))
+        self.period = min(max(period, 1), self.max_period)
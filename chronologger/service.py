@@ -1,6 +1,7 @@
-from .model import TimeEvent, Label
+from typing import IO, Optional
+
+from .model import TimeEvent, Label, TimeContext
 from .repository import get_repo
-from .timer import TimeContext
 
 
 def register(timer: TimeContext):
@@ -17,6 +18,7 @@ def record(time_event: TimeEvent):
     get_repo().add(time_event)
 
 
-def show_time():
-    """It's show time!!!"""
-    print(get_repo())
+def show_time(file: Optional[IO[str]] = None, **options) -> None:
+    """It's show time!!! Streams the report of the root repository to file (stdout by default).
+    The options are the ones of report.render (layout, unit, kinds, timer, predicate)"""
+    get_repo().report(file, **options)
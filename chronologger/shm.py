@@ -0,0 +1,240 @@
+"""Collection of time events from many processes through shared memory.
+
+The parent process creates a SharedMemoryCollector, which holds one ring buffer
+(lane) per worker process in a single shared memory block. Workers attach to it
+(e.g. as the initializer of a pool) and from then on their time events are
+written as fixed-size records in their lane, instead of being kept in their
+own repository. The parent drains the lanes into its repository, attaching the
+process and thread ids of the workers to the events. When a lane is full the
+worker drops events (and counts them) instead of blocking.
+
+    collector = SharedMemoryCollector(lanes=os.cpu_count())
+    with ProcessPoolExecutor(initializer=collector.attach) as pool:
+        ...
+    collector.drain()
+    collector.close()
+"""
+import multiprocessing
+import os
+import struct
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.util import Finalize
+from typing import List, NamedTuple, Optional
+
+from .model import BoundaryTick, ChronologgerError, EventKind, Label, Period, Tick, TimeContext, TimeEvent, TimeUnit, kind_of
+from .repository import TimeRepository, get_repo, set_repo
+
+# head (next record written), tail (next record read), owner pid, dropped records
+LANE_HEADER = struct.Struct("<QQQQ")
+# kind, unit, flags, pid, start ns, end ns, thread id, weight, event name, timer name
+RECORD = struct.Struct("<BBBxIqqQd40s40s")
+# Flag of the ticks starting or ending a period (see model.BoundaryTick)
+BOUNDARY = 1
+NAME_SIZE = 40
+
+_units_by_exponent = {unit.x: unit for unit in TimeUnit}
+
+try:
+    _thread_id = threading.get_native_id
+except AttributeError:  # Python < 3.8
+    _thread_id = threading.get_ident
+
+
+class ProcessTimeContext(NamedTuple):
+    """Time context of the events collected from other processes"""
+    name: str
+    pid: int
+    tid: int
+
+
+def _encode(name: Optional[str]) -> bytes:
+    return (name or "").encode("utf-8")[:NAME_SIZE]
+
+
+def _decode(name: bytes) -> str:
+    return name.rstrip(b"\0").decode("utf-8", errors="ignore")
+
+
+class _Lane:
+    """Single producer/single consumer ring of records in the shared memory block"""
+
+    def __init__(self, buffer: memoryview, offset: int, capacity: int):
+        self.buffer = buffer
+        self.offset = offset
+        self.capacity = capacity
+        self.records_offset = offset + LANE_HEADER.size
+
+    def header(self):
+        return LANE_HEADER.unpack_from(self.buffer, self.offset)
+
+    def set_owner(self, pid: int) -> None:
+        """Only the owner field is written, as the drainer may be moving the tail meanwhile"""
+        self._set(2, pid)
+
+    def _set(self, index: int, value: int) -> None:
+        struct.pack_into("<Q", self.buffer, self.offset + 8 * index, value)
+
+    def append(self, record: bytes) -> bool:
+        head, tail, _, dropped = self.header()
+        if head - tail >= self.capacity:
+            self._set(3, dropped + 1)
+            return False
+        position = self.records_offset + (head % self.capacity) * RECORD.size
+        self.buffer[position:position + RECORD.size] = record
+        self._set(0, head + 1)  # Published only once the record is written
+        return True
+
+    def pop_all(self) -> List[tuple]:
+        head, tail, _, _ = self.header()
+        records = []
+        for index in range(tail, head):
+            records.append(RECORD.unpack_from(self.buffer, self.records_offset + (index % self.capacity) * RECORD.size))
+        self._set(1, head)
+        return records
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """Attaches to a block created by other process, which is the only one responsible of unlinking it"""
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:  # Python < 3.13 always registers the block in the resource tracker
+        memory = shared_memory.SharedMemory(name)
+        try:
+            resource_tracker.unregister(memory._name, "shared_memory")
+        except Exception:  # pylint: disable=broad-except
+            pass
+        return memory
+
+
+class SharedMemoryTimeRepository(TimeRepository):
+    """Repository of the worker processes. It writes every time event to the lane of the process"""
+
+    def __init__(self, root_time_context: TimeContext, lane: _Lane):
+        self.lane = lane
+        self._lane_lock = threading.Lock()  # Many threads of the worker may be producing
+        self.pid = os.getpid()
+        TimeRepository.__init__(self, root_time_context)
+
+    def add(self, time_event: TimeEvent):
+        if isinstance(time_event, Period):
+            start_ns, weight = time_event.start.ns(), time_event.weight
+            end_ns = start_ns + time_event.ns()  # Keeps the overhead correction, if any
+        else:
+            start_ns = end_ns = time_event.ns()
+            weight = 1.0
+        timer_name = getattr(time_event.time_context, "name", None)
+        flags = BOUNDARY if isinstance(time_event, BoundaryTick) else 0
+        record = RECORD.pack(kind_of(time_event), time_event.unit.x, flags, self.pid, start_ns, end_ns, _thread_id(),
+                             weight, _encode(time_event.name), _encode(timer_name))
+        with self._lane_lock:
+            self.lane.append(record)
+        if self.listeners:
+            self._notify(time_event)
+
+
+class SharedMemoryCollector:
+    """Shared memory block with one ring of capacity records per lane (i.e. per worker process)"""
+
+    def __init__(self, lanes: Optional[int] = None, capacity: int = 8192):
+        self.lanes = lanes or os.cpu_count() or 1
+        self.capacity = capacity
+        self.lane_size = LANE_HEADER.size + capacity * RECORD.size
+        self.memory = shared_memory.SharedMemory(create=True, size=self.lanes * self.lane_size)
+        self.memory.buf[:self.lanes * self.lane_size] = bytes(self.lanes * self.lane_size)
+        self._claim_lock = multiprocessing.Lock()
+        self._owner_pid = os.getpid()
+        self._drainer: Optional[threading.Thread] = None
+        self._stop_draining = threading.Event()
+
+    def __getstate__(self):
+        """Only the name of the shared memory block travels to the workers"""
+        state = self.__dict__.copy()
+        state["memory"] = self.memory.name
+        state["_drainer"] = None
+        state["_stop_draining"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.memory = _attach_shared_memory(state["memory"])
+
+    def _lane(self, index: int) -> _Lane:
+        return _Lane(self.memory.buf, index * self.lane_size, self.capacity)
+
+    def attach(self) -> None:
+        """Called in a worker process (e.g. as a pool initializer). Claims a lane and makes
+        the root repository of the process write its time events to it"""
+        from .timer import get_root_timer  # Imported here as timer depends on the repository module
+        pid = os.getpid()
+        with self._claim_lock:
+            for index in range(self.lanes):
+                lane = self._lane(index)
+                if lane.header()[2] == 0:
+                    lane.set_owner(pid)
+                    break
+            else:
+                raise ChronologgerError(f"All the {self.lanes} lanes of the collector are in use")
+        set_repo(SharedMemoryTimeRepository(get_root_timer(), lane))
+        # Free the lane when the worker finishes, so other workers can reuse it
+        Finalize(self, self._release, args=(index, pid), exitpriority=10)
+
+    def _release(self, index: int, pid: int) -> None:
+        with self._claim_lock:
+            lane = self._lane(index)
+            if lane.header()[2] == pid:
+                lane.set_owner(0)
+
+    def dropped(self) -> int:
+        """Number of events that didn't fit in the lanes"""
+        return sum(self._lane(index).header()[3] for index in range(self.lanes))
+
+    def drain(self, repo: Optional[TimeRepository] = None) -> int:
+        """Moves the events written by the workers so far to the repository passed (the root one by default)"""
+        repo = repo if repo is not None else get_repo()
+        drained = 0
+        for index in range(self.lanes):
+            for (kind, unit_exponent, flags, pid, start_ns, end_ns, tid, weight, name,
+                 timer_name) in self._lane(index).pop_all():
+                unit = _units_by_exponent[unit_exponent]
+                time_context = ProcessTimeContext(_decode(timer_name) or repo.name, pid, tid)
+                name = _decode(name)
+                if kind == EventKind.PERIOD:
+                    time_event = Period(name, time_context, unit,
+                                        BoundaryTick(f"{name} start", time_context, unit, start_ns),
+                                        BoundaryTick(f"{name} end", time_context, unit, end_ns), weight)
+                elif kind == EventKind.LABEL:
+                    time_event = Label(name, time_context, unit, start_ns)
+                else:
+                    tick_type = BoundaryTick if flags & BOUNDARY else Tick
+                    time_event = tick_type(name, time_context, unit, start_ns)
+                repo.add(time_event)
+                drained += 1
+        return drained
+
+    def start(self, interval: float = 0.5, repo: Optional[TimeRepository] = None) -> None:
+        """Drains the lanes from a background thread every interval seconds"""
+        def drain_periodically():
+            while not self._stop_draining.wait(interval):
+                self.drain(repo)
+        self._drainer = threading.Thread(target=drain_periodically, name="chronologger-drainer", daemon=True)
+        self._drainer.start()
+
+    def close(self, repo: Optional[TimeRepository] = None) -> None:
+        """Drains the events left and frees the shared memory (only in the process that created it)"""
+        if self._drainer is not None:
+            self._stop_draining.set()
+            self._drainer.join()
+            self._drainer = None
+        if os.getpid() != self._owner_pid:
+            self.memory.close()
+            return
+        self.drain(repo)
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self) -> "SharedMemoryCollector":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,169 @@
+import atexit
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, TextIO, Union
+
+if TYPE_CHECKING:  # logging is imported by the LoggingSinks only
+    import logging
+
+# Default level of the LoggingSinks, the value of logging.INFO
+INFO = 20
+
+
+class Sink(ABC):
+    """Destination of the messages logged by the library.
+
+    Messages are passed as a %-style template plus its arguments, and they are only
+    formatted when (and if) they are written. Sinks are also callables accepting a
+    single string, so they can be used wherever a logger function is expected.
+    """
+    # Whether messages are formatted after emit returns, so their arguments must not change meanwhile
+    asynchronous: bool = False
+
+    @abstractmethod
+    def emit(self, template: str, *args: Any) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+    def __call__(self, message: str, *args: Any) -> None:
+        self.emit(message, *args)
+
+
+def format_message(template: str, args: tuple) -> str:
+    if not args:
+        return str(template)
+    try:
+        return template % args
+    except (TypeError, ValueError):
+        return " ".join(str(part) for part in (template,) + args)
+
+
+class PrintSink(Sink):
+    """Writes every message synchronously, as print does (this is the default sink)"""
+
+    def __init__(self, file: Optional[TextIO] = None):
+        self.file = file
+
+    def emit(self, template: str, *args: Any) -> None:
+        print(format_message(template, args), file=self.file or sys.stdout)
+
+
+class LoggingSink(Sink):
+    """Adapter to the standard logging module. Nothing is formatted when the level is disabled"""
+
+    def __init__(self, logger: Optional["logging.Logger"] = None, level: int = INFO):
+        import logging  # Imported here, so the sinks not using it don't pay for its import
+        self.logger = logger or logging.getLogger("chronologger")
+        self.level = level
+
+    def emit(self, template: str, *args: Any) -> None:
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, template, *args)
+
+
+_STOP = object()
+
+
+class QueueSink(Sink):
+    """Writes the messages from a background thread, so the instrumented code only pays for a queue put.
+
+    Messages are formatted in the writer thread and written in batches of up to
+    batch_size lines, waiting at most flush_interval seconds to fill a batch.
+    Pending messages are written when the sink is flushed, closed or the process exits.
+    Messages emitted once it's closed are dropped.
+    """
+    asynchronous = True
+
+    def __init__(self, file: Optional[TextIO] = None, batch_size: int = 512, flush_interval: float = 0.1):
+        self.file = file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        import queue
+        self._empty = queue.Empty
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_batches, name="chronologger-sink", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def emit(self, template: str, *args: Any) -> None:
+        if self._closed:  # Nothing would write it
+            return
+        self._queue.put((template, args))
+
+    def _next_batch(self) -> List[Any]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not isinstance(batch[-1], threading.Event) and batch[-1] is not _STOP:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except self._empty:
+                break
+        return batch
+
+    def _write_batches(self) -> None:
+        while True:
+            batch = self._next_batch()
+            lines = [format_message(*item) for item in batch if isinstance(item, tuple)]
+            if lines:
+                file = self.file or sys.stdout
+                file.write("\n".join(lines) + "\n")
+                file.flush()
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+                elif item is _STOP:
+                    return
+
+    def flush(self) -> None:
+        """Blocks until all the messages emitted so far are written"""
+        if self._closed:
+            return
+        written = threading.Event()
+        self._queue.put(written)
+        written.wait()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+
+
+Logger = Union[Sink, Callable[[str], None]]
+
+_default_sink: Logger = PrintSink()
+
+
+def get_default_sink() -> Logger:
+    """Returns the sink used by new timers when none is passed explicitly"""
+    return _default_sink
+
+
+def set_default_sink(sink: Logger) -> Logger:
+    """Sets the sink used by new timers and returns the previous one"""
+    global _default_sink
+    previous_sink = _default_sink
+    _default_sink = sink
+    return previous_sink
+
+
+def log(logger: Optional[Logger], template: str, *args: Any) -> None:
+    """Sends a message to a sink or, for backwards compatibility, to a plain function such as print"""
+    if logger is None:
+        return
+    if isinstance(logger, Sink):
+        logger.emit(template, *args)
+    else:
+        logger(format_message(template, args))
@@ -0,0 +1,179 @@
+import bisect
+import itertools
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from .model import ChronologgerError, TimeUnit
+
+Count = Union[int, float]
+
+
+class LatencySketch:
+    """Constant-memory distribution of latencies (in nanoseconds) in the style of an HDR histogram.
+
+    Values are counted in log-linear buckets: each power of two is split in
+    2 ** (significant_bits - 1) sub-buckets, so the relative error of any reported
+    percentile is below 2 ** -(significant_bits - 1) (< 1.6% with the default 7 bits).
+    The number of buckets is bounded (less than 4K for 64 bit values) whatever the
+    number of recorded values. Sketches with the same precision can be merged, e.g. to
+    aggregate the latencies of different timers or processes.
+    """
+
+    def __init__(self, significant_bits: int = 7):
+        if significant_bits < 2:
+            raise ChronologgerError(f"At least 2 significant bits are required (got {significant_bits})")
+        self.significant_bits = significant_bits
+        self._sub_bucket_count = 1 << significant_bits
+        self._sub_bucket_half = self._sub_bucket_count >> 1
+        self.counts: List[Count] = []
+        self.count: Count = 0
+        self.total: Count = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+
+    def _index(self, value: int) -> int:
+        if value < self._sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.significant_bits
+        return (shift + 1) * self._sub_bucket_half + (value >> shift) - self._sub_bucket_half
+
+    def _bucket_bounds(self, index: int):
+        """Returns the lowest and highest values counted in the bucket at index"""
+        if index < self._sub_bucket_count:
+            return index, index
+        shift = index // self._sub_bucket_half - 1
+        sub_bucket = index - shift * self._sub_bucket_half
+        return sub_bucket << shift, ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value_ns: int, count: Count = 1) -> None:
+        """Adds a value (count times, e.g. to scale sampled values) to the distribution"""
+        value_ns = max(int(value_ns), 0)
+        index = self._index(value_ns)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += count
+        self.count += count
+        self.total += value_ns * count
+        if self.min is None or value_ns < self.min:
+            self.min = value_ns
+        if self.max is None or value_ns > self.max:
+            self.max = value_ns
+
+    def merge(self, other: "LatencySketch") -> "LatencySketch":
+        """Adds the values of other sketch to this one"""
+        if other.significant_bits != self.significant_bits:
+            raise ChronologgerError(f"Can't merge sketches with different precision "
+                                    f"({self.significant_bits} vs {other.significant_bits} significant bits)")
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percentile: float) -> float:
+        """Returns the (approximate) value in nanoseconds below which the percentile % of the values fall"""
+        if not 0 <= percentile <= 100:
+            raise ChronologgerError(f"Percentile must be in the range [0, 100] (got {percentile})")
+        if not self.count:
+            return 0.0
+        rank = percentile / 100 * self.count
+        cumulative_count = 0
+        for index, count in enumerate(self.counts):
+            cumulative_count += count
+            if count and cumulative_count >= rank:
+                lowest, highest = self._bucket_bounds(index)
+                return float(min(max((lowest + highest) / 2, self.min), self.max))
+        return float(self.max)
+
+    def cumulative_counts(self, bounds_ns: Sequence[int]) -> List[Count]:
+        """Returns how many values are below or equal to each of the (sorted) bounds passed, e.g. for the
+        buckets of a Prometheus histogram. Buckets of the sketch are counted in the first bound above
+        their highest value, so counts have the precision of the sketch"""
+        return self.histogram(bounds_ns)[0]
+
+    def histogram(self, bounds_ns: Sequence[int]) -> Tuple[List[Count], Count]:
+        """The cumulative counts of the bounds passed and the count of all the values, both taken from the same
+        copy of the buckets, so they agree even if other thread is recording"""
+        counts: List[Count] = [0] * len(bounds_ns)
+        total_count: Count = 0
+        for index, count in enumerate(list(self.counts)):
+            if count:
+                total_count += count
+                position = bisect.bisect_left(bounds_ns, self._bucket_bounds(index)[1])
+                if position < len(counts):
+                    counts[position] += count
+        return list(itertools.accumulate(counts)), total_count
+
+    @property
+    def p50(self) -> float:
+        return self.percentile(50)
+
+    @property
+    def p90(self) -> float:
+        return self.percentile(90)
+
+    @property
+    def p99(self) -> float:
+        return self.percentile(99)
+
+    @property
+    def p999(self) -> float:
+        return self.percentile(99.9)
+
+    def summary(self, unit: TimeUnit = TimeUnit.ms) -> Dict[str, float]:
+        """Returns the count and the main statistics of the distribution in the unit passed"""
+        return {
+            "count": self.count,
+            "mean": unit.from_ns(self.mean()),
+            "min": unit.from_ns(self.min or 0),
+            "max": unit.from_ns(self.max or 0),
+            "p50": unit.from_ns(self.p50),
+            "p90": unit.from_ns(self.p90),
+            "p99": unit.from_ns(self.p99),
+            "p999": unit.from_ns(self.p999),
+        }
+
+    def to_dict(self) -> Dict:
+        """Sparse and JSON serializable representation, e.g. to send the sketch to other process"""
+        return {
+            "significant_bits": self.significant_bits,
+            "counts": {index: count for index, count in enumerate(self.counts) if count},
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, representation: Dict) -> "LatencySketch":
+        sketch = cls(representation["significant_bits"])
+        counts = {int(index): count for index, count in representation["counts"].items()}
+        if counts:
+            sketch.counts = [0] * (max(counts) + 1)
+            for index, count in counts.items():
+                sketch.counts[index] = count
+        sketch.count = representation["count"]
+        sketch.total = representation["total"]
+        sketch.min = representation["min"]
+        sketch.max = representation["max"]
+        return sketch
+
+    def __len__(self) -> int:
+        return int(self.count)
+
+    def describe(self, unit: TimeUnit = TimeUnit.ms) -> str:
+        summary = self.summary(unit)
+        return (f"count: {summary['count']}, mean: {summary['mean']:.3f} {unit.name}, "
+                f"min: {summary['min']:.3f} {unit.name}, max: {summary['max']:.3f} {unit.name}, "
+                f"p50: {summary['p50']:.3f} {unit.name}, p90: {summary['p90']:.3f} {unit.name}, "
+                f"p99: {summary['p99']:.3f} {unit.name}, p999: {summary['p999']:.3f} {unit.name}")
+
+    def __str__(self) -> str:
+        return self.describe()
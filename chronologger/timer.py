@@ -1,57 +1,405 @@
-from typing import Any, cast
+import inspect
+import itertools
+import threading
+from contextvars import ContextVar
+from functools import partial, wraps
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Tuple, cast
 
-from chronologger.model import Period, TimeContext, TimeEvent, Chronologger, TimeUnit, Label
-from chronologger.repository import init_repo
+from chronologger import config
+from chronologger.memory import start_tracking, stop_tracking
+from chronologger.model import (BoundaryTick, Chronologger, Clock, ColumnarEventRecorder, EventRecorder, Label, Period,
+                                Span, Tick, TimeContext, TimeEvent, TimerStats, TimeUnit, current_thread_id)
+from chronologger.repository import AbstractTimeRepository, init_repo, get_repo
+from chronologger.sampling import SamplingPolicy
 from chronologger.service import record, register, show_time
+from chronologger.sinks import Logger, get_default_sink, log
+
+if TYPE_CHECKING:  # The modules of optional features are imported when a timer uses them
+    from chronologger.memory import MemorySource
+    from chronologger import meters
+
+
+class _Frame:
+    """Invocation of a timer used as a context manager or decorator that is not measured (not sampled
+    or recording disabled). It only keeps its place in the nesting, so it's cheap to create"""
+    __slots__ = ("timer", "parent")
+    # Invocations not measured have no span, start tick nor marks
+    span: Optional[Span] = None
+    start: Optional[Tick] = None
+    marks: Any = None
+
+    def __init__(self, timer: "Timer", parent: Optional["_Frame"]):
+        self.timer = timer
+        self.parent = parent  # Innermost invocation of any timer enclosing this one
+
+    def path(self) -> Tuple[str, ...]:
+        """Names of the timers from the outermost invocation to this one. For the invocations not measured
+        it's only built when a measured one nested in them needs it"""
+        if self.span is not None:
+            return self.span.path
+        if self.parent is None:
+            return self.timer._root_path
+        return self.parent.path() + (self.timer.name,)
+
+    def inside_measured(self) -> bool:
+        """Whether an enclosing invocation of the same timer (e.g. of a recursive function) is measured,
+        so this one is not the outermost"""
+        frame = self.parent
+        while frame is not None:
+            if frame.timer is self.timer and frame.start is not None:
+                return True
+            frame = frame.parent
+        return False
+
+    def span_id(self) -> Optional[int]:
+        """The span of the innermost measured invocation, this one or an enclosing one"""
+        frame: Optional[_Frame] = self
+        while frame is not None and frame.span is None:
+            frame = frame.parent
+        return frame.span.span_id if frame is not None else None
+
+
+class _MeasuredFrame(_Frame):
+    """Timing state of a measured invocation. One is created on every call, so it only holds the start
+    tick (and the CPU and memory readings) instead of a Chronologger with its own recorder"""
+    __slots__ = ("weight", "span", "start", "cpu_start_ns", "memory_state", "marks", "children_ns",
+                 "open_children", "block_start_ns", "block_end_ns", "block_overhead_ns")
+
+    def __init__(self, timer: "Timer", parent: Optional[_Frame], weight: float, span: Span):
+        super().__init__(timer, parent)
+        self.weight = weight  # Number of invocations represented by this one when sampling
+        self.span = span  # Position of the invocation in the tree of nested timers
+        self.start = None  # Set once the frame is pushed, right before the clock is read
+        self.cpu_start_ns: Optional[int] = None
+        self.memory_state: Any = None
+        self.marks = None  # Recorder of the marks of the invocation, created by the first one
+        self.children_ns = 0  # Time spent in nested invocations, to calculate the exclusive time
+        # Nested invocations running at the same time (e.g. asyncio tasks gathered) and the block of time they cover
+        self.open_children = 0
+        self.block_start_ns: Optional[int] = None
+        self.block_end_ns = 0
+        self.block_overhead_ns = 0
+
+    def child_exited(self, period: Optional[Period]) -> None:
+        """Adds the time of a nested invocation (None if it wasn't recorded). Nested invocations overlapping
+        in time are counted once: the time they cover together is added when the last one exits"""
+        self.open_children -= 1
+        if period is not None:
+            start_ns, end_ns = period.start.ns(), period.end.ns()
+            if self.block_start_ns is None:
+                self.block_start_ns, self.block_end_ns, self.block_overhead_ns = start_ns, end_ns, period.overhead_ns
+            else:
+                self.block_start_ns = min(self.block_start_ns, start_ns)
+                self.block_end_ns = max(self.block_end_ns, end_ns)
+                self.block_overhead_ns += period.overhead_ns
+        if self.open_children == 0 and self.block_start_ns is not None:
+            self.children_ns += max(self.block_end_ns - self.block_start_ns - self.block_overhead_ns, 0)
+            self.block_start_ns = None
+
+    def events(self) -> List[TimeEvent]:
+        """The start tick and the marks of the invocation"""
+        return [self.start] + (self.marks.get_all() if self.marks is not None else [])
+
+
+_span_ids = itertools.count(1)
+
+
+# Innermost timer invocation running in the current context (thread or asyncio task)
+_current_frame: ContextVar[Optional[_Frame]] = ContextVar("chronologger_current_frame", default=None)
 
 
 class Timer(TimeContext):
     """A basic timer utility for logging time in code. It can be used as a class, context manager or decorator"""
 
-    def __init__(self, name, unit=TimeUnit.s, simple_log=False, log_when_exiting=False, parent_ctx=None):
+    def __new__(cls, *args, **kwargs):
+        if config.disabled_at_import and cls is Timer:
+            return NULL_TIMER
+        return super().__new__(cls)
+
+    def __init__(self, name, unit=TimeUnit.s, simple_log=False, log_when_exiting=False, parent_ctx=None,
+                 columnar=False, concurrent=False, sampling: Optional[SamplingPolicy] = None,
+                 logger: Optional[Logger] = None, subtract_overhead: bool = False,
+                 clock: Clock = Clock.PERF_COUNTER, cpu_clock: Optional[Clock] = None,
+                 memory: Optional["MemorySource"] = None, windows: Optional[Iterable[float]] = None,
+                 repo: Optional[AbstractTimeRepository] = None):
         self.name = name
-        self.chrono = Chronologger(name, self, unit, simple_log_msgs=simple_log)
+        # Repository where the events of the timer are recorded, the root one (see service.record) by default
+        self.repo = repo
+        self._record = repo.add if repo is not None else record
+        self._register = repo.register if repo is not None else register
+        self.concurrent = concurrent
+        self.sampling = sampling
+        # Periods reported don't include the overhead of the timer itself (see calibration.calibrate)
+        self.subtract_overhead = subtract_overhead
+        # Clock of the ticks (see model.clock_of)
+        self.clock = Clock(clock)
+        if subtract_overhead:
+            from chronologger.calibration import correct, get_calibration
+            if config.enabled:  # Calibrated now, so it doesn't happen while the timer is running
+                get_calibration(self.clock)
+            self._correct = correct
+        # e.g. clock=Clock.PERF_COUNTER, cpu_clock=Clock.THREAD_TIME to tell CPU bound from waiting time
+        # and memory=MemorySource.TRACEMALLOC to store the memory allocated in every period too
+        self.unit = unit
+        self.columnar = columnar
+        self.simple_log = simple_log
+        self.logger = logger if logger is not None else get_default_sink()
+        self._new_chrono = partial(Chronologger, name, self, unit, simple_log_msgs=simple_log, columnar=columnar,
+                                   logger=self.logger, clock=self.clock, cpu_clock=cpu_clock, memory=memory)
+        self._chrono = self._new_chrono()
+        self.cpu_clock: Optional[Clock] = self._chrono.cpu_clock
+        self.memory: Optional["MemorySource"] = self._chrono.memory
+        self._local = threading.local()  # Holds the per-thread Chronologgers in concurrent mode
+        self.stats = TimerStats()
+        # Rolling windows (lengths in seconds, e.g. (1, 10, 60)) of the calls per second and latencies
+        self.meter: Optional["meters.Meter"] = None
+        if windows:
+            from chronologger.meters import Meter
+            self.meter = Meter(windows)
+        self._stats_lock = threading.Lock()
         self.log_when_exiting = log_when_exiting
         self.parent_ctx: TimeContext = parent_ctx
-        self.chrono.logger(f"{self.name} Timer created!")
+        # Path used when the timer is not nested in other running timer. It follows the explicit parent contexts
+        self._root_path: Tuple[str, ...] = getattr(parent_ctx, "_root_path", ()) + (name,)
+        self._start_tick_name = name + "_start_tick"
+        self._end_tick_name = name + "_end_tick"
+        log(self.chrono.logger, "%s Timer created!", self.name)
+
+    @property
+    def chrono(self) -> Chronologger:
+        """The Chronologger recording the ticks. In concurrent mode every thread gets its own one,
+        so the same timer (e.g. a decorator) can be used from many threads without mixing ticks.
+        Invocations as context manager or decorator don't use it (see get_all)"""
+        if not self.concurrent:
+            return self._chrono
+        try:
+            return self._local.chrono
+        except AttributeError:
+            chrono = self._local.chrono = self._new_chrono()
+            return chrono
 
     def start(self, start_suffix: str = "_start_tick") -> "Timer":
+        if not config.enabled:
+            return self
         time_event: TimeEvent = self.chrono.start(self.name + start_suffix)
-        record(time_event)
+        self._record(time_event)
         return self
 
-    def mark(self, name: str) -> "TimeEvent":
-        time_event: TimeEvent = self.chrono.mark(name)
-        record(time_event)
+    def mark(self, name: str) -> Optional[TimeEvent]:
+        if not config.enabled:
+            return None
+        frame = self._running_frame()
+        if frame is not None:
+            return self._mark_invocation(frame, name)
+        time_event: Optional[TimeEvent] = self.chrono.mark(name)
+        if time_event is not None:  # Columnar marks are recorded when the timer stops
+            self._record(time_event)
         return time_event
 
+    def _running_frame(self) -> Optional[_Frame]:
+        """The innermost invocation of this timer running in the current context (thread or asyncio task)"""
+        frame = _current_frame.get()
+        while frame is not None and frame.timer is not self:
+            frame = frame.parent
+        return frame
+
+    def _mark_invocation(self, frame: _MeasuredFrame, name: str) -> Optional[TimeEvent]:
+        if frame.start is None:  # Invocation not sampled
+            return None
+        if frame.marks is None:
+            frame.marks = ColumnarEventRecorder(self, self.unit) if self.columnar else EventRecorder()
+        if self.columnar:  # No Tick is created until they are requested
+            frame.marks.append(name, self.clock.read())
+            return None
+        tick = Tick(name, self, self.unit, self.clock.read())
+        frame.marks.add(tick)
+        self._record(tick)
+        return tick
+
+    def get_all(self) -> List[TimeEvent]:
+        """The ticks of the running invocation, when used as context manager or decorator, or of the timer"""
+        frame = self._running_frame()
+        if frame is not None and frame.start is not None:
+            return frame.events()
+        return self.chrono.get_all()
+
     def label(self, name: str):
-        time_event: TimeEvent = Label(name, self)
-        record(time_event)
+        if not config.enabled:
+            return None
+        time_event: TimeEvent = Label(name, self, TimeUnit.s, self.chrono.clock.read())
+        self._record(time_event)
         return time_event
 
-    def stop(self, end_suffix: str = "_end_tick", do_log: bool = False, reset: bool = False) -> Period:
-        time_event: Period = self.chrono.stop(self.name + end_suffix, do_log, reset)
-        record(cast(TimeEvent, time_event))
+    def stop(self, end_suffix: str = "_end_tick", do_log: bool = False, reset: bool = False,
+             weight: float = 1.0, span: Optional[Span] = None) -> Optional[Period]:
+        if not config.enabled:
+            return None
+        chrono = self.chrono
+        for mark in chrono.take_marks():  # Columnar marks are recorded when the timer stops
+            self._record(mark)
+        time_event: Period = chrono.stop(self.name + end_suffix, do_log, reset)
+        if self.subtract_overhead:
+            time_event = self._correct(time_event, weight, span)
+        elif weight != 1.0 or span is not None:  # e.g. the period represents many (sampled) invocations
+            time_event = time_event.annotate(weight, span)
+        if self.meter is not None:
+            self.meter.record(time_event.ns(), weight)
+        self._record(cast(TimeEvent, time_event))
         return time_event
 
-    def print(self):
-        show_time()
+    def print(self, file=None, **options):
+        """Streams the report of the root repository (see service.show_time)"""
+        show_time(file, **options)
 
     """ContextDecorator implementation"""
 
+    def __call__(self, func):
+        """Decorates func. Coroutine functions are timed while they are awaited, not when they are called.
+
+        When sampling, the invocations not sampled call func straight away"""
+        if inspect.iscoroutinefunction(func):
+            return self._decorate_coroutine(func)
+
+        @wraps(func)
+        def inner(*args, **kwds):
+            if not config.enabled and _current_frame.get() is None:
+                return func(*args, **kwds)
+            self._begin()
+            try:
+                return func(*args, **kwds)
+            finally:
+                self._end()
+        return inner
+
+    def _decorate_coroutine(self, func):
+        @wraps(func)
+        async def inner(*args, **kwds):
+            if not config.enabled and _current_frame.get() is None:
+                return await func(*args, **kwds)
+            self._begin()
+            try:
+                return await func(*args, **kwds)
+            finally:
+                self._end()
+        return inner
+
     def __enter__(self) -> "Timer":
-        """Start a new basic timer as a context manager"""
-        register(self)
-        self.start("_start_tick")
-        return self
+        """Start a new basic timer as a context manager.
 
-    """Presentation dunder implementations"""
+        Each invocation pushes its own frame, so nested or recursive invocations of
+        the same timer (or from other threads/asyncio tasks) don't reset each other"""
+        if config.enabled or _current_frame.get() is not None:
+            self._begin()
+        return self
 
     def __exit__(self, *exc_info: Any) -> None:
         """Stop the basic timer when exiting the context"""
-        self.stop("_end_tick", do_log=self.log_when_exiting,
-                  reset=True)  # TODO Make this last param configurable
+        if config.enabled or _current_frame.get() is not None:
+            self._end()
+
+    def _begin(self) -> None:
+        if not config.enabled:
+            # Nothing to measure. A frame is pushed only to keep the nesting of the invocations being measured
+            if _current_frame.get() is not None:
+                self._skip()
+        elif self.sampling is None:
+            self._enter()
+        elif self.sampling.sample():
+            self._enter(self.sampling.weight)
+        else:
+            self._skip()
+
+    def _skip(self) -> None:
+        """Pushes the frame of an invocation that is not sampled. It's not measured, but it keeps its place
+        in the nesting, so the sampled invocations inside it get the right span and parent. It has no span,
+        so it costs little more than pushing and popping the frame"""
+        _current_frame.set(_Frame(self, _current_frame.get()))
+
+    def _span(self, parent: Optional[_Frame]) -> Span:
+        if parent is None:
+            return Span(next(_span_ids), None, self._root_path, current_thread_id())
+        # Nesting is inferred from the timers running in the current thread or asyncio task
+        return Span(next(_span_ids), parent.span_id(), parent.path() + (self.name,), current_thread_id())
+
+    def _enter(self, weight: float = 1.0) -> None:
+        self._register(self)
+        parent = _current_frame.get()
+        frame = _MeasuredFrame(self, parent, weight, self._span(parent))
+        if parent is not None and parent.start is not None:
+            parent.open_children += 1
+        _current_frame.set(frame)
+        if self.memory is not None:  # Before the clock is read, so its cost isn't part of the period
+            frame.memory_state = start_tracking(self.memory)
+        frame.start = BoundaryTick(self._start_tick_name, self, self.unit, self.clock.read())
+        if self.cpu_clock is not None:
+            frame.cpu_start_ns = self.cpu_clock.read()
+        self._record(frame.start)
+
+    def _end(self) -> None:
+        frame = _current_frame.get()
+        if frame is None:  # Entered while recording was disabled, so nothing was pushed
+            return
+        if frame.timer is not self:  # Invocations of other timers exited out of order
+            frame = self._running_frame()
+            if frame is None:
+                return
+        _current_frame.set(frame.parent)
+        if frame.start is None:  # Invocation not sampled or recording disabled
+            return
+        period = None
+        try:
+            period = self._stop_invocation(frame)
+        finally:
+            if frame.parent is not None and frame.parent.start is not None:
+                frame.parent.child_exited(period)
+        if period is None:  # Recording disabled while the invocation was running
+            return
+        elapsed_ns = period.ns()
+        exclusive_ns = max(elapsed_ns - frame.children_ns, 0)
+        outermost = not frame.inside_measured()
+        if self.sampling is not None:
+            self.sampling.measured(elapsed_ns)
+        if self.concurrent:
+            with self._stats_lock:
+                self.stats.add(elapsed_ns, exclusive_ns, outermost, frame.weight, period.cpu_ns)
+        else:
+            self.stats.add(elapsed_ns, exclusive_ns, outermost, frame.weight, period.cpu_ns)
+
+    def _stop_invocation(self, frame: _MeasuredFrame) -> Optional[Period]:
+        """Records the period of the invocation, built from the ticks and readings of its frame"""
+        if not config.enabled:
+            return None
+        end = BoundaryTick(self._end_tick_name, self, self.unit, self.clock.read())
+        cpu_ns = self.cpu_clock.read() - frame.cpu_start_ns if self.cpu_clock is not None else None
+        memory = stop_tracking(self.memory, frame.memory_state) if self.memory is not None else None
+        period = Period("elapsed", self, self.unit, frame.start, end, frame.weight, frame.span,
+                        cpu_ns=cpu_ns, memory=memory)
+        if self.subtract_overhead:
+            period = self._correct(period, frame.weight, frame.span)
+        if self.log_when_exiting and self.logger:
+            if self.simple_log:
+                log(self.logger, "%3f %s elapsed time", period.time(), period.unit.name)
+            else:  # The events of the invocation don't change anymore, so they can be formatted later
+                log(self.logger, "%s\n%s", period, EventRecorder(frame.events() + [end]))
+        if self.meter is not None:
+            self.meter.record(period.ns(), frame.weight)
+        if self.columnar and frame.marks is not None:  # Created and recorded only now that the invocation is over
+            for mark in frame.marks.get_all():
+                self._record(mark)
+        self._record(period)
+        return period
+
+    """Asynchronous context manager implementation"""
+
+    async def __aenter__(self) -> "Timer":
+        """Start a new basic timer for the current asyncio task"""
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """Stop the timer of the current asyncio task"""
+        self._end()
+
+    """Presentation dunder implementations"""
 
     def __str__(self) -> str:
         if self.chrono.ticks.last() is None:
@@ -74,5 +422,80 @@ class Timer(TimeContext):
         return representation
 
 
-root_timer = Timer(name="root")
-root_repo = init_repo(root_timer)
+class NullTimer(Timer):
+    """No-op timer returned for every Timer created when chronologger is disabled through the environment.
+
+    Decorating a function returns the function untouched and using it as a context
+    manager does nothing, so the instrumentation left in the code costs nothing."""
+    name = "null"
+    concurrent = False
+    sampling = None
+    log_when_exiting = False
+    parent_ctx = None
+    stats = TimerStats()
+    meter = None
+    clock = Clock.PERF_COUNTER
+    chrono = Chronologger("null", None)
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, func):
+        return func
+
+    def __enter__(self) -> "NullTimer":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        pass
+
+    async def __aenter__(self) -> "NullTimer":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        pass
+
+    def start(self, start_suffix: str = "_start_tick") -> "NullTimer":
+        return self
+
+    def mark(self, name: str) -> None:
+        return None
+
+    def label(self, name: str) -> None:
+        return None
+
+    def stop(self, *args, **kwargs) -> None:
+        return None
+
+    def get_all(self):
+        return []
+
+    def print(self, file=None, **options):
+        pass
+
+    def __str__(self) -> str:
+        return ""
+
+
+NULL_TIMER = NullTimer()
+
+_root_timer: Optional[Timer] = None
+
+
+def get_root_timer() -> Timer:
+    """Returns the root timer, creating it (and the root repository) on first use"""
+    global _root_timer
+    if _root_timer is None:
+        _root_timer = Timer(name="root")
+        init_repo(_root_timer)
+    return _root_timer
+
+
+def __getattr__(name):
+    """Lazy module attributes: root_timer and root_repo are created the first time they are accessed"""
+    if name == "root_timer":
+        return get_root_timer()
+    if name == "root_repo":
+        get_root_timer()
+        return get_repo()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
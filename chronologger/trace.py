@@ -0,0 +1,197 @@
+"""Compact binary trace files.
+
+A trace is made of two append-only files:
+- <path>: a 16 byte header followed by fixed-size records, one per time event
+- <path>.names: the interned name table, one JSON encoded name per line. The id of
+  a name is its line number
+
+Records hold the kind of event, the ids of its name and its timer name, its time
+unit, its start and end timestamps in nanoseconds (the same for ticks and labels)
+and the id of the thread that recorded it.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Union
+
+from .model import ChronologgerError, EventKind, Period, TimeEvent, TimeUnit, kind_of
+
+MAGIC = b"CHRONOTR"
+VERSION = 1
+HEADER = struct.Struct("<8sII")
+RECORD = struct.Struct("<BBxxIIxxxxqqQ")
+NO_NAME = 0xFFFFFFFF
+
+_units_by_exponent = {unit.x: unit for unit in TimeUnit}
+
+
+class TraceRecord(NamedTuple):
+    kind: EventKind
+    name: str
+    timer: Optional[str]
+    unit: TimeUnit
+    start_ns: int
+    end_ns: int
+    thread_id: int
+
+    @property
+    def elapsed_ns(self) -> int:
+        return self.end_ns - self.start_ns
+
+
+def names_path(path: str) -> str:
+    return path + ".names"
+
+
+def _read_names(path: str) -> List[str]:
+    if not os.path.exists(names_path(path)):
+        return []
+    with open(names_path(path), encoding="utf-8") as names_file:
+        return [json.loads(line) for line in names_file if line.endswith("\n")]
+
+
+class TraceWriter:
+    """Appends time events to a binary trace file. It can be subscribed to a repository:
+
+        repo.subscribe(TraceWriter("run.trace"))
+
+    Records are buffered and written every buffer_records events, when flushed or
+    when closed. Writing from many threads is safe.
+    """
+
+    def __init__(self, path: str, buffer_records: int = 4096):
+        self.path = path
+        self.buffer_records = buffer_records
+        self._names: Dict[str, int] = {name: name_id for name_id, name in enumerate(_read_names(path))}
+        self._new_names: List[str] = []
+        self._buffer = bytearray()
+        self._buffered_records = 0
+        self._lock = threading.Lock()
+        self._names_file = open(names_path(path), "a", encoding="utf-8")
+        self._records_file = open(path, "ab")
+        if self._records_file.tell() == 0:
+            self._records_file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        else:
+            _check_header(path)
+
+    def _name_id(self, name: Optional[str]) -> int:
+        if name is None:
+            return NO_NAME
+        name_id = self._names.get(name)
+        if name_id is None:
+            name_id = self._names[name] = len(self._names)
+            self._new_names.append(name)
+        return name_id
+
+    def write(self, time_event: TimeEvent) -> None:
+        if isinstance(time_event, Period):
+            start_ns, end_ns = time_event.start.ns(), time_event.end.ns()
+        else:
+            start_ns = end_ns = time_event.ns()
+        time_context = time_event.time_context
+        timer_name = getattr(time_context, "name", None)
+        with self._lock:
+            self._buffer += RECORD.pack(kind_of(time_event), time_event.unit.x, self._name_id(time_event.name),
+                                        self._name_id(timer_name), start_ns, end_ns, threading.get_ident())
+            self._buffered_records += 1
+            if self._buffered_records >= self.buffer_records:
+                self._flush()
+
+    __call__ = write
+
+    def _flush(self) -> None:
+        if self._new_names:  # Names go first, so records never refer to names not written yet
+            self._names_file.write("".join(json.dumps(name) + "\n" for name in self._new_names))
+            self._names_file.flush()
+            self._new_names.clear()
+        if self._buffer:
+            self._records_file.write(self._buffer)
+            self._records_file.flush()
+            self._buffer.clear()
+            self._buffered_records = 0
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._records_file.closed:
+                return
+            self._flush()
+            self._records_file.close()
+            self._names_file.close()
+
+    def __enter__(self) -> "TraceWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _check_header(path: str) -> None:
+    with open(path, "rb") as records_file:
+        header = records_file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ChronologgerError(f"{path} is not a chronologger trace (file too short)")
+    magic, version, record_size = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ChronologgerError(f"{path} is not a chronologger trace version {VERSION}")
+
+
+class TraceReader:
+    """Reads a binary trace file through mmap, so records are only decoded when they are accessed.
+
+    It supports len(), iteration, indexing and slicing. The raw fixed-size records
+    are available through the records attribute (a memoryview).
+    """
+
+    def __init__(self, path: str):
+        _check_header(path)
+        self.path = path
+        self.names = _read_names(path)
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        # A record partially written at the end of the file (e.g. after a crash) is ignored
+        record_count = (len(self._mmap) - HEADER.size) // RECORD.size
+        self._view = memoryview(self._mmap)
+        self.records = self._view[HEADER.size:HEADER.size + record_count * RECORD.size]
+
+    def _decode(self, fields) -> TraceRecord:
+        kind, unit_exponent, name_id, timer_id, start_ns, end_ns, thread_id = fields
+        return TraceRecord(EventKind(kind), self.names[name_id], None if timer_id == NO_NAME else self.names[timer_id],
+                           _units_by_exponent[unit_exponent], start_ns, end_ns, thread_id)
+
+    def __len__(self) -> int:
+        return len(self.records) // RECORD.size
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[TraceRecord, List[TraceRecord]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            chunk = self.records[start * RECORD.size:stop * RECORD.size]
+            return [self._decode(fields) for fields in RECORD.iter_unpack(chunk)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Trace record {index} out of range")
+        return self._decode(RECORD.unpack_from(self.records, index * RECORD.size))
+
+    def __iter__(self) -> Iterator[TraceRecord]:
+        for fields in RECORD.iter_unpack(self.records):
+            yield self._decode(fields)
+
+    def close(self) -> None:
+        self.records.release()
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> "TraceReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,14 +1,16 @@
 import time
 
+from chronologger.repository import get_repo
 from chronologger.timer import Timer, root_timer
 
 
-@Timer(name="sub_method", parent_ctx=root_timer)
+# Nesting doesn't need to be wired with parent_ctx: it's inferred from the timers running when entering
+@Timer(name="sub_method")
 def sub_method():
     time.sleep(0.1)
 
 
-@Timer(name="main", parent_ctx=root_timer)
+@Timer(name="main")
 def main():
     sub_method()
     time.sleep(0.1)
@@ -19,3 +21,4 @@ if __name__ == "__main__":
     main()
     root_timer.label("   PRINTING TIME")
     root_timer.print()
+    print(get_repo().call_tree)
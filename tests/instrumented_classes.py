@@ -0,0 +1,18 @@
+"""Classes referencing each other, instrumented by the tests of chronologger.instrument"""
+
+
+class Tree:
+
+    def size(self):
+        return 1
+
+
+class Forest:
+    tree_type = Tree
+
+    def size(self):
+        return 2 * self.tree_type().size()
+
+
+Tree.forest_type = Forest
+Tree.self_type = Tree
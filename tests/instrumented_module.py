@@ -0,0 +1,28 @@
+"""Module instrumented by the tests of chronologger.instrument"""
+import time
+
+
+def slow(seconds=0.01):
+    time.sleep(seconds)
+    return fast() + 1
+
+
+def fast():
+    return 1
+
+
+def recursive(n):
+    return 0 if n == 0 else recursive(n - 1) + 1
+
+
+class Worker:
+
+    def work(self):
+        return slow(0.001)
+
+    @staticmethod
+    def helper():
+        return fast()
+
+    def __repr__(self):
+        return "Worker()"
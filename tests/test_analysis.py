@@ -0,0 +1,55 @@
+import pytest
+
+from chronologger import Timer, TimeUnit
+from chronologger.model import ColumnarEventRecorder, EventRecorder, Tick
+from chronologger.repository import TimeRepository
+
+np = pytest.importorskip("numpy")
+
+from chronologger.analysis import convert, group_by, laps, summary  # noqa: E402
+
+
+def test_recorders_export_timestamps():
+    recorder, columnar = EventRecorder(), ColumnarEventRecorder()
+    for tick_ns in (1000, 3000, 7000):
+        recorder.add(Tick("tick", None, TimeUnit.s, tick_ns))
+        columnar.append("tick", tick_ns)
+    assert recorder.to_numpy().dtype == np.int64
+    assert recorder.to_numpy().tolist() == columnar.to_numpy().tolist() == [1000, 3000, 7000]
+    columnar.append("tick", 8000)  # The exported array doesn't hold the column
+    assert laps(columnar.to_numpy()).tolist() == [2000, 4000, 1000]
+    assert convert(laps(recorder.to_numpy()), TimeUnit.ms).tolist() == [0.002, 0.004]
+
+
+def test_summary_statistics():
+    values_ns = np.arange(1, 101) * 10 ** 6
+    result = summary(values_ns, TimeUnit.ms)
+    assert result["count"] == 100 and result["total"] == 5050
+    assert result["min"] == 1 and result["max"] == 100 and result["mean"] == 50.5
+    assert result["p50"] == pytest.approx(50.5) and result["p99"] == pytest.approx(99.01)
+    assert summary(values_ns, TimeUnit.ms, weights=np.full(100, 2.0))["count"] == 200
+    assert summary(np.array([], dtype=np.int64)) == {"count": 0}
+
+
+def test_weighted_summary_counts_every_value_as_many_times_as_its_weight():
+    values_ns, weights = np.array([1, 2, 3, 100]), np.array([1.0, 1.0, 1.0, 97.0])
+    result = summary(values_ns, TimeUnit.ns, weights)
+    repeated = np.repeat(values_ns, weights.astype(int))
+    assert result["count"] == 100 and result["mean"] == pytest.approx(repeated.mean())
+    assert result["std"] == pytest.approx(repeated.std())
+    assert result["p50"] == result["p99"] == 100 and result["min"] == 1
+    assert summary(np.array([10, 20]), TimeUnit.ns, np.array([9.0, 1.0]))["p50"] == 10
+
+
+def test_repository_periods_grouped_by_timer():
+    repo = TimeRepository(Timer("analysis root"))
+    for timer_name, elapsed_ns in (("a", 10), ("b", 100), ("a", 30), ("b", 300), ("b", 200)):
+        timer = Timer(timer_name)
+        repo.add(Tick("end", timer, TimeUnit.ns, 1000 + elapsed_ns) - Tick("start", timer, TimeUnit.ns, 1000))
+    repo.add(Tick("single tick", repo.root_time_context))
+    timers, elapsed_ns, start_ns, weights = repo.to_numpy()
+    assert timers.tolist() == ["a", "b", "a", "b", "b"]
+    assert elapsed_ns.tolist() == [10, 100, 30, 300, 200] and start_ns.tolist() == [1000] * 5
+    groups = group_by(timers, elapsed_ns, TimeUnit.ns, weights)
+    assert groups["a"]["count"] == 2 and groups["a"]["mean"] == 20
+    assert groups["b"]["count"] == 3 and groups["b"]["max"] == 300
@@ -1,9 +1,17 @@
+import asyncio
 import math
+import os
+import subprocess
+import sys
 import time
 import unittest.mock as mock
+from concurrent.futures import ThreadPoolExecutor
 
+import chronologger
 from chronologger import Timer
-from chronologger.model import Chronologger, TimeUnit
+from chronologger.model import Chronologger, Clock, TimeUnit, Period
+from chronologger.repository import ConcurrentTimeRepository, TimeRepository, get_repo, set_repo
+from chronologger.timer import _current_frame
 
 sleep_time_seconds = 1
 
@@ -116,3 +124,296 @@ def test_marks(capsys):
     captured = capsys.readouterr()
     for i in range(3):
         assert "j={}".format(i) in captured.out
+
+
+def test_columnar_marks_are_recorded_when_the_timer_stops():
+    timer = Timer("columnar marks", columnar=True)
+    repo = TimeRepository(timer)
+
+    @timer
+    def decorated():
+        timer.mark("in decorator")
+
+    previous_repo = set_repo(repo)
+    try:
+        with timer:
+            assert timer.mark("in with") is None
+            assert [event.name for event in timer.get_all()] == ["columnar marks_start_tick", "in with"]
+        decorated()
+        timer.start()
+        timer.mark("explicit")
+        timer.stop()
+    finally:
+        set_repo(previous_repo)
+    names = [event.name for event in repo.get_all()]
+    for mark in ("in with", "in decorator", "explicit"):
+        assert names.count(mark) == 1
+    assert names.index("in with") < names.index("in decorator") < names.index("explicit")
+
+
+def test_concurrent_decorator_from_many_threads():
+    sleep_time_seconds = 0.05
+    timer = Timer("concurrent", unit=TimeUnit.ms, concurrent=True)
+    previous_repo = set_repo(ConcurrentTimeRepository(timer))
+
+    @timer
+    def dummy():
+        time.sleep(sleep_time_seconds)
+
+    try:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in range(32):
+                executor.submit(dummy)
+        periods = [event for event in get_repo().get_all() if isinstance(event, Period)]
+    finally:
+        set_repo(previous_repo)
+
+    assert len(periods) == 32
+    for period in periods:
+        assert math.isclose(period.elapsed(), sleep_time_seconds * 1000, rel_tol=0.5)
+
+
+def test_as_async_decorator_and_context_manager(capsys):
+    sleep_times_seconds = [0.01 * (i % 10 + 1) for i in range(200)]
+    timer = Timer("async test", unit=TimeUnit.ms)
+
+    @timer
+    async def dummy(sleep_time_seconds):
+        await asyncio.sleep(sleep_time_seconds)
+        return timer.get_all()[0]  # The start tick of this task
+
+    async def main():
+        start_ticks = await asyncio.gather(*(dummy(sleep_time_seconds) for sleep_time_seconds in sleep_times_seconds))
+        async with Timer("async with test", log_when_exiting=True) as async_timer:
+            await asyncio.sleep(0)
+            async_timer.mark("awaited")
+        return start_ticks
+
+    start_ticks = asyncio.run(main())
+    assert len({id(tick) for tick in start_ticks}) == len(sleep_times_seconds)  # Non-interleaved tasks
+    periods = {event.start.ns(): event for event in get_repo().get_all()
+               if isinstance(event, Period) and event.time_context is timer}
+    for start_tick, sleep_time_seconds in zip(start_ticks, sleep_times_seconds):
+        period = periods[start_tick.ns()]
+        assert period.elapsed() >= sleep_time_seconds * 1000
+        assert math.isclose(period.elapsed(), sleep_time_seconds * 1000, abs_tol=50)
+
+    captured = capsys.readouterr()
+    assert "async with test_end_tick" in captured.out
+    assert "awaited" in captured.out
+
+
+def test_recursive_decorator_reports_each_invocation():
+    sleep_time_seconds = 0.02
+    timer = Timer("recursive", unit=TimeUnit.ms)
+
+    @timer
+    def walk(depth):
+        time.sleep(sleep_time_seconds)
+        if depth > 0:
+            walk(depth - 1)
+
+    walk(3)
+    periods = [event for event in get_repo().get_all() if isinstance(event, Period) and event.time_context is timer]
+    assert len(periods) == 4
+    for invocations, period in enumerate(periods, start=1):  # Innermost invocations finish first
+        assert math.isclose(period.elapsed(), invocations * sleep_time_seconds * 1000, rel_tol=0.25)
+
+    assert timer.stats.calls == 4
+    assert timer.stats.inclusive_ns == periods[-1].ns()
+    assert timer.stats.exclusive_ns == periods[-1].ns()
+
+
+def test_nested_timers_split_inclusive_and_exclusive_time():
+    sleep_time_seconds = 0.02
+    outer_timer = Timer("outer")
+    inner_timer = Timer("inner")
+
+    with outer_timer:
+        time.sleep(sleep_time_seconds)
+        for _ in range(2):
+            with inner_timer:
+                time.sleep(sleep_time_seconds)
+
+    assert outer_timer.stats.calls == 1
+    assert inner_timer.stats.calls == 2
+    assert inner_timer.stats.exclusive_ns == inner_timer.stats.inclusive_ns
+    assert outer_timer.stats.exclusive_ns == outer_timer.stats.inclusive_ns - inner_timer.stats.inclusive_ns
+    assert math.isclose(outer_timer.stats.exclusive(), sleep_time_seconds, rel_tol=0.5)
+
+
+def test_children_gathered_in_asyncio_tasks_are_subtracted_once():
+    sleep_time_seconds = 0.05
+    parent_timer, child_timer = Timer("gathering parent"), Timer("gathered child")
+    repo = TimeRepository(parent_timer)
+
+    @child_timer
+    async def child():
+        await asyncio.sleep(sleep_time_seconds)
+
+    async def main():
+        async with parent_timer:
+            await asyncio.gather(*(child() for _ in range(4)))
+            await asyncio.sleep(sleep_time_seconds)  # Time of the parent alone
+
+    previous_repo = set_repo(repo)
+    try:
+        asyncio.run(main())
+    finally:
+        set_repo(previous_repo)
+    assert child_timer.stats.calls == 4
+    assert 0 < parent_timer.stats.exclusive_ns < parent_timer.stats.inclusive_ns
+    assert math.isclose(parent_timer.stats.exclusive(), sleep_time_seconds, rel_tol=0.5)
+    parent_node = repo.call_tree.find(("gathering parent",))
+    assert parent_node.exclusive_ns == 0  # The children add up to more than their parent
+    assert parent_node.children["gathered child"].calls == 4
+
+
+def test_runtime_disable_switch(capsys):
+    timer = Timer("switchable", log_when_exiting=True)
+
+    @timer
+    def dummy():
+        return 42
+
+    chronologger.disable()
+    try:
+        assert dummy() == 42
+        with timer:
+            assert timer.mark("disabled mark") is None
+        assert timer.start().stop() is None
+    finally:
+        chronologger.enable()
+    assert timer.stats.calls == 0
+    assert "switchable_end_tick" not in capsys.readouterr().out
+
+    assert dummy() == 42
+    assert timer.stats.calls == 1
+    assert "switchable_end_tick" in capsys.readouterr().out
+
+
+def test_disabling_while_a_timer_is_running():
+    timer = Timer("disabled inside")
+    try:
+        with timer:
+            chronologger.disable()
+    finally:
+        chronologger.enable()
+    assert timer.stats.calls == 0
+    with timer:  # The frames were popped, so the timer keeps working
+        pass
+    assert timer.stats.calls == 1
+
+
+def test_no_frame_is_pushed_while_disabled():
+    timer = Timer("disabled frames")
+
+    @timer
+    def current():
+        return _current_frame.get()
+
+    chronologger.disable()
+    try:
+        with timer:
+            assert _current_frame.get() is None
+        assert current() is None
+    finally:
+        chronologger.enable()
+    with Timer("enabled outer"):
+        running = _current_frame.get()
+        chronologger.disable()
+        try:  # Disabled while a frame is open, only the nesting is kept
+            with timer:
+                assert _current_frame.get().parent is running
+            assert current().parent is running
+            assert _current_frame.get() is running
+        finally:
+            chronologger.enable()
+    assert _current_frame.get() is None
+    assert timer.stats.calls == 0
+
+
+def test_disabled_through_the_environment():
+    code = ("import chronologger\n"
+            "timer = chronologger.Timer('t')\n"
+            "def foo(): pass\n"
+            "assert timer is chronologger.Timer('other')\n"
+            "assert timer(foo) is foo\n"
+            "with timer as t: t.mark('m')\n"
+            "assert not chronologger.is_enabled()\n")
+    environment = dict(os.environ, CHRONOLOGGER_DISABLED="1",
+                       PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    subprocess.run([sys.executable, "-c", code], env=environment, check=True)
+
+
+def test_import_has_no_side_effects():
+    code = ("import sys\n"
+            "import chronologger\n"
+            "assert [module for module in sys.modules if module.startswith('chronologger.')] == []\n"
+            "assert chronologger.root_timer.name == 'root'\n"
+            "assert 'chronologger.timer' in sys.modules\n")
+    environment = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    completed = subprocess.run([sys.executable, "-c", code], env=environment, check=True,
+                               stdout=subprocess.PIPE, universal_newlines=True)
+    assert completed.stdout.startswith("root Timer created!")  # Only when first used
+
+
+def test_optional_features_are_imported_when_used():
+    optional = ("statistics", "tracemalloc", "logging", "queue", "chronologger.calibration", "chronologger.meters")
+    code = ("import sys\n"
+            "from chronologger import Timer\n"
+            "with Timer('plain', logger=lambda message: None):\n"
+            "    pass\n"
+            f"assert [module for module in {optional!r} if module in sys.modules] == []\n"
+            "Timer('metered', windows=(1,), subtract_overhead=True, logger=lambda message: None)\n"
+            "assert 'chronologger.meters' in sys.modules and 'chronologger.calibration' in sys.modules\n")
+    environment = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    subprocess.run([sys.executable, "-c", code], env=environment, check=True)
+
+
+def test_nesting_is_inferred_in_asyncio_tasks():
+    parent_timer = Timer("parent task")
+    child_timer = Timer("child task")
+
+    @child_timer
+    async def child():
+        await asyncio.sleep(0.01)
+
+    async def parent():
+        async with parent_timer:
+            await asyncio.gather(child(), child())
+
+    asyncio.run(parent())
+    periods = [event for event in get_repo().get_all()
+               if isinstance(event, Period) and event.time_context in (parent_timer, child_timer)]
+    parent_period = next(period for period in periods if period.time_context is parent_timer)
+    child_periods = [period for period in periods if period.time_context is child_timer]
+    assert len(child_periods) == 2
+    for child_period in child_periods:
+        assert child_period.span.parent_id == parent_period.span.span_id
+        assert child_period.span.path == ("parent task", "child task")
+    assert get_repo().call_tree.find(("parent task", "child task")).calls == 2
+
+
+def test_clock_sources_and_cpu_time():
+    def spin(seconds):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+
+    cpu_timer = Timer("cpu clock", clock=Clock.THREAD_TIME)
+    with cpu_timer:
+        time.sleep(0.05)  # Sleeping takes no CPU time
+    assert cpu_timer.stats.inclusive_ns < 0.02e9
+
+    both = Timer("wall and cpu", cpu_clock=Clock.PROCESS_TIME)
+    with both:
+        spin(0.05)
+    with both:
+        time.sleep(0.05)
+    busy, idle = [event for event in get_repo().get_all() if isinstance(event, Period) and event.time_context is both]
+    assert busy.cpu_ratio > 0.5 and idle.cpu_ratio < 0.5
+    assert "cpu/wall" in str(busy) and "cpu/wall" in str(both.stats)
+    assert 0.2 < both.stats.cpu_ratio < 0.8
+
+    assert Timer("monotonic", clock="monotonic").chrono.clock is Clock.MONOTONIC
@@ -0,0 +1,34 @@
+import importlib.util
+import os
+
+import pytest
+
+BENCHMARKS_PATH = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "overhead.py")
+
+
+@pytest.fixture(scope="module")
+def overhead():
+    spec = importlib.util.spec_from_file_location("overhead", BENCHMARKS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_every_benchmark_runs(overhead):
+    results = overhead.run(number=50, repeat=1, threads=2)
+    assert [result.name for result in results] == list(overhead.BENCHMARKS)
+    assert all(result.threads == 2 and result.ns_per_op >= 0 for result in results)
+
+
+def test_regressions_against_a_baseline(overhead, tmp_path):
+    baseline_path = str(tmp_path / "baseline.json")
+    overhead.save([overhead.Result("fast", 1, 100.0, 0, 0), overhead.Result("slow", 1, 100.0, 0, 0)], baseline_path)
+    results = [overhead.Result("fast", 1, 110.0, 0, 0), overhead.Result("slow", 1, 150.0, 0, 0),
+               overhead.Result("new", 1, 1000.0, 0, 0)]
+    regressions = overhead.compare(results, overhead.load(baseline_path), tolerance=0.2)
+    assert len(regressions) == 1 and regressions[0].startswith("slow")
+
+
+def test_temporary_allocations_count_per_op(overhead):
+    allocated_bytes, retained_blocks = overhead._memory_per_op(lambda: bytearray(10_000), 100)
+    assert allocated_bytes >= 10_000 and retained_blocks < 1
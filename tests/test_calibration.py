@@ -0,0 +1,87 @@
+import statistics
+import time
+
+from chronologger import Timer, Period, calibration
+from chronologger.calibration import Calibration, calibrate
+from chronologger.model import Clock, Tick
+from chronologger.repository import TimeRepository, get_repo, set_repo
+
+
+def test_calibration_measures_clock_and_overhead():
+    repo = get_repo()
+    result = calibrate(samples=200)
+    assert result.clock == "perf_counter"
+    assert result.resolution_ns >= 1
+    assert result.overhead_ns > 0
+    assert calibration.get_calibration() is result
+    thread_time = calibrate(samples=200, clock=Clock.THREAD_TIME)
+    assert thread_time.clock == "thread_time" and calibration.get_calibration(Clock.THREAD_TIME) is thread_time
+    assert calibration.get_calibration() is result
+    assert get_repo() is repo  # The repository used while calibrating is discarded
+
+
+def test_timers_subtract_the_overhead_and_flag_periods_below_resolution(monkeypatch):
+    monkeypatch.setitem(calibration._calibrations, Clock.PERF_COUNTER, Calibration("perf_counter", 1000, 10 ** 9, 1))
+    timer = Timer("corrected", subtract_overhead=True)
+    previous_repo = set_repo(TimeRepository(timer))
+    try:
+        with timer:
+            pass  # Everything measured is overhead
+        with timer:
+            time.sleep(1.1)
+        periods = [event for event in get_repo().get_all() if isinstance(event, Period)]
+    finally:
+        set_repo(previous_repo)
+    empty, slept = periods
+    assert empty.ns() == 0 and empty.below_resolution and "below clock resolution" in str(empty)
+    assert 0.05e9 < slept.ns() < 0.5e9 and slept.overhead_ns == 10 ** 9 and not slept.below_resolution
+    assert slept.to(empty.unit).ns() == slept.ns()
+    assert timer.stats.calls == 2 and timer.stats.inclusive_ns == empty.ns() + slept.ns()
+
+
+def test_timers_calibrate_when_created_and_nested_times_stay_positive(monkeypatch):
+    monkeypatch.setattr(calibration, "_calibrations", {})
+    outer, inner = Timer("calibration outer"), Timer("calibration inner", subtract_overhead=True)
+    assert list(calibration._calibrations) == [Clock.PERF_COUNTER]
+    with outer:
+        with inner:
+            pass
+    assert inner.stats.exclusive_ns >= 0 and outer.stats.exclusive_ns >= 0
+    assert outer.stats.inclusive_ns < 10 ** 7
+
+
+def test_overhead_is_the_one_of_an_empty_invocation_of_a_timer(monkeypatch):
+    monkeypatch.setattr(calibration, "_calibrations", {})
+    timer = Timer("calibrated invocations", subtract_overhead=True)
+    overhead_ns = calibration.get_calibration().overhead_ns
+    repo = TimeRepository(timer)
+    previous_repo = set_repo(repo)
+    try:
+        with Timer("calibration running"):  # The calibration is not nested in the running timers
+            calibrate(samples=200)
+        assert [period.time_context.name for period in repo.get_all() if isinstance(period, Period)] == ["calibration running"]
+        for _ in range(1000):
+            with timer:
+                pass
+    finally:
+        set_repo(previous_repo)
+    periods = [event for event in repo.get_all() if isinstance(event, Period) and event.time_context is timer]
+    measured_ns = statistics.median(period.end.ns() - period.start.ns() for period in periods)
+    # Most of what an empty invocation measures is the overhead, without correcting more than that
+    assert statistics.median(period.ns() for period in periods) < overhead_ns / 4
+    assert overhead_ns < 1.5 * measured_ns
+
+
+def test_overhead_of_the_clock_of_the_timer_is_subtracted(monkeypatch):
+    monkeypatch.setitem(calibration._calibrations, Clock.PERF_COUNTER, Calibration("perf_counter", 1, 10 ** 9, 1))
+    monkeypatch.setitem(calibration._calibrations, Clock.MONOTONIC, Calibration("monotonic", 1, 0, 1))
+    timer = Timer("monotonic corrected", clock=Clock.MONOTONIC, subtract_overhead=True)
+    timer.start()
+    time.sleep(0.01)
+    assert timer.stop().overhead_ns == 0
+
+
+def test_periods_without_correction_are_unchanged():
+    start = Tick("start", None, _tick_in_ns=1000)
+    period = Tick("end", None, _tick_in_ns=5000) - start
+    assert period.ns() == 4000 and period.overhead_ns == 0 and not period.below_resolution
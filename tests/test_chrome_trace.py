@@ -0,0 +1,57 @@
+import io
+import json
+import threading
+
+from chronologger import Timer
+from chronologger.chrome_trace import ChromeTraceWriter, export_chrome_trace
+from chronologger.repository import get_repo
+
+
+def test_timer_events_are_streamed_as_chrome_trace_events(tmp_path):
+    trace_path = str(tmp_path / "trace.json")
+    repo = get_repo()
+    writer = ChromeTraceWriter(trace_path)
+    repo.subscribe(writer)
+    try:
+        with Timer("outer") as outer_timer:
+            outer_timer.mark("outer mark")
+            outer_timer.label("a label")
+            thread = threading.Thread(target=Timer("in thread")(lambda: None), name="worker")
+            thread.start()
+            thread.join()
+    finally:
+        repo.unsubscribe(writer)
+        writer.close()
+
+    with open(trace_path) as trace_file:
+        events = json.load(trace_file)
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    instants = {event["name"]: event for event in events if event["ph"] == "i"}
+    thread_names = {event["tid"]: event["args"]["name"] for event in events if event["ph"] == "M"}
+
+    assert set(spans) == {"outer", "in thread"}
+    assert spans["outer"]["ts"] <= spans["in thread"]["ts"]
+    assert spans["outer"]["ts"] + spans["outer"]["dur"] >= spans["in thread"]["ts"] + spans["in thread"]["dur"]
+    assert thread_names[spans["in thread"]["tid"]] == "worker"
+    assert spans["outer"]["tid"] != spans["in thread"]["tid"]
+    assert instants["outer mark"]["s"] == "t"
+    assert instants["a label"]["s"] == "g"
+
+
+def test_export_events_already_recorded():
+    timer = Timer("exported")
+    with timer:
+        timer.mark("exported mark")
+        timer.mark("user_end_tick")  # Only the ticks started and stopped by the timer are left out
+    thread = threading.Thread(target=timer(lambda: None))
+    thread.start()
+    thread.join()
+    output = io.StringIO()
+    export_chrome_trace([event for event in get_repo().get_all() if event.time_context is timer], output)
+    events = json.loads(output.getvalue())
+    # Start ticks are left out, as the complete events show them
+    assert [event["ph"] for event in events if event["ph"] != "M"] == ["i", "i", "X", "X"]
+    assert [event["name"] for event in events if event["ph"] == "i"] == ["exported mark", "user_end_tick"]
+    in_main, in_thread = [event for event in events if event["ph"] == "X"]
+    assert in_main["tid"] == threading.get_native_id() and in_thread["tid"] == thread.native_id
+    assert [event["tid"] for event in events if event["ph"] == "M"] == [in_main["tid"]]
@@ -0,0 +1,102 @@
+import importlib
+import sys
+import threading
+
+import pytest
+
+from chronologger import Period, config
+from chronologger.instrument import ProfileCollector, install_import_hook, instrument, uninstrument
+from chronologger.repository import TimeRepository, get_repo, set_repo
+from tests import instrumented_classes, instrumented_module
+
+
+def _periods(repo):
+    return [event for event in repo.get_all() if isinstance(event, Period)]
+
+
+def test_instrument_wraps_module_functions_and_methods():
+    original_slow = instrumented_module.slow
+    repo = TimeRepository(get_repo().root_time_context)
+    previous_repo = set_repo(repo)
+    try:
+        timers = instrument(instrumented_module, exclude=("*.__*__", "*.recursive"))
+        assert sorted(timers) == ["tests.instrumented_module.Worker.helper", "tests.instrumented_module.Worker.work",
+                                  "tests.instrumented_module.fast", "tests.instrumented_module.slow"]
+        assert instrumented_module.Worker().work() == 2
+        assert instrumented_module.Worker.helper() == 1
+        assert repr(instrumented_module.Worker()) == "Worker()"
+        assert instrument(instrumented_module) == {"tests.instrumented_module.recursive":
+                                                   instrumented_module.recursive.__chronologger_timer__}
+    finally:
+        set_repo(previous_repo)
+        uninstrument(instrumented_module)
+    assert instrumented_module.slow is original_slow
+    assert not hasattr(instrumented_module.Worker.helper, "__chronologger_timer__")
+    assert timers["tests.instrumented_module.fast"].stats.calls == 2
+    slow_stats = timers["tests.instrumented_module.slow"].stats
+    assert slow_stats.calls == 1 and slow_stats.inclusive_ns >= 10 ** 6
+    paths = {period.span.path for period in _periods(repo)}
+    assert ("tests.instrumented_module.Worker.work", "tests.instrumented_module.slow",
+            "tests.instrumented_module.fast") in paths
+
+
+def test_classes_referencing_each_other_are_instrumented_once():
+    timers = instrument(instrumented_classes)
+    try:
+        assert sorted(timers) == ["tests.instrumented_classes.Forest.size", "tests.instrumented_classes.Tree.size"]
+        assert instrumented_classes.Forest().size() == 2
+    finally:
+        uninstrument(instrumented_classes)
+    assert not hasattr(instrumented_classes.Tree.size, "__chronologger_timer__")
+    assert timers["tests.instrumented_classes.Tree.size"].stats.calls == 1
+
+
+def test_modules_are_left_untouched_when_chronologger_is_disabled(monkeypatch):
+    monkeypatch.setattr(config, "disabled_at_import", True)
+    original_slow = instrumented_module.slow
+    assert instrument(instrumented_module) == {}
+    uninstrument(instrumented_module)
+    assert instrumented_module.slow is original_slow
+    assert not hasattr(original_slow, "__chronologger_timer__")
+
+
+def test_import_hook_instruments_modules_when_imported():
+    sys.modules.pop("tests.instrumented_module", None)
+    hook = install_import_hook(["tests.instrumented_*"], include=["*.fast"])
+    try:
+        reimported = importlib.import_module("tests.instrumented_module")
+        assert reimported is not instrumented_module
+        assert list(hook.timers) == ["tests.instrumented_module.fast"]
+        assert hasattr(reimported.fast, "__chronologger_timer__")
+        assert not hasattr(reimported.slow, "__chronologger_timer__")
+    finally:
+        hook.remove()
+        sys.modules["tests.instrumented_module"] = instrumented_module
+
+
+@pytest.mark.parametrize("use_monitoring", [False, pytest.param(True, marks=pytest.mark.skipif(
+    not hasattr(sys, "monitoring"), reason="sys.monitoring needs Python 3.12+"))])
+def test_profile_collector_times_selected_functions(use_monitoring):
+    repo = TimeRepository(get_repo().root_time_context)
+    collector = ProfileCollector(include=["tests.instrumented_module.*"], exclude=["*.fast"],
+                                 min_duration_ns=10 ** 6, repo=repo, use_monitoring=use_monitoring)
+    with collector:
+        instrumented_module.slow(0.002)
+        instrumented_module.recursive(3)
+        thread = threading.Thread(target=instrumented_module.Worker().work)
+        thread.start()
+        thread.join()
+    instrumented_module.slow(0)  # Not timed anymore
+
+    assert "tests.instrumented_module.fast" not in collector.timers
+    slow_stats = collector.timers["tests.instrumented_module.slow"].stats
+    assert slow_stats.calls == 2
+    recursive_stats = collector.timers["tests.instrumented_module.recursive"].stats
+    assert recursive_stats.calls == 4 and recursive_stats.exclusive_ns <= recursive_stats.inclusive_ns
+    # Only the calls to slow lasted long enough to be recorded
+    assert sorted(period.name for period in _periods(repo)) == ["tests.instrumented_module.Worker.work",
+                                                                "tests.instrumented_module.slow",
+                                                                "tests.instrumented_module.slow"]
+    assert collector.hot_spots(1)[0][0] == "tests.instrumented_module.slow"
+    assert repo.time_contexts["tests.instrumented_module.slow"] is collector.timers["tests.instrumented_module.slow"]
+    assert sys.getprofile() is None
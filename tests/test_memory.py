@@ -0,0 +1,103 @@
+import csv
+import io
+import pickle
+import tracemalloc
+
+from chronologger import MemorySource, Timer, TimeUnit
+from chronologger.memory import MemoryDelta, start_tracking, stop_tracking
+from chronologger.model import Period
+from chronologger.report import Layout, render
+from chronologger.repository import StatsTimeRepository, TimeRepository, set_repo
+
+
+def _periods(repo, timer):
+    return [event for event in repo.get_all() if isinstance(event, Period) and event.time_context is timer]
+
+
+def test_tracemalloc_deltas_are_stored_in_periods_and_aggregated_per_timer():
+    was_tracing = tracemalloc.is_tracing()
+    timer = Timer("allocations", memory=MemorySource.TRACEMALLOC)
+    previous_repo = set_repo(TimeRepository(timer))
+    try:
+        kept = []
+        with timer:
+            kept.append(bytearray(1_000_000))
+        with timer:
+            temporary = bytearray(2_000_000)
+            del temporary
+    finally:
+        repo = set_repo(previous_repo)
+        if not was_tracing:
+            tracemalloc.stop()
+    retained, released = [period.memory for period in _periods(repo, timer)]
+    assert retained.source is MemorySource.TRACEMALLOC
+    assert 1_000_000 <= retained.net < 1_100_000 and retained.peak >= retained.net
+    assert abs(released.net) < 100_000 and released.peak >= 2_000_000
+    assert "mem +" in str(_periods(repo, timer)[0]) and "peak 1.9 MiB" in str(released)
+
+    stats = repo.memory_stats["allocations"]
+    assert stats.periods == 2 and stats.max_peak == released.peak
+    assert stats.mean_net == (retained.net + released.net) / 2
+
+
+def test_tracemalloc_peak_of_nested_measurements():
+    was_tracing = tracemalloc.is_tracing()
+    try:
+        outer = start_tracking(MemorySource.TRACEMALLOC)
+        temporary = bytearray(3_000_000)
+        del temporary
+        inner = start_tracking(MemorySource.TRACEMALLOC)  # Resets the peak of tracemalloc
+        inner_delta = stop_tracking(MemorySource.TRACEMALLOC, inner)
+        outer_delta = stop_tracking(MemorySource.TRACEMALLOC, outer)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    assert inner_delta.peak < 1_000_000
+    assert outer_delta.peak >= 3_000_000
+
+
+def test_tracemalloc_peak_is_unknown_without_reset_peak(monkeypatch):
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+    was_tracing = tracemalloc.is_tracing()
+    try:
+        state = start_tracking(MemorySource.TRACEMALLOC)
+        kept = bytearray(100_000)
+        delta = stop_tracking(MemorySource.TRACEMALLOC, state)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    assert delta.peak is None and delta.net >= len(kept)
+
+
+def test_cheaper_sources_and_reports():
+    repo = StatsTimeRepository(Timer("memory stats root"))
+    blocks = Timer("blocks", memory=MemorySource.BLOCKS)
+    rss = Timer("rss", memory="rss")
+    previous_repo = set_repo(repo)
+    try:
+        kept = []
+        with blocks:
+            kept.extend(object() for _ in range(10_000))
+        with rss:
+            kept.append(b"x" * 20_000_000)
+    finally:
+        set_repo(previous_repo)
+    assert repo.memory_stats["blocks"].net >= 10_000 and repo.memory_stats["blocks"].max_peak is None
+    assert repo.memory_stats["rss"].source is MemorySource.RSS and repo.memory_stats["rss"].net > 0
+    report = io.StringIO()
+    repo.report(report)
+    assert "blocks memory: 1 periods, mean mem +" in report.getvalue()
+
+
+def test_memory_in_csv_reports_and_copies_of_periods():
+    timer = Timer("copied", memory=MemorySource.BLOCKS)
+    timer.start()
+    period = timer.stop()
+    assert isinstance(period.memory, MemoryDelta)
+    assert period.annotate(2.0).memory == period.to(TimeUnit.ms).memory == period.memory
+    assert pickle.loads(pickle.dumps(period.memory)) == period.memory
+    report = io.StringIO()
+    render([period], report, layout=Layout.CSV)
+    row = next(csv.DictReader(io.StringIO(report.getvalue())))
+    assert row["memory_net"] == str(period.memory.net) and row["memory_source"] == "blocks"
+    assert row["memory_peak"] == ""
@@ -0,0 +1,79 @@
+import math
+
+import pytest
+
+from chronologger import Timer, TimeUnit
+from chronologger.meters import Meter, RollingWindow
+from chronologger.model import ChronologgerError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now_ns = 0
+
+    def __call__(self) -> int:
+        return self.now_ns
+
+    def advance(self, secs: float) -> None:
+        self.now_ns += int(secs * 10 ** 9)
+
+
+def test_window_forgets_the_calls_older_than_its_length():
+    clock = FakeClock()
+    window = RollingWindow(10, buckets=10, clock=clock)
+    clock.advance(0.5)
+    for second in range(20):
+        clock.advance(1)
+        for _ in range(second + 1):
+            window.record((second + 1) * 10 ** 6)
+    sketch = window.sketch()
+    assert sketch.count == sum(range(11, 21))
+    assert sketch.min == 11 * 10 ** 6 and sketch.max == 20 * 10 ** 6
+    assert math.isclose(window.rate(), sketch.count / 9.5)  # 9 full buckets and half of the current one
+    assert len(window._buckets) == 10
+
+    clock.advance(30)
+    assert window.sketch().count == 0 and window.rate() == 0
+
+
+def test_young_windows_report_the_rate_of_the_time_elapsed():
+    clock = FakeClock()
+    window = RollingWindow(60, clock=clock)
+    clock.advance(2)
+    for _ in range(100):
+        window.record(1000)
+    assert math.isclose(window.rate(), 50)
+
+
+def test_meter_windows_and_percentiles():
+    clock = FakeClock()
+    meter = Meter((60, 1), clock=clock)
+    assert list(meter.windows) == [1, 60]
+    for millis in range(1, 101):
+        clock.advance(0.5)
+        meter.record(millis * 10 ** 6)
+    assert meter.sketch(60).count == 100 and meter.sketch().count == 100
+    assert meter.sketch(1).count == 2
+    assert math.isclose(meter.percentile(99, 60), 99, rel_tol=0.02)
+    assert math.isclose(meter.rate(60), 100 / 50)
+    snapshot = meter.snapshot(TimeUnit.s)
+    assert snapshot[1]["count"] == 2 and math.isclose(snapshot[60]["max"], 0.1)
+    assert "last 60 s" in str(meter)
+    with pytest.raises(ChronologgerError):
+        meter.rate(10)
+    with pytest.raises(ChronologgerError):
+        Meter(())
+
+
+def test_timer_meters_its_calls():
+    timer = Timer("metered", windows=(1, 60))
+
+    @timer
+    def call():
+        pass
+
+    for _ in range(50):
+        call()
+    assert timer.meter.sketch(60).count == 50
+    assert timer.meter.rate(60) > 0
+    assert Timer("not metered").meter is None
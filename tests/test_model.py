@@ -1,8 +1,12 @@
 import math
+import pickle
 import time
 import unittest.mock as mock
+from dataclasses import FrozenInstanceError
 
-from chronologger.model import Tick, TimeUnit, EventRecorder, TimeEvent, Period
+import pytest
+
+from chronologger.model import Label, Tick, TimeUnit, EventRecorder, TimeEvent, Period, ColumnarEventRecorder, Chronologger
 
 time_event_name = "tick"
 
@@ -267,3 +271,75 @@ def test_event_recorder_can_homogeinize_different_event_time_units(mock_timer):
     converted_event_recorder: EventRecorder = event_recorder.to(TimeUnit.ms)
     for event in converted_event_recorder.get_all():
         assert event.unit == TimeUnit.ms
+
+
+@mock.patch("chronologger.Timer")
+def test_ticks_keep_integer_nanoseconds(mock_timer):
+    tick = Tick("tick", mock_timer, TimeUnit.ms)
+    assert isinstance(tick.ns(), int)
+    tick_ns = tick.to(TimeUnit.ns)
+    assert tick_ns.ns() == tick.ns()
+    assert tick_ns.time() == tick.ns()
+
+    period = Period("period", mock_timer, TimeUnit.ns, tick, Tick("tock", mock_timer, TimeUnit.s))
+    assert isinstance(period.ns(), int)
+    assert period.elapsed() == period.ns()
+
+
+@mock.patch("chronologger.Timer")
+def test_columnar_event_recorder_materializes_views_on_demand(mock_timer):
+    recorder = ColumnarEventRecorder(mock_timer, TimeUnit.ms)
+    recorder.append("evt 0", 1_000_000)
+    recorder.add(Tick("evt 1", mock_timer, TimeUnit.s, 3_000_000))
+    recorder.append("evt 2", 6_000_000)
+    assert len(recorder) == 3
+    assert [event.name for event in recorder.get_all()] == ["evt 0", "evt 1", "evt 2"]
+    assert all(event.unit == TimeUnit.ms for event in recorder.get_all())
+    assert recorder.first().ns() == 1_000_000
+    assert recorder.elapsed().elapsed() == 5
+    assert "evt 2" in str(recorder)
+
+    converted_recorder = recorder.to(TimeUnit.ns)
+    assert converted_recorder.last().time() == 6_000_000
+    assert recorder.unit == TimeUnit.ms
+
+
+@mock.patch("chronologger.Timer")
+def test_columnar_chronologger_marks_do_not_create_ticks(mock_timer):
+    timer = Chronologger("columnar", mock_timer, TimeUnit.ms, columnar=True)
+    timer.start()
+    for i in range(3):
+        assert timer.mark(f"i={i}") is None
+    assert [mark.name for mark in timer.take_marks()] == ["i=0", "i=1", "i=2"]
+    assert timer.take_marks() == []
+    period = timer.stop()
+    assert period.unit == TimeUnit.ms
+    assert [event.name for event in timer.get_all()] == ["start_tick", "i=0", "i=1", "i=2", "end_tick"]
+    timer.reset()
+    assert len(timer.ticks) == 0
+    assert isinstance(timer.ticks, ColumnarEventRecorder)
+
+
+def test_events_are_slotted_and_immutable():
+    start, end = Tick("start", None, TimeUnit.ms, 1000), Tick("end", None, TimeUnit.ms, 3_001_000)
+    period = end - start
+    label = Label("phase", None)
+    for time_event in (start, period, label):
+        assert not hasattr(time_event, "__dict__")
+    with pytest.raises(FrozenInstanceError):
+        start.name = "other"
+    with pytest.raises(FrozenInstanceError):
+        period.weight = 2
+    assert label.fillup_char == "*" and label.repeat_no == 80 and "fillup_char" not in Label.__slots__
+    assert period == end - Tick("start", None, TimeUnit.ms, 1000) and hash(period) == hash(end - start)
+    assert pickle.loads(pickle.dumps(period)) == period
+    assert pickle.loads(pickle.dumps(label)).__class__ is Label
+
+
+def test_period_elapsed_is_cached_and_converted_without_new_events():
+    period = Tick("end", None, TimeUnit.ms, 3_001_000) - Tick("start", None, TimeUnit.ms, 1000)
+    assert period.ns() == 3_000_000
+    assert period.elapsed() == 3.0
+    assert period.elapsed(TimeUnit.s) == period.time(TimeUnit.s) == 0.003
+    assert period.to(TimeUnit.ms) is period
+    assert period.start.time(TimeUnit.ns) == 1000
@@ -0,0 +1,89 @@
+import urllib.request
+
+from chronologger import Timer
+from chronologger.prometheus import CONTENT_TYPE, TextfileWriter, render, start_http_server, write_textfile
+from chronologger.repository import StatsTimeRepository, TimeRepository, set_repo
+from chronologger.stats import LatencySketch
+
+
+def _metrics(text):
+    """Samples by name and labels, skipping comments"""
+    samples = {}
+    for line in text.splitlines():
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_counters_rates_and_histograms_of_registered_timers():
+    repo = StatsTimeRepository(Timer("prometheus root"))
+    timer = Timer('db "main"', windows=(60,))
+    previous_repo = set_repo(repo)
+    try:
+        for _ in range(3):
+            with timer:
+                pass
+    finally:
+        set_repo(previous_repo)
+    repo.sketch('db "main"').record(2 * 10 ** 9)  # A slow call, merged e.g. from other process
+
+    text = render(repo, buckets=(1.0, 0.001))
+    samples = _metrics(text)
+    assert "# TYPE chronologger_timer_calls_total counter" in text
+    assert "# TYPE chronologger_timer_duration_seconds histogram" in text
+    assert samples['chronologger_timer_calls_total{timer="db \\"main\\""}'] == 3
+    assert samples['chronologger_timer_seconds_total{timer="db \\"main\\""}'] < 0.1
+    assert samples['chronologger_timer_rate_per_second{timer="db \\"main\\"",window="60"}'] > 0
+    assert samples['chronologger_timer_duration_seconds_bucket{timer="db \\"main\\"",le="0.001"}'] == 3
+    assert samples['chronologger_timer_duration_seconds_bucket{timer="db \\"main\\"",le="1"}'] == 3
+    assert samples['chronologger_timer_duration_seconds_bucket{timer="db \\"main\\"",le="+Inf"}'] == 4
+    assert samples['chronologger_timer_duration_seconds_count{timer="db \\"main\\""}'] == 4
+    assert samples['chronologger_timer_duration_seconds_sum{timer="db \\"main\\""}'] >= 2
+
+
+def test_sketch_cumulative_counts():
+    sketch = LatencySketch()
+    for value in (1, 10, 100, 1000, 10_000):
+        sketch.record(value)
+    assert sketch.cumulative_counts([5, 100, 5000]) == [1, 3, 4]
+    assert sketch.histogram([5, 100, 5000]) == ([1, 3, 4], 5)
+
+
+def test_histogram_counts_come_from_one_copy_of_the_buckets():
+    sketch = LatencySketch()
+    sketch.record(10)
+    sketch.count += 1  # As if other thread had counted a value whose bucket isn't visible yet
+    assert sketch.histogram([100]) == ([1], 1)
+
+
+def test_timers_of_any_repository_export_the_quantiles_of_their_windows():
+    repo = TimeRepository(Timer("windows root"))
+    timer = Timer("metered", windows=(60,))
+    repo.register(timer)
+    for _ in range(10):
+        with timer:
+            pass
+    samples = _metrics(render(repo))
+    assert 0 < samples['chronologger_timer_window_duration_seconds{timer="metered",window="60",quantile="0.99"}'] < 0.1
+    assert not any(name.startswith("chronologger_timer_duration_seconds") for name in samples)
+
+
+def test_http_endpoint_and_textfile(tmp_path):
+    repo = TimeRepository(Timer("exported root"))
+    server = start_http_server(0, repo=repo)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            assert response.headers["Content-Type"] == CONTENT_TYPE
+            samples = _metrics(response.read().decode("utf-8"))
+    finally:
+        server.stop()
+    assert samples['chronologger_timer_calls_total{timer="exported root"}'] == 0
+
+    path = tmp_path / "chronologger.prom"
+    write_textfile(str(path), repo)
+    assert path.read_text() == render(repo)
+    writer = TextfileWriter(str(path), interval_secs=60, repo=repo).start()
+    writer.stop()
+    assert path.read_text() == render(repo)
+    assert [file.name for file in tmp_path.iterdir()] == ["chronologger.prom"]
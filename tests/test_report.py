@@ -0,0 +1,58 @@
+import csv
+import io
+
+from chronologger import Timer, TimeUnit
+from chronologger.model import EventKind, Label, Tick
+from chronologger.report import Layout, render
+from chronologger.repository import IndexedTimeRepository, TimeRepository, set_repo
+from chronologger.service import show_time
+
+
+def _repo(repo_class=TimeRepository):
+    repo = repo_class(Timer("report root"))
+    db, web = Timer("db", unit=TimeUnit.ms), Timer("web", unit=TimeUnit.ms)
+    repo.add(Label("phase 1", repo.root_time_context, TimeUnit.s, 0))
+    for i, timer in enumerate((db, web, db)):
+        start = Tick("start", timer, TimeUnit.ms, 10 ** 6 * i)
+        repo.add(start)
+        repo.add(Tick("end", timer, TimeUnit.ms, 10 ** 6 * i + 250_000 * (i + 1)) - start)
+    return repo
+
+
+def test_text_report_matches_the_events():
+    repo = _repo()
+    report = io.StringIO()
+    assert repo.report(report) == 4  # Single ticks are skipped
+    expected = "".join(f"{event}\n" for event in repo.get_all() if not type(event) is Tick)
+    assert report.getvalue() == expected == str(repo)
+
+
+def test_table_report_in_other_unit_filtered_by_timer():
+    report = io.StringIO()
+    assert render(_repo().get_all(), report, layout=Layout.TABLE, unit=TimeUnit.ns, timer="db") == 3
+    header, first, second = report.getvalue().splitlines()
+    assert header.split() == ["kind", "timer", "name", "time", "unit", "weight", "cpu/wall"]
+    assert first.split() == ["period", "db", "elapsed", "250000.000000", "ns", "1"]
+    assert second.split()[3] == "750000.000000"
+
+
+def test_csv_report_of_every_kind():
+    report = io.StringIO()
+    render(_repo().get_all(), report, layout=Layout.CSV, kinds=None,
+           predicate=lambda event: event.name != "phase 1")
+    rows = list(csv.DictReader(io.StringIO(report.getvalue())))
+    assert [row["kind"] for row in rows] == ["tick", "period"] * 3
+    assert rows[1]["timer"] == "db" and rows[1]["elapsed_ns"] == "250000" and rows[1]["time"] == "0.25"
+    assert rows[0]["elapsed_ns"] == "" and rows[0]["start_ns"] == rows[0]["end_ns"] == "0"
+
+
+def test_show_time_streams_the_root_repository():
+    previous_repo = set_repo(_repo(IndexedTimeRepository))
+    try:
+        report = io.StringIO()
+        show_time(report, kinds=(EventKind.PERIOD,), timer="web", unit=TimeUnit.ms)
+        assert report.getvalue().splitlines() == ["0.500 ms (elapsed)   =    end: 1.500 ms - start: 1.000 ms"]
+        Timer("printer").print(report, layout=Layout.CSV)
+        assert report.getvalue().splitlines()[1].startswith("kind,timer,name")
+    finally:
+        set_repo(previous_repo)
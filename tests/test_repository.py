@@ -1,6 +1,11 @@
-from chronologger import Tick, Timer, TimeUnit
+import threading
+import time
+
+from chronologger import Tick, Timer, TimeUnit, Period
+from chronologger.model import Clock, EventKind, Label
 from chronologger.timer import root_repo
-from chronologger.repository import TimeRepository, RootTimeRepository
+from chronologger.repository import (TimeRepository, RootTimeRepository, ConcurrentTimeRepository,
+                                     BoundedTimeRepository, Eviction, IndexedTimeRepository, set_repo)
 
 
 def test_root_repo_is_initialized():
@@ -45,3 +50,133 @@ def test_nested_nodes_1_level():
         events) == 3  # TODO For now it's a flat structure and we can't check nested timer contents as we have to invoke the service
 
     assert len(repo.time_contexts) == 2
+
+
+def test_concurrent_repo_merges_per_thread_buffers():
+    root_timer = Timer("root")
+    repo = ConcurrentTimeRepository(root_timer)
+
+    def add_ticks(thread_no):
+        for i in range(100):
+            repo.add(Tick(f"thread {thread_no} tick {i}", root_timer))
+
+    threads = [threading.Thread(target=add_ticks, args=(thread_no,)) for thread_no in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    events = repo.get_all()
+    assert len(events) == 400
+    for thread_no in range(4):  # Events from the same thread keep their order
+        thread_events = [event.name for event in events if event.name.startswith(f"thread {thread_no} ")]
+        assert thread_events == [f"thread {thread_no} tick {i}" for i in range(100)]
+
+    repo.add(Tick("one more", root_timer))
+    repo.flush()
+    assert len(repo.time_events) == 401
+
+
+def _period(timer, start_ns, elapsed_ns):
+    return Period("period", timer, TimeUnit.s, Tick("start", timer, TimeUnit.s, start_ns),
+                  Tick("end", timer, TimeUnit.s, start_ns + elapsed_ns))
+
+
+def test_bounded_repo_evicts_oldest_events():
+    root_timer = Timer("root")
+    repo = BoundedTimeRepository(root_timer, capacity=10)
+    ticks = [Tick(f"tick {i}", root_timer) for i in range(25)]
+    for tick in ticks:
+        repo.add(tick)
+    assert repo.get_all() == ticks[-10:]
+
+
+def test_bounded_repo_keeps_slowest_periods_per_timer():
+    root_timer = Timer("root")
+    other_timer = Timer("other")
+    repo = BoundedTimeRepository(root_timer, capacity=3, eviction=Eviction.SLOWEST)
+    for elapsed_ns in [5, 1, 9, 3, 7, 2]:
+        repo.add(_period(root_timer, elapsed_ns * 100, elapsed_ns))
+        repo.add(_period(other_timer, elapsed_ns * 100, elapsed_ns * 10))
+    repo.add(Label("label", root_timer))
+
+    periods = [event for event in repo.get_all() if isinstance(event, Period)]
+    assert sorted(period.ns() for period in periods if period.time_context is root_timer) == [5, 7, 9]
+    assert sorted(period.ns() for period in periods if period.time_context is other_timer) == [50, 70, 90]
+    assert isinstance(repo.get_all()[-1], Label)
+
+
+def test_bounded_repo_keeps_time_window():
+    root_timer = Timer("root")
+    repo = BoundedTimeRepository(root_timer, capacity=100, eviction=Eviction.WINDOW, window_secs=0.1)
+    repo.add(Tick("old tick", root_timer))
+    time.sleep(0.15)
+    recent_tick = Tick("recent tick", root_timer)
+    repo.add(recent_tick)
+    assert repo.get_all() == [recent_tick]
+    assert "recent tick" not in str(repo)  # Single ticks are not shown
+
+    cpu_timer = Timer("cpu", clock=Clock.THREAD_TIME)  # Its ticks are far behind perf_counter
+    cpu_tick = Tick("cpu tick", cpu_timer, _tick_in_ns=Clock.THREAD_TIME.read())
+    repo.add(cpu_tick)
+    assert repo.get_all() == [recent_tick, cpu_tick]
+
+
+def test_call_tree_aggregates_nested_timers_by_path():
+    root_timer = Timer("root")
+    repo = TimeRepository(root_timer)
+    previous_repo = set_repo(repo)
+    sub_timer = Timer("sub")
+
+    @Timer("a")
+    def a():
+        with sub_timer:
+            time.sleep(0.01)
+
+    @Timer("b")
+    def b():
+        for _ in range(2):
+            with sub_timer:
+                pass
+
+    try:
+        a()
+        b()
+        b()
+    finally:
+        set_repo(previous_repo)
+
+    assert repo.call_tree.find(("a", "sub")).calls == 1
+    assert repo.call_tree.find(("b", "sub")).calls == 4
+    assert repo.call_tree.find(("sub",)) is None
+    a_node = repo.call_tree.find(("a",))
+    assert a_node.exclusive_ns == a_node.total_ns - a_node.children["sub"].total_ns
+    assert "    sub: 4 calls" in str(repo.call_tree)
+
+    periods = [event for event in repo.get_all() if isinstance(event, Period)]
+    spans = {period.span.span_id: period.span for period in periods}
+    for span in spans.values():
+        if span.parent_id is not None:
+            assert spans[span.parent_id].path == span.path[:-1]
+
+
+def test_indexed_repository_queries_by_timer_kind_and_time_range():
+    root_timer = Timer("root")
+    repo = IndexedTimeRepository(root_timer)
+    fast, slow = Timer("fast"), Timer("slow")
+    for i in range(10):
+        timer = fast if i % 2 == 0 else slow
+        repo.add(Tick("tick", timer, TimeUnit.s, 1000 * i))
+        repo.add(Tick("end", timer, TimeUnit.s, 1000 * i + 500) - Tick("start", timer, TimeUnit.s, 1000 * i))
+    repo.add(Label("phase", root_timer, TimeUnit.s, 2500))
+    repo.add(Tick("late", fast, TimeUnit.s, 100))  # Added out of time order
+
+    assert len(repo.query()) == len(repo.get_all()) == 22
+    assert sorted(repo.timers()) == ["fast", "root", "slow"]
+    assert [event.end.ns() for event in repo.periods("fast")] == [500, 2500, 4500, 6500, 8500]
+    assert [event.end.ns() for event in repo.periods(slow, start_ns=3000, end_ns=7500)] == [3500, 5500]
+    assert [event.ns() for event in repo.query(fast, EventKind.TICK, end_ns=2001)] == [0, 100, 2000]
+    assert [event.name for event in repo.query(kind=EventKind.LABEL)] == ["phase"]
+    assert repo.query("unknown") == []
+    rendered = str(repo).splitlines()
+    assert len([line for line in rendered if "elapsed" in line]) == 10 and rendered.count("phase: 0.000 s") == 1
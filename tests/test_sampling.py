@@ -0,0 +1,140 @@
+import random
+import timeit
+
+import pytest
+
+from chronologger import Timer, Period
+from chronologger.model import ChronologgerError
+from chronologger.repository import StatsTimeRepository, TimeRepository, get_repo, set_repo
+from chronologger.sampling import EveryN, Probabilistic, Adaptive
+from chronologger.timer import _span_ids
+
+
+def test_every_n_samples_first_and_then_one_in_n():
+    policy = EveryN(3)
+    assert [policy.sample() for _ in range(7)] == [True, False, False, True, False, False, True]
+    assert policy.weight == 3
+    with pytest.raises(ChronologgerError):
+        EveryN(0)
+
+
+def test_probabilistic_sampling_rate():
+    random.seed(42)
+    policy = Probabilistic(0.25)
+    sampled = sum(policy.sample() for _ in range(10000))
+    assert 2200 < sampled < 2800
+    assert policy.weight == 4
+
+
+def test_adaptive_sampling_keeps_overhead_within_budget():
+    policy = Adaptive(budget=0.01, overhead_ns=1000)
+    assert policy.sample()
+    policy.measured(1000)  # Measuring costs as much as the code measured, so sample 1 in 100
+    assert policy.period == 100
+    assert sum(policy.sample() for _ in range(1000)) == 10
+    assert policy.weight == 100
+
+    policy.mean_elapsed_ns = None
+    policy.measured(10 ** 9)  # Slow code is always measured
+    assert policy.period == 1
+
+
+def test_sampled_decorator_scales_statistics():
+    timer = Timer("sampled", sampling=EveryN(10))
+    stats_repo = StatsTimeRepository(timer)
+    previous_repo = set_repo(stats_repo)
+
+    @timer
+    def dummy():
+        return 42
+
+    try:
+        results = [dummy() for _ in range(100)]
+        with timer:  # The 101st invocation is sampled again
+            pass
+        with timer:
+            timer.mark("not sampled")
+    finally:
+        set_repo(previous_repo)
+
+    assert results == [42] * 100
+    assert timer.stats.sampled == 11
+    assert timer.stats.calls == 110
+    assert stats_repo.sketch("sampled").count == 110
+
+
+def test_sampled_periods_carry_their_weight():
+    timer = Timer("weighted", sampling=EveryN(4))
+    for _ in range(8):
+        with timer:
+            pass
+    periods = [event for event in get_repo().get_all() if isinstance(event, Period) and event.time_context is timer]
+    assert len(periods) == 2
+    assert all(period.weight == 4 for period in periods)
+    assert timer.stats.sampled == 2
+    assert timer.stats.calls == 8
+
+
+def test_sampled_invocations_nested_in_unsampled_ones():
+    grand, parent, child = Timer("grand"), Timer("sometimes parent", sampling=EveryN(2)), Timer("child")
+    repo = TimeRepository(grand)
+    previous_repo = set_repo(repo)
+    try:
+        with grand:
+            for _ in range(2):  # The second invocation of the parent is not sampled
+                with parent:
+                    with child:
+                        pass
+    finally:
+        set_repo(previous_repo)
+    child_periods = [event for event in repo.get_all() if isinstance(event, Period) and event.time_context is child]
+    assert [period.span.path for period in child_periods] == [("grand", "sometimes parent", "child")] * 2
+    assert repo.call_tree.find(("grand", "child")) is None
+    parent_period = next(event for event in repo.get_all()
+                         if isinstance(event, Period) and event.time_context is parent)
+    assert grand.stats.exclusive_ns == grand.stats.inclusive_ns - parent_period.ns()
+    grand_period = next(event for event in repo.get_all() if isinstance(event, Period) and event.time_context is grand)
+    # Spans point to the innermost measured invocation
+    assert [period.span.parent_id for period in child_periods] == [parent_period.span.span_id,
+                                                                   grand_period.span.span_id]
+
+
+def test_recursion_through_unsampled_invocations_is_counted_once():
+    timer = Timer("sampled recursion", sampling=EveryN(2))
+
+    @timer
+    def countdown(n):
+        return n if n == 0 else countdown(n - 1)
+
+    repo = TimeRepository(timer)
+    previous_repo = set_repo(repo)
+    try:
+        countdown(2)  # Invocations with n = 2 and n = 0 are sampled
+    finally:
+        set_repo(previous_repo)
+    periods = [event for event in repo.get_all() if isinstance(event, Period)]
+    assert len(periods) == 2
+    outermost = max(periods, key=Period.ns)
+    assert timer.stats.inclusive_ns == outermost.ns() * 2
+    assert periods[0].span.path == ("sampled recursion",) * 3
+
+
+def test_unsampled_invocations_cost_much_less_than_sampled_ones():
+    unsampled, sampled = Timer("never sampled", sampling=EveryN(10 ** 9)), Timer("always sampled")
+    repo = TimeRepository(unsampled)
+
+    def noop():
+        pass
+
+    unsampled_noop, sampled_noop = unsampled(noop), sampled(noop)
+    previous_repo = set_repo(repo)
+    try:
+        unsampled_noop()  # The first invocation is sampled
+        first_span_id = next(_span_ids)
+        unsampled_ns = min(timeit.repeat(unsampled_noop, number=2000, repeat=5))
+        assert next(_span_ids) == first_span_id + 1  # No span is created for the invocations not sampled
+        sampled_ns = min(timeit.repeat(sampled_noop, number=2000, repeat=5))
+    finally:
+        set_repo(previous_repo)
+    assert unsampled.stats.sampled == 1
+    assert unsampled_ns < sampled_ns / 4
@@ -0,0 +1,65 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from chronologger import Timer, Period
+from chronologger.model import BoundaryTick, Label
+from chronologger.repository import TimeRepository
+from chronologger.shm import SharedMemoryCollector, SharedMemoryTimeRepository, _Lane
+
+
+def timed_work(i):
+    with Timer("worker timer") as timer:
+        timer.label(f"work {i}")
+    return os.getpid()
+
+
+def test_events_from_worker_processes_are_collected():
+    collector = SharedMemoryCollector(lanes=2, capacity=64)
+    repo = TimeRepository(Timer("parent"))
+    try:
+        with ProcessPoolExecutor(max_workers=2, initializer=collector.attach) as pool:
+            worker_pids = set(pool.map(timed_work, range(20)))
+        assert collector.drain(repo) == 60  # Start tick, label and period for each task
+        assert collector.dropped() == 0
+    finally:
+        collector.close(repo)
+
+    periods = [event for event in repo.get_all() if isinstance(event, Period)]
+    labels = [event for event in repo.get_all() if isinstance(event, Label)]
+    assert len(periods) == 20
+    assert {period.time_context.pid for period in periods} == worker_pids
+    assert all(period.time_context.name == "worker timer" for period in periods)
+    assert all(period.ns() > 0 for period in periods)
+    assert sorted(label.name for label in labels) == sorted(f"work {i}" for i in range(20))
+    assert sum(isinstance(event, BoundaryTick) for event in repo.get_all()) == 20  # The start ticks
+
+
+def test_full_lanes_drop_events():
+    collector = SharedMemoryCollector(lanes=1, capacity=4)
+    repo = TimeRepository(Timer("parent"))
+    try:
+        with ProcessPoolExecutor(max_workers=1, initializer=collector.attach) as pool:
+            list(pool.map(timed_work, range(3)))
+        assert collector.dropped() == 5
+        assert collector.drain(repo) == 4
+        assert collector.drain(repo) == 0
+    finally:
+        collector.close(repo)
+
+
+def test_releasing_a_lane_keeps_the_tail_moved_by_the_drainer(monkeypatch):
+    collector = SharedMemoryCollector(lanes=1, capacity=4)
+    repo = TimeRepository(Timer("parent"))
+    try:
+        lane = collector._lane(0)
+        lane.set_owner(os.getpid())
+        SharedMemoryTimeRepository(repo.root_time_context, lane).add(Label("released", None))
+        stale_header = lane.header()  # Read by the worker before the drainer moves the tail
+        assert collector.drain(repo) == 1
+        monkeypatch.setattr(_Lane, "header", lambda self: stale_header)
+        collector._release(0, os.getpid())
+        monkeypatch.undo()
+        assert lane.header() == (1, 1, 0, 0)
+        assert collector.drain(repo) == 0
+    finally:
+        collector.close(repo)
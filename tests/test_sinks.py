@@ -0,0 +1,86 @@
+import copy
+import io
+import logging
+import unittest.mock as mock
+
+from chronologger import Timer
+from chronologger.sinks import PrintSink, LoggingSink, QueueSink, log
+
+
+class FormattingCounter:
+    formatted = 0
+
+    def __str__(self):
+        FormattingCounter.formatted += 1
+        return "formatted"
+
+
+class RecordingFile(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def test_print_sink_and_plain_functions():
+    output = io.StringIO()
+    log(PrintSink(output), "%s Timer created!", "test")
+    messages = []
+    log(messages.append, "Timer %s registered in repo %s", "test", "root")
+    log(None, "ignored")
+    assert output.getvalue() == "test Timer created!\n"
+    assert messages == ["Timer test registered in repo root"]
+
+
+def test_logging_sink_skips_formatting_when_level_is_disabled(caplog):
+    logger = logging.getLogger("chronologger.test")
+    sink = LoggingSink(logger, level=logging.DEBUG)
+    logger.setLevel(logging.INFO)
+    sink("%s", FormattingCounter())
+    assert FormattingCounter.formatted == 0
+
+    with caplog.at_level(logging.DEBUG, logger="chronologger.test"):
+        sink("%s message", FormattingCounter())
+    assert FormattingCounter.formatted >= 1
+    assert "formatted message" in caplog.text
+
+
+def test_queue_sink_writes_in_batches_from_background():
+    output = RecordingFile()
+    sink = QueueSink(output, batch_size=100, flush_interval=1)
+    for i in range(300):
+        sink("message %d", i)
+    sink.flush()
+    lines = output.getvalue().splitlines()
+    assert lines == [f"message {i}" for i in range(300)]
+    assert output.writes < 300
+    sink.close()
+    sink("after close")  # Not written, but doesn't fail
+    assert len(output.getvalue().splitlines()) == 300
+    assert sink._queue.empty()  # Dropped instead of queued forever
+
+
+def test_timer_with_queue_sink():
+    output = io.StringIO()
+    sink = QueueSink(output)
+    with Timer("queued", log_when_exiting=True, logger=sink) as timer:
+        timer.mark("queued mark")
+    sink.close()
+    assert "queued Timer created!" in output.getvalue()
+    assert "queued mark" in output.getvalue()
+    assert "queued_end_tick" in output.getvalue()
+
+
+def test_chronologger_is_only_copied_for_asynchronous_sinks():
+    synchronous, asynchronous = [], QueueSink(io.StringIO())
+    for sink in (synchronous.append, asynchronous):
+        timer = Timer("detailed", simple_log=False, logger=sink)
+        with mock.patch("chronologger.model.copy.copy", wraps=copy.copy) as copied:
+            timer.start()
+            timer.stop(do_log=True)
+        assert copied.called == (sink is asynchronous)
+    asynchronous.close()
+    assert any("detailed_end_tick" in message for message in synchronous)
@@ -0,0 +1,71 @@
+import math
+import random
+
+import pytest
+
+from chronologger import Tick, Timer, TimeUnit, Period
+from chronologger.model import ChronologgerError
+from chronologger.repository import StatsTimeRepository
+from chronologger.stats import LatencySketch
+
+
+def test_sketch_percentiles_are_within_the_precision():
+    values = list(range(1, 100_001))
+    random.shuffle(values)
+    sketch = LatencySketch()
+    for value in values:
+        sketch.record(value)
+
+    assert sketch.count == 100_000
+    assert sketch.min == 1
+    assert sketch.max == 100_000
+    assert math.isclose(sketch.mean(), 50_000.5)
+    relative_error = 2 ** -(sketch.significant_bits - 1)
+    assert math.isclose(sketch.p50, 50_000, rel_tol=relative_error)
+    assert math.isclose(sketch.p90, 90_000, rel_tol=relative_error)
+    assert math.isclose(sketch.p99, 99_000, rel_tol=relative_error)
+    assert math.isclose(sketch.p999, 99_900, rel_tol=relative_error)
+    assert len(sketch.counts) < 2 ** sketch.significant_bits * 12
+
+
+def test_sketch_memory_is_bounded():
+    sketch = LatencySketch()
+    for value in range(0, 2 ** 62, 2 ** 52):
+        sketch.record(value)
+    buckets = len(sketch.counts)
+    for value in range(0, 2 ** 62, 2 ** 50):
+        sketch.record(value)
+    assert len(sketch.counts) == buckets
+
+
+def test_sketches_can_be_merged():
+    sketch_1, sketch_2 = LatencySketch(), LatencySketch()
+    for value in range(1000):
+        sketch_1.record(value)
+        sketch_2.record(value + 1000)
+
+    merged_sketch = LatencySketch().merge(sketch_1).merge(LatencySketch.from_dict(sketch_2.to_dict()))
+    assert merged_sketch.count == 2000
+    assert merged_sketch.min == 0
+    assert merged_sketch.max == 1999
+    assert math.isclose(merged_sketch.p50, 1000, rel_tol=0.02)
+
+    with pytest.raises(ChronologgerError):
+        sketch_1.merge(LatencySketch(significant_bits=5))
+
+
+def test_stats_repo_keeps_sketches_instead_of_events():
+    root_timer = Timer("root")
+    repo = StatsTimeRepository(root_timer)
+    timer = Timer("stats test")
+    repo.register(timer)
+
+    for elapsed_ns in range(1, 101):
+        start_tick = Tick("start", timer, TimeUnit.s, 0)
+        repo.add(start_tick)
+        repo.add(Period("period", timer, TimeUnit.s, start_tick, Tick("end", timer, TimeUnit.s, elapsed_ns * 1000)))
+
+    assert repo.get_all() == []
+    assert repo.sketch("stats test").count == 100
+    assert repo.sketch("stats test").max == 100_000
+    assert "stats test: count: 100" in str(repo)
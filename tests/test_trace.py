@@ -0,0 +1,58 @@
+import pytest
+
+from chronologger import Tick, Timer, TimeUnit, Period
+from chronologger.model import ChronologgerError, EventKind, Label
+from chronologger.repository import TimeRepository
+from chronologger.trace import TraceReader, TraceWriter, RECORD, HEADER
+
+
+def test_repository_events_are_written_to_a_binary_trace(tmp_path):
+    trace_path = str(tmp_path / "run.trace")
+    root_timer = Timer("root")
+    repo = TimeRepository(root_timer)
+    with TraceWriter(trace_path, buffer_records=2) as writer:
+        repo.subscribe(writer)
+        start_tick = Tick("start", root_timer, TimeUnit.ms, 1000)
+        repo.add(start_tick)
+        repo.add(Label("label", None, TimeUnit.s, 1500))
+        repo.add(Period("period", root_timer, TimeUnit.ms, start_tick, Tick("end", root_timer, TimeUnit.ms, 3000)))
+        repo.unsubscribe(writer)
+        repo.add(Tick("not written", root_timer))
+
+    with TraceReader(trace_path) as reader:
+        assert len(reader) == 3
+        assert reader.names == ["start", "root", "label", "period"]
+        tick, label, period = reader
+        assert (tick.kind, tick.name, tick.timer) == (EventKind.TICK, "start", "root")
+        assert (tick.unit, tick.start_ns) == (TimeUnit.ms, 1000)
+        assert (label.kind, label.timer, label.unit) == (EventKind.LABEL, None, TimeUnit.s)
+        assert (period.kind, period.elapsed_ns) == (EventKind.PERIOD, 2000)
+        assert reader[-1] == period
+        assert reader[1:] == [label, period]
+        assert reader[::2] == [tick, period]
+        with pytest.raises(IndexError):
+            reader[3]
+
+
+def test_traces_are_appended_and_partial_records_ignored(tmp_path):
+    trace_path = str(tmp_path / "run.trace")
+    timer = Timer("appended")
+    for run in range(2):
+        with TraceWriter(trace_path) as writer:
+            for i in range(10):
+                writer(Tick(f"tick {i}", timer))
+    with open(trace_path, "ab") as trace_file:
+        trace_file.write(b"\0" * (RECORD.size // 2))
+
+    with TraceReader(trace_path) as reader:
+        assert len(reader) == 20
+        assert len(reader.names) == 11  # Names are interned across runs
+        assert [record.name for record in reader[8:12]] == ["tick 8", "tick 9", "tick 0", "tick 1"]
+        assert all(record.start_ns <= next_record.start_ns for record, next_record in zip(reader, reader[1:]))
+
+
+def test_reading_a_file_that_is_not_a_trace(tmp_path):
+    trace_path = tmp_path / "not.trace"
+    trace_path.write_bytes(b"x" * HEADER.size)
+    with pytest.raises(ChronologgerError):
+        TraceReader(str(trace_path))